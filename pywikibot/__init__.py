@@ -32,6 +32,7 @@ from pywikibot.bot_choice import (
 )
 from pywikibot import config2 as config
 from pywikibot.data.api import UploadWarning as _UploadWarning
+from pywikibot.data import urlindex as _urlindex
 from pywikibot.diff import PatchManager
 from pywikibot.exceptions import (
     Error, InvalidTitle, BadTitle, NoPage, NoMoveTarget, SectionError,
@@ -1171,13 +1172,17 @@ def _code_fam_from_url(url):
     """
     if url not in _url_cache:
         matched_sites = []
-        # Iterate through all families and look, which does apply to
-        # the given URL
-        for fam in config.family_files:
-            family = Family.load(fam)
-            code = family.from_url(url)
-            if code is not None:
-                matched_sites.append((code, family))
+        if config.family_url_index:
+            for code, fam in _urlindex.get_index().lookup(url):
+                matched_sites.append((code, Family.load(fam)))
+        else:
+            # Iterate through all families and look, which does apply to
+            # the given URL
+            for fam in config.family_files:
+                family = Family.load(fam)
+                code = family.from_url(url)
+                if code is not None:
+                    matched_sites.append((code, family))
 
         if not matched_sites:
             # TODO: As soon as AutoFamily is ready, try and use an
@@ -1356,9 +1361,15 @@ def _flush(stop=True):
         if stop:
             # -1 because we added a None element to stop the queue
             remainingPages -= 1
+        seconds = remainingPages * config.put_throttle
+
+        # the sites are processed in parallel
+        for site, num in put_queue_sizes().items():
+            if num:
+                remainingPages += num
+                seconds = max(seconds, num * _put_delay(site))
 
-        remainingSeconds = datetime.timedelta(
-            seconds=(remainingPages * config.put_throttle))
+        remainingSeconds = datetime.timedelta(seconds=seconds)
         return (remainingPages, remainingSeconds)
 
     if stop:
@@ -1370,10 +1381,21 @@ def _flush(stop=True):
         output(color_format(
             '{lightblue}Waiting for {num} pages to be put. '
             'Estimated time remaining: {sec}{default}', num=num, sec=sec))
+        for site, num in put_queue_sizes().items():
+            if num:
+                output(color_format(
+                    '{lightblue}  {site}: {num} pages, {sec}{default}',
+                    site=site or 'no site', num=num,
+                    sec=datetime.timedelta(seconds=num * _put_delay(site))))
 
-    while _putthread.is_alive() and page_put_queue.qsize() > 0:
+    while True:
+        threads = [thread for thread in [_putthread] + _site_putthreads()
+                   if thread.is_alive()]
+        if not threads or page_put_queue.qsize() == 0 \
+           and not any(put_queue_sizes().values()):
+            break
         try:
-            _putthread.join(1)
+            threads[0].join(1)
         except KeyboardInterrupt:
             if input_yn('There are {0} pages remaining in the queue. '
                         'Estimated time remaining: {1}\nReally exit?'
@@ -1392,13 +1414,86 @@ def _flush(stop=True):
 atexit.register(_flush)
 
 
+def _request_site(request, args):
+    """Return the site an asynchronous request is made to or None."""
+    for obj in (getattr(request, '__self__', None), ) + tuple(args):
+        if isinstance(obj, BaseSite):
+            return obj
+        site = getattr(obj, 'site', None)
+        if isinstance(site, BaseSite):
+            return site
+    return None
+
+
+def _put_delay(site):
+    """Return the write delay of a site for the estimation of _flush."""
+    if site is None:
+        return config.put_throttle
+    return site.throttle.getDelay(write=True)
+
+
+def _site_putthreads():
+    """Return the threads processing the queues of the sites."""
+    with _site_put_lock:
+        return [thread for _, thread in _site_put_queues.values()]
+
+
+def put_queue_sizes():
+    """
+    Return the number of queued requests per site.
+
+    The requests are only queued per site with config.async_put_per_site.
+    Requests which are not made to a site are queued with the key None.
+
+    @rtype: dict
+    """
+    with _site_put_lock:
+        return {site: queue.qsize()
+                for site, (queue, _) in _site_put_queues.items()}
+
+
+def _site_put_manager(queue):
+    """Daemon; execute the requests to a site in background."""
+    while True:
+        (request, args, kwargs) = queue.get()
+        if request is None:
+            break
+        request(*args, **kwargs)
+        queue.task_done()
+        page_put_queue.task_done()
+
+
+def _dispatch_request(request, args, kwargs):
+    """Put a request on the queue of its site and start its daemon."""
+    site = _request_site(request, args)
+    with _site_put_lock:
+        if site not in _site_put_queues:
+            queue = Queue(config.max_queue_size)
+            thread = threading.Thread(target=_site_put_manager,
+                                      args=(queue, ))
+            thread.setName('Put-Thread-{0}'.format(site or 'default'))
+            thread.setDaemon(True)
+            thread.start()
+            _site_put_queues[site] = (queue, thread)
+        queue = _site_put_queues[site][0]
+    queue.put((request, args, kwargs))
+
+
 # Create a separate thread for asynchronous page saves (and other requests)
 def async_manager():
     """Daemon; take requests from the queue and execute them in background."""
     while True:
         (request, args, kwargs) = page_put_queue.get()
         if request is None:
+            with _site_put_lock:
+                queues = [queue for queue, _ in _site_put_queues.values()]
+            for queue in queues:
+                queue.put((None, [], {}))
             break
+        if config.async_put_per_site:
+            # page_put_queue.task_done is called by the site's daemon
+            _dispatch_request(request, args, kwargs)
+            continue
         request(*args, **kwargs)
         page_put_queue.task_done()
 
@@ -1424,6 +1519,9 @@ _putthread = threading.Thread(target=async_manager)
 # identification for debugging purposes
 _putthread.setName('Put-Thread')
 _putthread.setDaemon(True)
+# queues and threads per site with config.async_put_per_site
+_site_put_queues = {}
+_site_put_lock = threading.Lock()
 
 wrapper = _ModuleDeprecationWrapper(__name__)
 wrapper._add_deprecated_attr('ImagePage', FilePage, since='20140924')
@@ -82,6 +82,7 @@ __all__ = (
 import codecs
 import datetime
 from importlib import import_module
+from itertools import groupby
 import json
 import logging
 import logging.handlers
@@ -1346,9 +1347,28 @@ class BaseBot(OptionHandler):
         try:
             func(*args, **kwargs)
             self._save_counter += 1
-        except pywikibot.PageSaveRelatedError as e:
+        except (pywikibot.PageSaveRelatedError, pywikibot.ServerError) as e:
+            self._handle_save_error(page, e, ignore_save_related_errors,
+                                    ignore_server_errors)
+        else:
+            return True
+        return False
+
+    @staticmethod
+    def _handle_save_error(page, e, ignore_save_related_errors,
+                           ignore_server_errors):
+        """
+        Report a save-related error or a server error or raise it.
+
+        @param page: the page which was not saved
+        @param e: the raised exception
+        @param ignore_save_related_errors: report and ignore save-related
+            errors
+        @param ignore_server_errors: report and ignore server errors
+        """
+        if isinstance(e, pywikibot.PageSaveRelatedError):
             if not ignore_save_related_errors:
-                raise
+                raise e
             if isinstance(e, pywikibot.EditConflict):
                 pywikibot.output('Skipping %s because of edit conflict'
                                  % page.title())
@@ -1363,14 +1383,68 @@ class BaseBot(OptionHandler):
                 pywikibot.error(
                     'Skipping %s because of a save related error: %s'
                     % (page.title(), e))
-        except pywikibot.ServerError as e:
+        elif isinstance(e, pywikibot.ServerError):
             if not ignore_server_errors:
-                raise
+                raise e
             pywikibot.error('Server Error while processing %s: %s'
                             % (page.title(), e))
         else:
-            return True
-        return False
+            raise e
+
+    def put_pages(self, items, **kwargs):
+        """
+        Save new revisions of many pages, keeping several edits in flight.
+
+        With the 'always' option the items are passed to
+        L{APISite.editpages} of the site of their pages, which submits
+        the next edits before the previous ones are finished. Otherwise
+        every edit is confirmed by L{userPut}. In both cases the pages
+        are saved by L{Page.save}.
+
+        Option used:
+
+        * 'always'
+
+        Keyword args used:
+
+        * 'workers' - number of edits in flight, passed to editpages
+        * 'show_diff' - show the changes, only without 'always' (enabled)
+        * 'ignore_save_related_errors' - report and ignore (disabled)
+        * 'ignore_server_errors' - report and ignore (disabled)
+
+        Other keyword args are passed to L{Page.save}.
+
+        @param items: the edits as tuples of the page, the new text and
+            the edit summary
+        @type items: iterable of (pywikibot.Page, str, str)
+        @return: the pages and whether they were saved, in the order in
+            which the edits finish
+        @rtype: generator of (pywikibot.Page, bool)
+        """
+        if not self.getOption('always'):
+            kwargs.pop('workers', None)
+            for page, newtext, summary in items:
+                saved = self.userPut(page, page.text, newtext,
+                                     summary=summary, **kwargs)
+                yield page, bool(saved)
+            return
+
+        # the pages are not loaded yet when the edits are queued
+        kwargs.pop('show_diff', None)
+        ignore_save_related_errors = kwargs.pop('ignore_save_related_errors',
+                                                False)
+        ignore_server_errors = kwargs.pop('ignore_server_errors', False)
+        for site, group in groupby(items, key=lambda item: item[0].site):
+            for page, saved, e in site.editpages(group, **kwargs):
+                self.current_page = page
+                if e is not None:
+                    self._handle_save_error(page, e,
+                                            ignore_save_related_errors,
+                                            ignore_server_errors)
+                    saved = False
+                elif saved:
+                    self._save_counter += 1
+                yield page, bool(saved)
 
     def stop(self):
         """Stop iterating."""
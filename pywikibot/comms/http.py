@@ -23,7 +23,10 @@ __docformat__ = 'epytext'
 
 import atexit
 import sys
+import threading
+import time
 
+from collections import defaultdict, deque, OrderedDict
 from string import Formatter
 from warnings import warn
 
@@ -118,6 +121,10 @@ session.cookies = cookie_jar
 
 # Prepare flush on quit
 def _flush():
+    if _worker_pool is not None:
+        log('Stopping http worker threads.')
+        _worker_pool.stop()
+
     log('Closing network session.')
     session.close()
 
@@ -311,8 +318,17 @@ def request(site=None, uri=None, method='GET', params=None, body=None,
     headers['user-agent'] = user_agent(site, format_string)
 
     baseuri = site.base_url(uri)
-    r = fetch(baseuri, method, params, body, headers, **kwargs)
+    started = time.time()
+    try:
+        r = fetch(baseuri, method, params, body, headers, **kwargs)
+    except Exception:
+        site.throttle.record(error=True)
+        raise
     site.throttle.retry_after = int(r.response_headers.get('retry-after', 0))
+    lag = r.response_headers.get('x-database-lag')
+    site.throttle.record(latency=time.time() - started,
+                         lag=float(lag) if lag else None,
+                         error=r.status >= 500)
     return r.text
 
 
@@ -385,6 +401,180 @@ def _http_process(session, http_request):
         http_request.data = response
 
 
+class HttpWorkerPool(object):
+
+    """
+    Worker threads processing enqueued HTTP requests concurrently.
+
+    Requests are queued per host. A worker picks the next request of a
+    host which has less than max_per_host requests in progress, so a busy
+    host does not block requests to other hosts. Hosts are served round
+    robin.
+
+    Blocking requests are processed by L{process_now} in the calling
+    thread instead. They count against max_per_host, but not against the
+    number of workers, so callers running their own threads are not
+    limited by the pool.
+
+    The pool is used by L{_enqueue} and L{fetch} if config.http_workers is
+    positive.
+    """
+
+    def __init__(self, process, workers, max_per_host):
+        """
+        Initializer.
+
+        @param process: function processing a L{threadedhttp.HttpRequest}
+        @type process: callable
+        @param workers: number of worker threads
+        @type workers: int
+        @param max_per_host: maximum number of concurrent requests per host
+        @type max_per_host: int
+        """
+        self.process = process
+        self.workers = workers
+        self.max_per_host = max_per_host
+        self._condition = threading.Condition()
+        self._pending = OrderedDict()
+        self._active = defaultdict(int)
+        self._stopped = False
+        self._threads = []
+        for i in range(workers):
+            thread = threading.Thread(target=self._run,
+                                      name='Http-{0}'.format(i))
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, request):
+        """Queue a request for processing."""
+        with self._condition:
+            if self._stopped:
+                raise RuntimeError('{0} has been stopped'
+                                   .format(self.__class__.__name__))
+            self._pending.setdefault(request.hostname, deque()).append(
+                request)
+            self._condition.notify()
+
+    def process_now(self, request):
+        """
+        Process a request in the calling thread.
+
+        It waits until the host of the request has less than max_per_host
+        requests in progress.
+        """
+        host = request.hostname
+        with self._condition:
+            while self._active[host] >= self.max_per_host:
+                self._condition.wait()
+            self._active[host] += 1
+        try:
+            self.process(request)
+        finally:
+            self._release(host)
+
+    def stats(self):
+        """
+        Return the number of pending and active requests per host.
+
+        @rtype: dict of tuple of int
+        """
+        with self._condition:
+            hosts = set(self._pending) | {host for host, count
+                                          in self._active.items() if count}
+            return {host: (len(self._pending.get(host, ())),
+                           self._active[host])
+                    for host in hosts}
+
+    def stop(self, timeout=None):
+        """Process the remaining requests and stop the worker threads."""
+        with self._condition:
+            self._stopped = True
+            self._condition.notify_all()
+        for thread in self._threads:
+            thread.join(timeout)
+
+    def _next(self):
+        """Wait for the next request which may be processed."""
+        with self._condition:
+            while True:
+                for host, queue in self._pending.items():
+                    if self._active[host] < self.max_per_host:
+                        request = queue.popleft()
+                        # move the host to the end for round robin
+                        del self._pending[host]
+                        if queue:
+                            self._pending[host] = queue
+                        self._active[host] += 1
+                        return request
+                if self._stopped and not self._pending:
+                    return None
+                self._condition.wait()
+
+    def _run(self):
+        """Process requests until the pool is stopped."""
+        while True:
+            request = self._next()
+            if request is None:
+                break
+            try:
+                self.process(request)
+            except Exception as e:
+                # callbacks may raise, but they can't be caught here
+                error('Error processing request for uri {0}: {1!r}'
+                      .format(request.uri, e))
+            finally:
+                self._release(request.hostname)
+
+    def _release(self, host):
+        """Mark a request to the host as finished."""
+        with self._condition:
+            self._active[host] -= 1
+            self._condition.notify_all()
+
+
+_worker_pool = None
+_worker_pool_lock = threading.Lock()
+
+
+def _resize_adapters(connections, maxsize):
+    """Enlarge the connection pools of the default session adapters."""
+    for adapter in set(session.adapters.values()):
+        if type(adapter) is not requests.adapters.HTTPAdapter:
+            continue
+        if (adapter._pool_connections >= connections
+                and adapter._pool_maxsize >= maxsize):
+            continue
+        adapter.poolmanager.clear()
+        adapter.init_poolmanager(
+            max(connections, adapter._pool_connections),
+            max(maxsize, adapter._pool_maxsize),
+            block=adapter._pool_block)
+
+
+def _get_worker_pool():
+    """
+    Return the shared worker pool, creating it if necessary.
+
+    The pool is only created if config.http_workers is positive.
+    The connection pools of the default adapters of the session are
+    enlarged for the configured concurrency when the pool is created.
+    Adapters mounted by the user are left alone.
+
+    @rtype: HttpWorkerPool or None
+    """
+    global _worker_pool
+    if _worker_pool is None and config.http_workers > 0:
+        with _worker_pool_lock:
+            if _worker_pool is None:
+                _resize_adapters(max(config.http_workers, 10),
+                                 max(config.http_max_per_host, 10))
+                _worker_pool = HttpWorkerPool(
+                    lambda request: _http_process(session, request),
+                    config.http_workers, config.http_max_per_host)
+    return _worker_pool
+
+
 def error_handling_callback(request):
     """
     Raise exceptions and log alerts.
@@ -426,9 +616,12 @@ def _enqueue(uri, method='GET', params=None, body=None, headers=None,
     invoked, even if the default error handler detects a problem, so they
     must check request.exception before using the response data.
 
-    Note: multiple async requests do not automatically run concurrently,
-    as they are limited by the number of http threads in L{numthreads},
-    which is set to 1 by default.
+    Note: the request is processed synchronously in the calling thread
+    unless config.http_workers is positive. Otherwise it is processed by
+    the L{HttpWorkerPool}, which runs requests to different hosts
+    concurrently and at most config.http_max_per_host requests to the same
+    host at a time. Use L{threadedhttp.HttpRequest.wait} to wait for the
+    result.
 
     @see: L{requests.Session.request} for parameters.
 
@@ -438,6 +631,25 @@ def _enqueue(uri, method='GET', params=None, body=None, headers=None,
     @type callback: callable
     @kwarg callbacks: Methods to call once data is fetched
     @type callbacks: list of callable
+    @rtype: L{threadedhttp.HttpRequest}
+    """
+    request = _create_request(uri, method, params, body, headers, data,
+                              **kwargs)
+    worker_pool = _get_worker_pool()
+    if worker_pool is None:
+        _http_process(session, request)
+    else:
+        worker_pool.submit(request)
+    return request
+
+
+def _create_request(uri, method='GET', params=None, body=None, headers=None,
+                    data=None, **kwargs):
+    """
+    Create a request with the callbacks and headers.
+
+    See L{_enqueue} for the parameters.
+
     @rtype: L{threadedhttp.HttpRequest}
     """
     # body and data parameters both map to the data parameter of
@@ -463,10 +675,8 @@ def _enqueue(uri, method='GET', params=None, body=None, headers=None,
     if not user_agent_format_string or '{' in user_agent_format_string:
         all_headers['user-agent'] = user_agent(None, user_agent_format_string)
 
-    request = threadedhttp.HttpRequest(
+    return threadedhttp.HttpRequest(
         uri, method, params, body, all_headers, callbacks, **kwargs)
-    _http_process(session, request)
-    return request
 
 
 def fetch(uri, method='GET', params=None, body=None, headers=None,
@@ -475,6 +685,11 @@ def fetch(uri, method='GET', params=None, body=None, headers=None,
     """
     Blocking HTTP request.
 
+    The request is processed in the calling thread. If config.http_workers
+    is positive, it waits until there are less than
+    config.http_max_per_host requests to the same host in progress, but it
+    is not processed by the workers of the L{HttpWorkerPool}.
+
     Note: The callback runs in the HTTP thread, where exceptions are logged
     but are not able to be caught.
 
@@ -509,7 +724,12 @@ def fetch(uri, method='GET', params=None, body=None, headers=None,
         elif use_fake_user_agent is True:
             headers['user-agent'] = fake_user_agent()
 
-    request = _enqueue(uri, method, params, body, headers, **kwargs)
+    request = _create_request(uri, method, params, body, headers, **kwargs)
+    worker_pool = _get_worker_pool()
+    if worker_pool is None:
+        _http_process(session, request)
+    else:
+        worker_pool.process_now(request)
     # if there's no data in the answer we're in trouble
     assert request._data is not None
     # Run the error handling callback in the callers thread so exceptions
@@ -13,6 +13,7 @@ __docformat__ = 'epytext'
 # standard python libraries
 import codecs
 import re
+import threading
 
 import pywikibot
 from pywikibot.tools import deprecated, PY2, UnicodeMixin
@@ -63,6 +64,7 @@ class HttpRequest(UnicodeMixin):
 
         self._parsed_uri = None
         self._data = None
+        self._processed = threading.Event()
 
     @property
     def data(self):
@@ -75,9 +77,24 @@ class HttpRequest(UnicodeMixin):
         """Set the requests response and invoke each callback."""
         self._data = value
 
-        if self.callbacks:
-            for callback in self.callbacks:
-                callback(self)
+        try:
+            if self.callbacks:
+                for callback in self.callbacks:
+                    callback(self)
+        finally:
+            self._processed.set()
+
+    def wait(self, timeout=None):
+        """
+        Block until the request has been processed.
+
+        @param timeout: maximum time to wait in seconds or None to wait
+            until the request is processed
+        @type timeout: float
+        @return: whether the request has been processed
+        @rtype: bool
+        """
+        return self._processed.wait(timeout)
 
     @property
     def exception(self):
@@ -179,6 +179,43 @@ site_interface = 'APISite'
 # number of days to cache namespaces, api configuration, etc.
 API_config_expiry = 30
 
+# Storage backend for cached API requests. 'file' stores every entry in
+# its own file inside the apicache directory, 'sqlite' stores all entries
+# in a single indexed database file next to it.
+API_cache_backend = 'file'
+# Maximum size of the 'sqlite' API cache in MiB. The least recently used
+# entries are evicted when it is exceeded. 0 means no limit.
+API_cache_size = 0
+
+# Keep the siteinfo and the paraminfo of the sites in the persistent
+# store sitemeta.sqlite3, so processes don't need to request them on
+# startup. The paraminfo is only used while the MediaWiki version and the
+# general siteinfo are unchanged. The siteinfo is refreshed in the
+# background when it is older than API_config_expiry days. The maintenance
+# script prewarm.py fills the store for a whole family.
+API_metadata_store = False
+
+# Decode the pages and list entries of query responses one by one while
+# the query generators iterate them instead of decoding every response
+# at once. This lowers the memory used by large responses, e.g. of
+# revisions with their content, but a truncated response is only noticed
+# while its entries are iterated.
+API_stream_results = False
+
+# Maximum size in MiB of the persistent store revisions.sqlite3 which keeps
+# the content of the revisions retrieved by preloading pages. Pages whose
+# latest revision is stored are then preloaded without their content.
+# The least recently used revisions are evicted when the size is exceeded.
+# 0 disables the store.
+revision_store_size = 0
+
+# Resolve the sites of URLs, e.g. of Site(url=...) and of interwiki
+# prefixes, with the index urlindex.json of the hostnames and paths of the
+# registered families instead of loading all family files. The index is
+# rebuilt when a family file changes. The article path of a site is added
+# to the index when it is first needed.
+family_url_index = False
+
 # The maximum number of bytes which uses a GET request, if not positive
 # it'll always use POST requests
 maximum_GET_length = 255
@@ -602,6 +639,10 @@ interwiki_graph = False
 # once.
 interwiki_min_subjects = 100
 
+# How many queries to different sites should interwiki.py run at the same
+# time? Each query loads up to -query pages of one site.
+interwiki_queries_in_flight = 1
+
 # If interwiki graphs are enabled, which format(s) should be used?
 # Supported formats include png, jpg, ps, and svg. See:
 # http://www.graphviz.org/doc/info/output.html
@@ -665,6 +706,30 @@ maxthrottle = 60
 # 'put_throttle' seconds.
 put_throttle = 10
 
+# How bot processes on this host coordinate their throttles:
+# 'file': Register in the throttle.ctrl file and multiply the delays by
+#         the number of processes running for a site.
+# 'sqlite': Share the process registry and the request schedule of each
+#           site in throttle.sqlite3. Each request reserves the next slot,
+#           so the combined rate of all processes is limited exactly.
+throttle_backend = 'file'
+
+# How the throttle limits the request rate:
+# 'fixed': Wait the delays above between requests.
+# 'adaptive': Limit reads and writes by token buckets. Their rates are
+#             lowered on database lag, growing latency and errors and
+#             raised again while requests succeed, but never above the
+#             rates given by minthrottle and put_throttle.
+throttle_mode = 'fixed'
+
+# Highest read rate of the adaptive throttle in requests per second if
+# minthrottle is 0.
+adaptive_max_rate = 10.0
+
+# Number of requests the adaptive throttle allows in a burst.
+adaptive_read_burst = 5
+adaptive_write_burst = 1
+
 # Sometimes you want to know when a delay is inserted. If a delay is larger
 # than 'noisysleep' seconds, it is logged on the screen.
 noisysleep = 3.0
@@ -706,6 +771,11 @@ deIndentTables = True
 # that slow servers won't slow you down.
 max_external_links = 50
 
+# How many links to the same host should be checked at the same time and
+# how many seconds should be at least between two requests to a host?
+weblink_host_connections = 4
+weblink_host_delay = 0
+
 report_dead_links_on_talk = False
 
 # Don't alert on links days_dead old or younger
@@ -818,6 +888,18 @@ persistent_http = False
 # read timeout, or a single value for both in a tuple (since requests 2.4.0).
 socket_timeout = (6.05, 45)
 
+# Number of worker threads processing the non-blocking HTTP requests of
+# http._enqueue. Requests to different hosts run concurrently. Blocking
+# requests, which include all API requests, are still processed in the
+# calling thread, so only bots running several threads query different
+# sites concurrently. If not positive, no workers are started.
+http_workers = 0
+
+# Maximum number of concurrent HTTP requests to a single host when
+# http_workers is positive, including the blocking requests of all threads.
+# The site throttle still applies to each request.
+http_max_per_host = 2
+
 
 # ############# COSMETIC CHANGES SETTINGS ##############
 # The bot can make some additional changes to each page it edits, e.g. fix
@@ -897,6 +979,43 @@ simulate = False
 # processing. As higher this value this effect will decrease.
 max_queue_size = 64
 
+# Run asynchronous page saves in one thread per site instead of a single
+# thread. Saves to different sites are then done in parallel while each
+# site keeps its own write delay. Callbacks of different sites may run
+# concurrently.
+async_put_per_site = False
+
+# Number of edits which APISite.editpages and BaseBot.put_pages keep in
+# flight. The edits are still spaced by put_throttle, but an edit does not
+# wait for the response of the previous one. 1 submits one edit at a time.
+max_edits_in_flight = 1
+
+# How many batches of pages PreloadingGenerator retrieves in advance while
+# the current batch is processed. 0 disables prefetching.
+preload_prefetch = 0
+
+# Maximum size in MiB of the page text retrieved in advance by prefetching.
+# At least one batch is always retrieved. 0 means no limit.
+preload_prefetch_size = 64
+
+# Number of parsed links cached per site. Links with the same text, source
+# site and default namespace then reuse the parsed site, namespace and
+# title, which speeds up bots parsing the same links many times. The
+# hits and misses are returned by site.link_cache.info(). 0 disables the
+# cache.
+link_cache_size = 0
+
+# Number of categories whose members APISite.crawlcategories, e.g. used by
+# the -catcrawl generator option, retrieves concurrently. The requests are
+# still spaced by the throttle. 1 retrieves one category at a time.
+category_crawl_workers = 1
+
+# Number of page keys which the page generators combining other generators,
+# e.g. -union, -subtract and -intersect, keep in memory. When there are more,
+# they are moved to a temporary SQLite database. 0 keeps all of them in
+# memory and -intersect reads the generators in parallel threads.
+generator_spill_size = 0
+
 # Define the line separator. Pages retrieved via API have "\n" whereas
 # pages fetched from screen (mostly) have "\r\n". Interwiki and category
 # separator settings in family files should use multiplied of this.
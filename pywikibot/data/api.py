@@ -23,16 +23,12 @@ except ImportError:  # Python 2.7
 from email.mime.nonmultipart import MIMENonMultipart
 from warnings import warn
 
-try:
-    import cPickle as pickle  # noqa: N813
-except ImportError:
-    import pickle
-
 import pywikibot
 
 from pywikibot import config, login
 
 from pywikibot.comms import http
+from pywikibot.data import apicache, sitemeta
 from pywikibot.exceptions import (
     Server504Error, Server414Error, FatalServerError, NoUsername,
     Error, TimeoutError, InvalidTitle, UnsupportedPage
@@ -159,6 +155,27 @@ class APIMWException(APIError):
         super(APIMWException, self).__init__(code, info, **kwargs)
 
 
+def _user_key(site):
+    """
+    Return the user or login status the responses of a site depend on.
+
+    @rtype: str
+    """
+    login_status = site._loginstatus
+
+    if login_status > pywikibot.site.LoginStatus.NOT_LOGGED_IN and \
+            hasattr(site, '_userinfo') and \
+            'name' in site._userinfo:
+        # This uses the format of Page.__repr__, without performing
+        # config.console_encoding as done by Page.__repr__.
+        # The returned value can't be encoded to anything other than
+        # ascii otherwise it creates an exception when _create_file_name()
+        # tries to encode it as utf-8.
+        return 'User(User:%s)' % site._userinfo['name']
+    return repr(pywikibot.site.LoginStatus(
+        max(login_status, pywikibot.site.LoginStatus.NOT_LOGGED_IN)))
+
+
 class ParamInfo(Container):
 
     """
@@ -208,6 +225,72 @@ class ParamInfo(Container):
         if self.modules_only_mode:
             self.paraminfo_keys = frozenset(['modules'])
 
+        # number of modules in the metadata store
+        self._stored = 0
+        # the limits and the modules depend on the user
+        self._store_kind = None
+
+    def _store_key(self):
+        """Return the version and siteinfo hash the paraminfo is valid for."""
+        return (str(self.site.mw_version),
+                sitemeta.siteinfo_hash(self.site.siteinfo['general']))
+
+    def _load_stored(self):
+        """
+        Load the paraminfo of all modules from the metadata store.
+
+        The entries of the store are separated by the user the paraminfo
+        was requested as, which is the current user when it is loaded.
+
+        @return: whether the paraminfo was loaded
+        @rtype: bool
+        """
+        self._store_kind = 'paraminfo:' + _user_key(self.site)
+        store = sitemeta.get_store()
+        if not store:
+            return False
+        entry = store.load(str(self.site), self._store_kind)
+        if not entry:
+            return False
+        version, hash, data, _ = entry
+        if (version, hash) != self._store_key():
+            pywikibot.debug('Stored paraminfo of {0} is outdated'
+                            .format(self.site), _logger)
+            return False
+        self._paraminfo = data['paraminfo']
+        self._modules = {name: frozenset(modules)
+                         for name, modules in data['modules'].items()}
+        self._action_modules = frozenset(data['action_modules'])
+        self._limit = data['limit']
+        self.modules_only_mode = data['modules_only_mode']
+        if self.modules_only_mode:
+            self.paraminfo_keys = frozenset(['modules'])
+        self.preloaded_modules |= set(data['preloaded_modules'])
+        self._stored = len(self._paraminfo)
+        pywikibot.debug('Loaded paraminfo of {0} modules of {1} from the '
+                        'metadata store'.format(self._stored, self.site),
+                        _logger)
+        return True
+
+    def _save_stored(self):
+        """Save the paraminfo to the metadata store if it has grown."""
+        if len(self._paraminfo) == self._stored:
+            return
+        store = sitemeta.get_store()
+        if not store or not self._store_kind:
+            return
+        version, hash = self._store_key()
+        store.store(str(self.site), self._store_kind, version, hash, {
+            'paraminfo': self._paraminfo,
+            'modules': {name: sorted(modules)
+                        for name, modules in self._modules.items()},
+            'action_modules': sorted(self._action_modules),
+            'limit': self._limit,
+            'modules_only_mode': self.modules_only_mode,
+            'preloaded_modules': sorted(self.preloaded_modules),
+        })
+        self._stored = len(self._paraminfo)
+
     def _add_submodules(self, name, modules):
         """Add the modules to the internal cache or check if equal."""
         # The current implementation here doesn't support submodules inside of
@@ -230,6 +313,8 @@ class ParamInfo(Container):
         assert ('query' in self._modules) is ('main' in self._paraminfo)
         if 'query' in self._modules:
             return
+        if self._load_stored():
+            return
         mw_ver = self.site.mw_version
 
         if mw_ver < '1.15':
@@ -277,6 +362,7 @@ class ParamInfo(Container):
             assert 'query' not in self._paraminfo
             self._fetch({'query'})
         assert 'query' in self._modules
+        self._save_stored()
 
     def _emulate_pageset(self):
         """Emulate the pageset module, which existed in MW 1.15-1.24."""
@@ -384,6 +470,7 @@ class ParamInfo(Container):
                 assert not modules - self._action_modules - self.root_modules
 
         self._fetch(modules)
+        self._save_stored()
 
     def _fetch(self, modules):
         """
@@ -1065,6 +1152,135 @@ class EnableSSLSiteWrapper(object):
         return 'https'
 
 
+class _JSONCursor(object):
+
+    """Position in a JSON text which is decoded piece by piece."""
+
+    def __init__(self, text):
+        """Initializer."""
+        self.text = text
+        self.pos = 0
+        self.decoder = json.JSONDecoder()
+
+    def peek(self):
+        """Skip whitespace and return the next character."""
+        self.pos = json.decoder.WHITESPACE.match(self.text, self.pos).end()
+        return self.text[self.pos:self.pos + 1]
+
+    def expect(self, char):
+        """Skip whitespace and consume the given character."""
+        if self.peek() != char:
+            raise ValueError('Expecting {0!r} at char {1}'
+                             .format(char, self.pos))
+        self.pos += 1
+
+    def value(self):
+        """Decode the next value."""
+        self.peek()
+        value, self.pos = self.decoder.raw_decode(self.text, self.pos)
+        return value
+
+    def members(self, closing):
+        """
+        Iterate the members of the object or array which was just opened.
+
+        The caller has to consume the value of each member.
+
+        @param closing: '}' for an object or ']' for an array
+        @return: the keys of an object or None for the items of an array
+        """
+        first = True
+        while self.peek() != closing:
+            if not first:
+                self.expect(',')
+            first = False
+            if closing == '}':
+                self.expect('"')
+                key, self.pos = json.decoder.scanstring(self.text, self.pos)
+                self.expect(':')
+                yield key
+            else:
+                yield None
+        self.pos += 1
+
+    def end(self):
+        """Check that nothing but whitespace follows."""
+        if self.peek():
+            raise ValueError('Extra data at char {0}'.format(self.pos))
+
+
+class _StreamedResult(object):
+
+    """
+    Entries of a query result which are decoded while they are iterated.
+
+    The entries are the values of an object or the items of an array. The
+    members of the response following the result are added to its dicts
+    when the result is exhausted. A streamed result can only be iterated
+    once.
+    """
+
+    def __init__(self, entries):
+        """Initializer."""
+        self._entries = entries
+
+    def __iter__(self):
+        """Yield the decoded entries."""
+        for entry in self._entries:
+            yield entry
+
+    def finish(self):
+        """Skip the remaining entries to decode the rest of the response."""
+        for _ in self._entries:
+            pass
+
+
+def _stream_entries(cursor, data, resultkey):
+    """
+    Decode a query response, yielding the entries of the result lazily.
+
+    The generator yields None after the members preceding the result and
+    then the entries. It doesn't yield if the response has no result.
+    """
+    cursor.expect('{')
+    for key in cursor.members('}'):
+        if key != 'query' or cursor.peek() != '{':
+            data[key] = cursor.value()
+            continue
+        cursor.expect('{')
+        query = data['query'] = {}
+        for query_key in cursor.members('}'):
+            closing = {'{': '}', '[': ']'}.get(cursor.peek())
+            if query_key != resultkey or not closing:
+                query[query_key] = cursor.value()
+                continue
+            cursor.pos += 1
+            yield None
+            for _ in cursor.members(closing):
+                yield cursor.value()
+    cursor.end()
+
+
+def _stream_json(text, resultkey):
+    """
+    Decode a query response with a streamed result.
+
+    @param text: the JSON text
+    @type text: str
+    @param resultkey: the key of the result in the 'query' member
+    @type resultkey: str
+    @return: the response with a L{_StreamedResult} as result
+    @rtype: dict
+    @raises ValueError: the text is not valid JSON
+    """
+    data = {}
+    entries = _stream_entries(_JSONCursor(text), data, resultkey)
+    for _ in entries:
+        data['query'][resultkey] = _StreamedResult(entries)
+        break
+    return data
+
+
 class Request(MutableMapping):
 
     """A request to a Site's api.php interface.
@@ -1222,6 +1438,8 @@ class Request(MutableMapping):
         self.action = parameters['action']
         self.update(parameters)  # also convert all parameter values to lists
         self._warning_handler = None
+        # key of the query result which is decoded while it is iterated
+        self._stream_key = None
         # Actions that imply database updates on the server, used for various
         # things like throttling or skipping actions when we're in simulation
         # mode
@@ -1783,7 +2001,10 @@ class Request(MutableMapping):
         if data.startswith('unknown_action'):
             raise APIError(data[:14], data[16:])
         try:
-            result = json.loads(data)
+            if self._stream_key:
+                result = _stream_json(data, self._stream_key)
+            else:
+                result = json.loads(data)
         except ValueError:
             # if the result isn't valid JSON, there must be a server
             # problem. Wait a few seconds and try again
@@ -2159,22 +2380,7 @@ class CachedRequest(Request):
 
         @rtype: str
         """
-        login_status = self.site._loginstatus
-
-        if login_status > pywikibot.site.LoginStatus.NOT_LOGGED_IN and \
-                hasattr(self.site, '_userinfo') and \
-                'name' in self.site._userinfo:
-            # This uses the format of Page.__repr__, without performing
-            # config.console_encoding as done by Page.__repr__.
-            # The returned value can't be encoded to anything other than
-            # ascii otherwise it creates an exception when _create_file_name()
-            # tries to encode it as utf-8.
-            user_key = 'User(User:%s)' % self.site._userinfo['name']
-        else:
-            user_key = pywikibot.site.LoginStatus(
-                max(login_status, pywikibot.site.LoginStatus.NOT_LOGGED_IN))
-            user_key = repr(user_key)
-
+        user_key = _user_key(self.site)
         request_key = repr(sorted(list(self._encoded_items().items())))
         return repr(self.site) + user_key + request_key
 
@@ -2195,6 +2401,18 @@ class CachedRequest(Request):
     def _expired(self, dt):
         return dt + self.expiry < datetime.datetime.utcnow()
 
+    @classmethod
+    def _get_cache_backend(cls):
+        """
+        Return the storage backend for cache entries.
+
+        The backend is selected by config.API_cache_backend.
+
+        @rtype: pywikibot.data.apicache.CacheBackend
+        """
+        return apicache.get_backend(config.API_cache_backend,
+                                    cls._get_cache_dir())
+
     def _load_cache(self):
         """Load cache entry for request, if available.
 
@@ -2203,34 +2421,35 @@ class CachedRequest(Request):
         """
         self._add_defaults()
         try:
-            filename = self._cachefile_path()
-            with open(filename, 'rb') as f:
-                uniquedescr, self._data, self._cachetime = pickle.load(f)
+            key = self._create_file_name()
+            entry = self._get_cache_backend().load(key)
+            if entry is None:
+                return False
+            uniquedescr, self._data, self._cachetime = entry
             assert(uniquedescr == self._uniquedescriptionstr())
             if self._expired(self._cachetime):
                 self._data = None
                 return False
             pywikibot.debug('%s: cache hit (%s) for API request: %s'
-                            % (self.__class__.__name__, filename, uniquedescr),
+                            % (self.__class__.__name__, key, uniquedescr),
                             _logger)
             return True
-        except IOError:
-            # file not found
-            return False
         except Exception as e:
             pywikibot.output('Could not load cache: %r' % e)
             return False
 
     def _write_cache(self, data):
-        """Write data to self._cachefile_path()."""
-        data = (self._uniquedescriptionstr(), data, datetime.datetime.utcnow())
-        with open(self._cachefile_path(), 'wb') as f:
-            pickle.dump(data, f, protocol=config.pickle_protocol)
+        """Write data to the cache backend."""
+        self._get_cache_backend().store(
+            self._create_file_name(), self.site, self._uniquedescriptionstr(),
+            data, datetime.datetime.utcnow(), self.expiry)
 
     def submit(self):
         """Submit cached request."""
         cached_available = self._load_cache()
         if not cached_available:
+            # the cache stores the decoded response
+            self._stream_key = None
             self._data = super(CachedRequest, self).submit()
             self._write_cache(self._data)
         else:
@@ -2748,7 +2967,10 @@ class QueryGenerator(_RequestWrapper):
     def _get_resultdata(self):
         """Get resultdata and verify result."""
         resultdata = keys = self.data['query'][self.resultkey]
-        if isinstance(resultdata, dict):
+        if isinstance(resultdata, _StreamedResult):
+            # the entries are yielded in the order of the response
+            keys = 'a streamed result'
+        elif isinstance(resultdata, dict):
             keys = list(resultdata.keys())
             if 'results' in resultdata:
                 resultdata = resultdata['results']
@@ -2804,6 +3026,8 @@ class QueryGenerator(_RequestWrapper):
             prev_limit, new_limit = self._handle_query_limit(
                 prev_limit, new_limit, previous_result_had_data)
             if not hasattr(self, 'data'):
+                self.request._stream_key = (
+                    self.resultkey if config.API_stream_results else None)
                 self.data = self.request.submit()
             if not self.data or not isinstance(self.data, dict):
                 pywikibot.debug(
@@ -2824,6 +3048,10 @@ class QueryGenerator(_RequestWrapper):
                         yield result
                 except RuntimeError:
                     return
+                if isinstance(resultdata, _StreamedResult):
+                    # decode the members following the result, e.g.
+                    # the continuation
+                    resultdata.finish()
                 # self.resultkey in data in last request.submit()
                 previous_result_had_data = True
             else:
@@ -2987,6 +3215,10 @@ class PropertyGenerator(QueryGenerator):
 
     def _extract_results(self, resultdata):
         """Yield completed page_data of consecutive API requests."""
+        if isinstance(resultdata, _StreamedResult):
+            for d in self._extract_streamed_results(resultdata):
+                yield d
+            return
         for d in self._fully_retrieved_data_dicts(resultdata):
             yield d
         for data_dict in super(PropertyGenerator, self)._extract_results(
@@ -2996,6 +3228,33 @@ class PropertyGenerator(QueryGenerator):
             if d is not data_dict:
                 self._update_old_result_dict(d, data_dict)
 
+    def _extract_streamed_results(self, resultdata):
+        """
+        Yield completed page_data of a streamed result.
+
+        If the response completes the batch of pages, they are yielded
+        as they are decoded. Otherwise they are kept until they are no
+        longer continued, like for a decoded result. Pages of previous
+        responses which are not continued are yielded after the pages
+        of the response.
+        """
+        batchcomplete = 'batchcomplete' in self.data
+        titles = set()
+        for data_dict in super(PropertyGenerator, self)._extract_results(
+            resultdata
+        ):
+            title = data_dict['title']
+            titles.add(title)
+            d = self._previous_dicts.setdefault(title, data_dict)
+            if d is not data_dict:
+                self._update_old_result_dict(d, data_dict)
+            if batchcomplete:
+                yield self._previous_dicts.pop(title)
+        for prev_title, prev_dict in list(self._previous_dicts.items()):
+            if prev_title not in titles:
+                yield prev_dict
+                del self._previous_dicts[prev_title]
+
     def _fully_retrieved_data_dicts(self, resultdata):
         """Yield items of self._previous_dicts that are not in resultdata."""
         resuldata_titles = {d['title'] for d in resultdata}
@@ -0,0 +1,367 @@
+# -*- coding: utf-8 -*-
+"""Storage backends for cached API requests.
+
+A backend stores the pickled response of a L{CachedRequest} together
+with its unique description string and the time it was cached.
+Entries are addressed by the key created by
+C{CachedRequest._create_file_name}.
+
+Two backends are available and selected by C{config.API_cache_backend}:
+
+ - L{FileCacheBackend} stores one pickle file per entry. This is the
+   historical layout of the C{apicache} directories.
+ - L{SQLiteCacheBackend} stores all entries in a single SQLite file
+   which is indexed by site, cache time, expiry and last access. It
+   supports bulk expiry and size bounded LRU eviction without loading
+   the entries themselves.
+"""
+#
+# (C) Pywikibot team, 2019
+#
+# Distributed under the terms of the MIT license.
+#
+from __future__ import absolute_import, division, unicode_literals
+
+import datetime
+import os
+import sqlite3
+import threading
+
+try:
+    import cPickle as pickle  # noqa: N813
+except ImportError:
+    import pickle
+
+import pywikibot
+
+from pywikibot import config
+from pywikibot.tools import StringTypes
+
+_logger = 'data.apicache'
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+_backends = {}
+_backends_lock = threading.Lock()
+
+
+def _to_seconds(dt):
+    """Convert a naive UTC datetime into seconds since the epoch."""
+    return (dt - _EPOCH).total_seconds()
+
+
+def _from_seconds(seconds):
+    """Convert seconds since the epoch into a naive UTC datetime."""
+    return _EPOCH + datetime.timedelta(seconds=seconds)
+
+
+def _site_key(site):
+    """Return the string used to identify a site in the cache index."""
+    if site is None or isinstance(site, StringTypes):
+        return site
+    return repr(site)
+
+
+class CacheBackend(object):
+
+    """Base class for API cache storage backends."""
+
+    def load(self, key):
+        """
+        Load a cache entry.
+
+        @param key: key of the entry
+        @type key: str
+        @return: tuple of description, data and cache time or None if the
+            entry does not exist
+        @rtype: tuple or None
+        """
+        raise NotImplementedError
+
+    def store(self, key, site, description, data, cachetime, expiry):
+        """
+        Store a cache entry, replacing an existing entry with the same key.
+
+        @param key: key of the entry
+        @type key: str
+        @param site: the site the request was made to
+        @type site: BaseSite or str
+        @param description: unique description of the request
+        @type description: str
+        @param data: the response data
+        @param cachetime: time the entry was created (UTC)
+        @type cachetime: datetime.datetime
+        @param expiry: lifetime of the entry
+        @type expiry: datetime.timedelta
+        """
+        raise NotImplementedError
+
+    def delete(self, key):
+        """Delete a cache entry if it exists."""
+        raise NotImplementedError
+
+    def entries(self, site=None, older_than=None, expired=False):
+        """
+        Iterate over the entries without loading their data.
+
+        @param site: only yield entries of this site
+        @type site: BaseSite or str
+        @param older_than: only yield entries older than this interval
+        @type older_than: datetime.timedelta
+        @param expired: only yield entries which are expired
+        @type expired: bool
+        @return: tuples of key, site, description and cache time
+        @rtype: generator
+        """
+        raise NotImplementedError
+
+    def purge(self, site=None, older_than=None, expired=False):
+        """
+        Delete all matching entries.
+
+        The parameters are the same as for L{entries}.
+
+        @return: number of deleted entries
+        @rtype: int
+        """
+        count = 0
+        for key, _, _, _ in list(self.entries(site, older_than, expired)):
+            self.delete(key)
+            count += 1
+        return count
+
+
+class FileCacheBackend(CacheBackend):
+
+    """Cache backend storing one pickle file per entry."""
+
+    def __init__(self, directory):
+        """Initializer.
+
+        @param directory: directory containing the cache files
+        @type directory: str
+        """
+        self.directory = directory
+
+    def _path(self, key):
+        """Return the file path of an entry."""
+        return os.path.join(self.directory, key)
+
+    def load(self, key):
+        """Load a cache entry from its file."""
+        try:
+            with open(self._path(key), 'rb') as f:
+                description, data, cachetime = pickle.load(f)
+        except IOError:
+            # file not found
+            return None
+        return description, data, cachetime
+
+    def store(self, key, site, description, data, cachetime, expiry):
+        """Write a cache entry into its own file."""
+        with open(self._path(key), 'wb') as f:
+            pickle.dump((description, data, cachetime), f,
+                        protocol=config.pickle_protocol)
+
+    def delete(self, key):
+        """Delete the file of a cache entry."""
+        try:
+            os.remove(self._path(key))
+        except OSError:
+            pass
+
+    def entries(self, site=None, older_than=None, expired=False):
+        """
+        Iterate over the entries.
+
+        The file layout has no index, so every entry must be unpickled.
+        C{expired} is not supported as the expiry is not stored with the
+        entry.
+        """
+        if expired:
+            raise NotImplementedError(
+                'Expiry is not recorded by {0}'.format(
+                    self.__class__.__name__))
+        site = _site_key(site)
+        now = datetime.datetime.utcnow()
+        for key in os.listdir(self.directory):
+            entry = self.load(key)
+            if entry is None:
+                continue
+            description, _, cachetime = entry
+            entry_site = description[:description.find(')') + 1]
+            if site and entry_site != site:
+                continue
+            if older_than and cachetime + older_than >= now:
+                continue
+            yield key, entry_site, description, cachetime
+
+
+class SQLiteCacheBackend(CacheBackend):
+
+    """
+    Cache backend storing all entries in a single SQLite database.
+
+    Each entry is one row indexed by site, cache time, expiry time and
+    last access time. Lookups only touch a single file and expiry or
+    eviction are done with indexed queries.
+    """
+
+    _schema = (
+        'CREATE TABLE IF NOT EXISTS entries ('
+        ' key TEXT PRIMARY KEY,'
+        ' site TEXT NOT NULL,'
+        ' description TEXT NOT NULL,'
+        ' data BLOB NOT NULL,'
+        ' cachetime REAL NOT NULL,'
+        ' expiry REAL NOT NULL,'
+        ' accessed REAL NOT NULL,'
+        ' size INTEGER NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS entries_site ON entries (site)',
+        'CREATE INDEX IF NOT EXISTS entries_cachetime ON entries (cachetime)',
+        'CREATE INDEX IF NOT EXISTS entries_expiry ON entries (expiry)',
+        'CREATE INDEX IF NOT EXISTS entries_accessed ON entries (accessed)',
+    )
+
+    def __init__(self, filename, max_size=0):
+        """Initializer.
+
+        @param filename: path of the database file
+        @type filename: str
+        @param max_size: maximum total size of the stored data in bytes.
+            The least recently used entries are evicted when it is
+            exceeded. If not positive the size is not limited.
+        @type max_size: int
+        """
+        self.filename = filename
+        self.max_size = max_size
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(filename, check_same_thread=False)
+        with self._lock, self._connection:
+            for statement in self._schema:
+                self._connection.execute(statement)
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._connection.close()
+
+    @staticmethod
+    def _where(site, older_than, expired):
+        """Return the WHERE clause and its parameters for a selection."""
+        clauses = []
+        params = []
+        site = _site_key(site)
+        if site:
+            clauses.append('site = ?')
+            params.append(site)
+        if older_than:
+            clauses.append('cachetime < ?')
+            params.append(
+                _to_seconds(datetime.datetime.utcnow() - older_than))
+        if expired:
+            clauses.append('expiry < ?')
+            params.append(_to_seconds(datetime.datetime.utcnow()))
+        if not clauses:
+            return '', params
+        return ' WHERE ' + ' AND '.join(clauses), params
+
+    def load(self, key):
+        """Load a cache entry and update its access time."""
+        with self._lock, self._connection:
+            row = self._connection.execute(
+                'SELECT description, data, cachetime FROM entries '
+                'WHERE key = ?', (key, )).fetchone()
+            if row is None:
+                return None
+            self._connection.execute(
+                'UPDATE entries SET accessed = ? WHERE key = ?',
+                (_to_seconds(datetime.datetime.utcnow()), key))
+        description, data, cachetime = row
+        return description, pickle.loads(bytes(data)), _from_seconds(cachetime)
+
+    def store(self, key, site, description, data, cachetime, expiry):
+        """Insert or replace a cache entry and evict if necessary."""
+        blob = pickle.dumps(data, protocol=config.pickle_protocol)
+        seconds = _to_seconds(cachetime)
+        with self._lock, self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO entries (key, site, description, '
+                'data, cachetime, expiry, accessed, size) '
+                'VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                (key, _site_key(site), description, sqlite3.Binary(blob),
+                 seconds, seconds + expiry.total_seconds(), seconds,
+                 len(blob)))
+            if self.max_size > 0:
+                self._evict(self.max_size)
+
+    def delete(self, key):
+        """Delete a cache entry."""
+        with self._lock, self._connection:
+            self._connection.execute(
+                'DELETE FROM entries WHERE key = ?', (key, ))
+
+    def entries(self, site=None, older_than=None, expired=False):
+        """Iterate over the entries using the index only."""
+        where, params = self._where(site, older_than, expired)
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT key, site, description, cachetime FROM entries'
+                + where + ' ORDER BY cachetime', params).fetchall()
+        for key, site, description, cachetime in rows:
+            yield key, site, description, _from_seconds(cachetime)
+
+    def purge(self, site=None, older_than=None, expired=False):
+        """Delete all matching entries with a single query."""
+        where, params = self._where(site, older_than, expired)
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                'DELETE FROM entries' + where, params)
+        return cursor.rowcount
+
+    def size(self):
+        """Return the total size of the stored data in bytes."""
+        with self._lock:
+            total = self._connection.execute(
+                'SELECT SUM(size) FROM entries').fetchone()[0]
+        return total or 0
+
+    def _evict(self, max_size):
+        """Delete least recently used entries until max_size is reached."""
+        excess = self.size() - max_size
+        if excess <= 0:
+            return
+        keys = []
+        for key, size in self._connection.execute(
+                'SELECT key, size FROM entries ORDER BY accessed'):
+            keys.append((key, ))
+            excess -= size
+            if excess <= 0:
+                break
+        self._connection.executemany(
+            'DELETE FROM entries WHERE key = ?', keys)
+        pywikibot.debug('{0}: evicted {1} entries'
+                        .format(self.__class__.__name__, len(keys)), _logger)
+
+
+def get_backend(name, path):
+    """
+    Return the shared cache backend instance.
+
+    @param name: backend name, either 'file' or 'sqlite'
+    @type name: str
+    @param path: the cache directory. The SQLite backend uses a database
+        file next to it with the suffix '.sqlite3'.
+    @type path: str
+    @rtype: CacheBackend
+    """
+    if name == 'file':
+        return FileCacheBackend(path)
+    if name != 'sqlite':
+        raise ValueError('Unknown API cache backend {0!r}'.format(name))
+    filename = path + '.sqlite3'
+    with _backends_lock:
+        if filename not in _backends:
+            _backends[filename] = SQLiteCacheBackend(
+                filename, config.API_cache_size * 1024 * 1024)
+        return _backends[filename]
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""Persistent store for the content of revisions.
+
+Bots which repeatedly work on the same pages, e.g. replace.py or
+category.py, download the text of pages which did not change since the
+previous run. With C{config.revision_store_size} set, the revisions
+retrieved with their content by L{APISite.preloadpages} are kept in a
+single SQLite database per user. The content of a revision never
+changes, so the store is keyed by site and revision id and preloadpages
+only downloads the content of revisions which are not stored yet.
+
+The revisions are stored as zlib compressed JSON. When the total size
+exceeds the limit, the least recently used revisions are evicted.
+"""
+#
+# (C) Pywikibot team, 2019
+#
+# Distributed under the terms of the MIT license.
+#
+from __future__ import absolute_import, division, unicode_literals
+
+import json
+import sqlite3
+import threading
+import time
+import zlib
+
+import pywikibot
+
+from pywikibot import config
+from pywikibot.tools import CacheInfo
+
+_logger = 'data.revisionstore'
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+class RevisionStore(object):
+
+    """
+    SQLite database holding the revisions of pages by site and revid.
+
+    The revisions are the dicts of the API response including the
+    content. The hits and misses of L{load} are counted.
+    """
+
+    _schema = (
+        'CREATE TABLE IF NOT EXISTS revisions ('
+        ' site TEXT NOT NULL,'
+        ' revid INTEGER NOT NULL,'
+        ' data BLOB NOT NULL,'
+        ' accessed REAL NOT NULL,'
+        ' size INTEGER NOT NULL,'
+        ' PRIMARY KEY (site, revid))',
+        'CREATE INDEX IF NOT EXISTS revisions_accessed '
+        'ON revisions (accessed)',
+    )
+
+    def __init__(self, filename, max_size=0):
+        """Initializer.
+
+        @param filename: path of the database file
+        @type filename: str
+        @param max_size: maximum total size of the stored data in bytes.
+            The least recently used revisions are evicted when it is
+            exceeded. If not positive the size is not limited.
+        @type max_size: int
+        """
+        self.filename = filename
+        self.max_size = max_size
+        self.hits = 0
+        self.misses = 0
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(filename, timeout=60,
+                                           check_same_thread=False)
+        with self._lock, self._connection:
+            for statement in self._schema:
+                self._connection.execute(statement)
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._connection.close()
+
+    def load(self, site, revids):
+        """
+        Load revisions and update their access time.
+
+        @param site: the site identifier
+        @type site: str
+        @param revids: the revision ids
+        @type revids: iterable of int
+        @return: the stored revisions by revision id
+        @rtype: dict
+        """
+        revids = list(revids)
+        revisions = {}
+        with self._lock, self._connection:
+            # SQLite allows 999 variables per statement
+            for start in range(0, len(revids), 500):
+                chunk = revids[start:start + 500]
+                rows = self._connection.execute(
+                    'SELECT revid, data FROM revisions WHERE site = ? AND '
+                    'revid IN ({0})'.format(', '.join('?' * len(chunk))),
+                    [site] + chunk).fetchall()
+                for revid, data in rows:
+                    revisions[revid] = json.loads(
+                        zlib.decompress(bytes(data)).decode('utf-8'))
+            if revisions:
+                self._connection.executemany(
+                    'UPDATE revisions SET accessed = ? '
+                    'WHERE site = ? AND revid = ?',
+                    [(time.time(), site, revid) for revid in revisions])
+            self.hits += len(revisions)
+            self.misses += len(revids) - len(revisions)
+        return revisions
+
+    def store(self, site, revisions):
+        """
+        Store revisions and evict if necessary.
+
+        @param site: the site identifier
+        @type site: str
+        @param revisions: the revisions of the API response with their
+            content
+        @type revisions: iterable of dict
+        """
+        now = time.time()
+        rows = []
+        for revision in revisions:
+            blob = zlib.compress(json.dumps(revision).encode('utf-8'))
+            rows.append((site, revision['revid'], sqlite3.Binary(blob), now,
+                         len(blob)))
+        with self._lock, self._connection:
+            self._connection.executemany(
+                'INSERT OR REPLACE INTO revisions '
+                '(site, revid, data, accessed, size) VALUES (?, ?, ?, ?, ?)',
+                rows)
+            if self.max_size > 0:
+                self._evict(self.max_size)
+
+    def purge(self, site=None):
+        """
+        Delete the revisions of a site or of all sites.
+
+        @return: number of deleted revisions
+        @rtype: int
+        """
+        where, params = (' WHERE site = ?', [site]) if site else ('', [])
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                'DELETE FROM revisions' + where, params)
+        return cursor.rowcount
+
+    def size(self):
+        """Return the total size of the stored data in bytes."""
+        with self._lock:
+            total = self._connection.execute(
+                'SELECT SUM(size) FROM revisions').fetchone()[0]
+        return total or 0
+
+    def info(self):
+        """
+        Return the statistics of the store.
+
+        The sizes are in bytes.
+
+        @rtype: CacheInfo
+        """
+        return CacheInfo(self.hits, self.misses, self.max_size, self.size())
+
+    def _evict(self, max_size):
+        """Delete least recently used revisions until max_size is reached."""
+        excess = self.size() - max_size
+        if excess <= 0:
+            return
+        keys = []
+        for site, revid, size in self._connection.execute(
+                'SELECT site, revid, size FROM revisions ORDER BY accessed'):
+            keys.append((site, revid))
+            excess -= size
+            if excess <= 0:
+                break
+        self._connection.executemany(
+            'DELETE FROM revisions WHERE site = ? AND revid = ?', keys)
+        pywikibot.debug('{0}: evicted {1} revisions'
+                        .format(self.__class__.__name__, len(keys)), _logger)
+
+
+def get_store():
+    """
+    Return the shared revision store.
+
+    @return: the store or None if config.revision_store_size is not
+        positive
+    @rtype: RevisionStore or None
+    """
+    if config.revision_store_size <= 0:
+        return None
+    filename = config.datafilepath('revisions.sqlite3')
+    with _stores_lock:
+        if filename not in _stores:
+            _stores[filename] = RevisionStore(
+                filename, config.revision_store_size * 1024 * 1024)
+        return _stores[filename]
@@ -0,0 +1,184 @@
+# -*- coding: utf-8 -*-
+"""Persistent store for the paraminfo and siteinfo of sites.
+
+A process which uses a site for the first time has to request the
+siteinfo and the paraminfo of the API modules before it can make other
+requests. With C{config.API_metadata_store} enabled, both are kept in a
+single SQLite database per user, so a process loads them with one read
+per site.
+
+Each entry is stored with the MediaWiki version and a hash of the
+general siteinfo it belongs to. The paraminfo is only used while both
+match the current siteinfo. As the limits and the available modules
+depend on the user, it is stored per user or login status. The siteinfo
+is refreshed in the background when it is older than
+C{config.API_config_expiry} days.
+"""
+#
+# (C) Pywikibot team, 2019
+#
+# Distributed under the terms of the MIT license.
+#
+from __future__ import absolute_import, division, unicode_literals
+
+import datetime
+import hashlib
+import json
+import sqlite3
+import threading
+
+from pywikibot import config
+
+_logger = 'data.sitemeta'
+
+_EPOCH = datetime.datetime(1970, 1, 1)
+
+_stores = {}
+_stores_lock = threading.Lock()
+
+# values of the general siteinfo which change without a change of the site
+VOLATILE_GENERAL_KEYS = frozenset(['time'])
+
+
+def siteinfo_hash(general):
+    """
+    Return the hash of the general siteinfo.
+
+    @param general: the general siteinfo
+    @type general: dict
+    @rtype: str
+    """
+    general = {key: value for key, value in general.items()
+               if key not in VOLATILE_GENERAL_KEYS}
+    return hashlib.sha1(
+        json.dumps(general, sort_keys=True).encode('utf-8')).hexdigest()
+
+
+class SiteMetadataStore(object):
+
+    """
+    SQLite database holding one entry per site and kind of metadata.
+
+    The data is stored as JSON.
+    """
+
+    _schema = (
+        'CREATE TABLE IF NOT EXISTS metadata ('
+        ' site TEXT NOT NULL,'
+        ' kind TEXT NOT NULL,'
+        ' version TEXT,'
+        ' hash TEXT,'
+        ' data TEXT NOT NULL,'
+        ' stored REAL NOT NULL,'
+        ' PRIMARY KEY (site, kind))',
+    )
+
+    def __init__(self, filename):
+        """Initializer.
+
+        @param filename: path of the database file
+        @type filename: str
+        """
+        self.filename = filename
+        self._lock = threading.RLock()
+        self._connection = sqlite3.connect(filename, timeout=60,
+                                           check_same_thread=False)
+        with self._lock, self._connection:
+            for statement in self._schema:
+                self._connection.execute(statement)
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._connection.close()
+
+    def load(self, site, kind):
+        """
+        Load an entry.
+
+        @param site: the site identifier
+        @type site: str
+        @param kind: 'siteinfo' or 'paraminfo:' followed by the user
+        @type kind: str
+        @return: tuple of version, hash, data and the time it was stored
+            or None if there is no entry
+        @rtype: tuple or None
+        """
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT version, hash, data, stored FROM metadata '
+                'WHERE site = ? AND kind = ?', (site, kind)).fetchone()
+        if row is None:
+            return None
+        version, hash, data, stored = row
+        return (version, hash, json.loads(data),
+                _EPOCH + datetime.timedelta(seconds=stored))
+
+    def store(self, site, kind, version, hash, data):
+        """
+        Store an entry, replacing the previous one.
+
+        @param site: the site identifier
+        @type site: str
+        @param kind: 'siteinfo' or 'paraminfo:' followed by the user
+        @type kind: str
+        @param version: the MediaWiki version of the site
+        @type version: str
+        @param hash: the hash of the general siteinfo
+        @type hash: str
+        @param data: JSON serializable data
+        """
+        stored = (datetime.datetime.utcnow() - _EPOCH).total_seconds()
+        data = json.dumps(data, sort_keys=True)
+        with self._lock, self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO metadata '
+                '(site, kind, version, hash, data, stored) '
+                'VALUES (?, ?, ?, ?, ?, ?)',
+                (site, kind, version, hash, data, stored))
+
+    def delete(self, site=None, kind=None):
+        """
+        Delete the entries of a site or of all sites.
+
+        @return: number of deleted entries
+        @rtype: int
+        """
+        clauses = []
+        params = []
+        if site:
+            clauses.append('site = ?')
+            params.append(site)
+        if kind:
+            clauses.append('kind = ?')
+            params.append(kind)
+        where = ' WHERE ' + ' AND '.join(clauses) if clauses else ''
+        with self._lock, self._connection:
+            cursor = self._connection.execute(
+                'DELETE FROM metadata' + where, params)
+        return cursor.rowcount
+
+    def sites(self):
+        """Return the sites which have entries."""
+        with self._lock:
+            rows = self._connection.execute(
+                'SELECT DISTINCT site FROM metadata ORDER BY site').fetchall()
+        return [row[0] for row in rows]
+
+
+def get_store(force=False):
+    """
+    Return the shared metadata store.
+
+    @param force: return the store even if config.API_metadata_store is
+        disabled
+    @type force: bool
+    @rtype: SiteMetadataStore or None
+    """
+    if not (force or config.API_metadata_store):
+        return None
+    filename = config.datafilepath('sitemeta.sqlite3')
+    with _stores_lock:
+        if filename not in _stores:
+            _stores[filename] = SiteMetadataStore(filename)
+        return _stores[filename]
@@ -0,0 +1,245 @@
+# -*- coding: utf-8 -*-
+"""Offline index resolving URLs to the family and code of a site.
+
+C{pywikibot.Site(url=...)} and the interwiki prefixes of a site need the
+site a URL belongs to. L{Family.from_url} loads every family file and
+creates the sites whose hostname matches, which requests their siteinfo
+to compare the article path.
+
+With C{config.family_url_index} enabled, the hostnames and script paths
+of all codes of the registered families are kept in the file
+urlindex.json, so a URL is resolved with dictionary lookups. The index
+is rebuilt when a family file is registered, changed or removed. The
+article path of a site is only known from its siteinfo; it is added to
+the index the first time it is needed.
+"""
+#
+# (C) Pywikibot team, 2019
+#
+# Distributed under the terms of the MIT license.
+#
+from __future__ import absolute_import, division, unicode_literals
+
+import json
+import os
+import re
+import threading
+
+import pywikibot
+
+from pywikibot import config
+from pywikibot.exceptions import UnknownFamily
+from pywikibot.family import Family
+from pywikibot.tools import PY2
+
+if not PY2:
+    from urllib.parse import urlparse
+else:
+    from urlparse import urlparse
+
+_logger = 'data.urlindex'
+
+_index = None
+_index_lock = threading.Lock()
+
+
+def _family_files_key():
+    """
+    Return the state of the registered family files.
+
+    @return: list of family name, file, modification time and size
+    @rtype: list
+    """
+    key = []
+    for name, path in sorted(config.family_files.items()):
+        try:
+            stat = os.stat(path)
+        except OSError:
+            # the family file is an URL
+            key.append([name, path, None, None])
+        else:
+            key.append([name, path, stat.st_mtime, stat.st_size])
+    return key
+
+
+def _url_path(url):
+    """
+    Return the hostname and path of a URL as used by L{Family.from_url}.
+
+    @return: netloc and path without the $1 placeholder or None if the
+        scheme is not supported
+    @rtype: tuple or None
+    @raises ValueError: When text is present after $1.
+    """
+    parsed = urlparse(url)
+    if not re.match('^(https?)?$', parsed.scheme):
+        return None
+    path = parsed.path
+    if parsed.query:
+        path += '?' + parsed.query
+    path, _, suffix = path.partition('$1')
+    if suffix:
+        raise ValueError('Text after the $1 placeholder is not supported '
+                         '(T111513).')
+    return parsed.netloc, path
+
+
+class FamilyUrlIndex(object):
+
+    """
+    Index of the hostnames and paths of the codes of all families.
+
+    The entries of a hostname are lists of family name, code and the
+    path prefixes of index.php. The article paths are stored separately
+    per family and code.
+    """
+
+    def __init__(self, filename):
+        """Initializer.
+
+        @param filename: path of the index file
+        @type filename: str
+        """
+        self.filename = filename
+        self._lock = threading.RLock()
+        self.family_files = {}
+        self.hosts = {}
+        self.article_paths = {}
+        self._key = None
+        self._load()
+
+    def _load(self):
+        """Load the index file and rebuild it if it is outdated."""
+        key = _family_files_key()
+        try:
+            with open(self.filename) as f:
+                data = json.load(f)
+        except (IOError, ValueError):
+            data = {}
+        if data.get('family_files') == key:
+            self._key = key
+            self.family_files = dict(config.family_files)
+            self.hosts = data['hosts']
+            self.article_paths = data['article_paths']
+        else:
+            self.build()
+
+    def _save(self):
+        """Write the index file, replacing it at once."""
+        data = {'family_files': self._key,
+                'hosts': self.hosts,
+                'article_paths': self.article_paths}
+        temp = '{0}.{1}'.format(self.filename, os.getpid())
+        try:
+            with open(temp, 'w') as f:
+                json.dump(data, f, sort_keys=True)
+            if os.name == 'nt' and os.path.exists(self.filename):
+                os.remove(self.filename)
+            os.rename(temp, self.filename)
+        except (IOError, OSError) as e:
+            pywikibot.debug('Could not write {0}: {1}'
+                            .format(self.filename, e), _logger)
+
+    def build(self):
+        """Build the index from the registered family files and save it."""
+        hosts = {}
+        for name in sorted(config.family_files):
+            try:
+                family = Family.load(name)
+            except UnknownFamily as e:
+                pywikibot.warning('{0}: {1}'.format(name, e))
+                continue
+            if family._ignore_from_url is True:
+                continue
+            for code in family.codes:
+                if code in family._ignore_from_url:
+                    continue
+                try:
+                    host = family._hostname(code)[1]
+                    path = family.path(code)
+                except KeyError:
+                    continue
+                hosts.setdefault(host, []).append(
+                    [family.name, code, [path, path + '/', path + '?title=']])
+        with self._lock:
+            self._key = _family_files_key()
+            self.family_files = dict(config.family_files)
+            self.hosts = hosts
+            self.article_paths = {}
+            self._save()
+        pywikibot.log('Indexed {0} hostnames of {1} families'.format(
+            len(hosts), len(config.family_files)))
+
+    def _article_path(self, family, code):
+        """Return the article path of a site, requesting it if unknown."""
+        key = '{0}:{1}'.format(family, code)
+        with self._lock:
+            if key not in self.article_paths:
+                site = pywikibot.Site(code, family)
+                pywikibot.log('Found candidate {0}'.format(site))
+                self.article_paths[key] = site.article_path
+                self._save()
+            return self.article_paths[key]
+
+    def lookup(self, url):
+        """
+        Return the sites matching a URL.
+
+        The matching rules are the same as for L{Family.from_url}.
+
+        @param url: the URL which may contain a C{$1}
+        @type url: str
+        @return: pairs of code and family name
+        @rtype: list of tuple
+        @raises RuntimeError: When there are multiple codes of a family
+            which would work with the given URL.
+        @raises ValueError: When text is present after $1.
+        """
+        parsed = _url_path(url)
+        if parsed is None:
+            return []
+        netloc, path = parsed
+        candidates = self.hosts.get(netloc, [])
+        matches = {}
+        for family, code, prefixes in candidates:
+            if any(path.startswith(prefix) for prefix in prefixes):
+                matches.setdefault(family, []).append(code)
+        if not matches:
+            # the article paths may need the siteinfo, so they are only
+            # compared if no index.php path matches
+            for family, code, _ in candidates:
+                if path.startswith(self._article_path(family, code)):
+                    matches.setdefault(family, []).append(code)
+        sites = []
+        for family in sorted(matches, key=self._family_order):
+            codes = matches[family]
+            if len(codes) > 1:
+                raise RuntimeError(
+                    'Found multiple matches for URL "{0}": {1}'
+                    .format(url, ', '.join(
+                        '{0}:{1}'.format(family, code) for code in codes)))
+            sites.append((codes[0], family))
+        return sites
+
+    @staticmethod
+    def _family_order(family):
+        """Return the position of a family in config.family_files."""
+        return list(config.family_files).index(family) \
+            if family in config.family_files else len(config.family_files)
+
+
+def get_index():
+    """
+    Return the shared URL index.
+
+    @rtype: FamilyUrlIndex
+    """
+    global _index
+    with _index_lock:
+        filename = config.datafilepath('urlindex.json')
+        if _index is None or _index.filename != filename:
+            _index = FamilyUrlIndex(filename)
+        elif _index.family_files != config.family_files:
+            # family files were registered since the index was loaded
+            _index.build()
+        return _index
@@ -0,0 +1,173 @@
+# -*- coding: utf-8 -*-
+"""
+Wikibase JSON dump reading module.
+
+The JsonDump class reads the JSON entity dumps of Wikibase repositories
+(like latest-all.json.bz2 offered on
+https://dumps.wikimedia.org/wikidatawiki/entities/) and offers a
+generator over the entities as dicts in the format returned by the
+wbgetentities API module.
+
+A dump is a JSON array holding one entity per line. The lines are
+filtered by an EntityFilter before and after decoding and can be decoded
+by worker processes.
+"""
+#
+# (C) Pywikibot team, 2019
+#
+# Distributed under the terms of the MIT license.
+#
+from __future__ import absolute_import, division, unicode_literals
+
+import json
+import multiprocessing
+
+from collections import deque
+
+import pywikibot
+
+from pywikibot.tools import open_archive
+
+
+class EntityFilter(object):
+
+    """
+    Filter for the entities of a JSON dump.
+
+    The filter is passed to the worker processes of L{JsonDump}, so it
+    only holds picklable values.
+
+    A line is only decoded if it contains all the property IDs and site
+    IDs of the filter, which is a cheap test for most lines of a dump.
+
+    @param types: entity types one of which the entity must have,
+        e.g. 'item' or 'property'
+    @type types: iterable of str
+    @param properties: property IDs all of which must have claims
+    @type properties: iterable of str
+    @param sitelinks: site IDs all of which must have sitelinks,
+        e.g. 'enwiki'
+    @type sitelinks: iterable of str
+    """
+
+    def __init__(self, types=None, properties=(), sitelinks=()):
+        """Initializer."""
+        self.types = None if types is None else frozenset(types)
+        self.properties = tuple(prop.upper() for prop in properties)
+        self.sitelinks = tuple(sitelinks)
+        self._needles = tuple('"{0}"'.format(key).encode('utf-8')
+                              for key in self.properties + self.sitelinks)
+
+    def match_line(self, line):
+        """
+        Return whether the encoded entity may pass the filter.
+
+        @type line: bytes
+        """
+        return all(needle in line for needle in self._needles)
+
+    def __call__(self, entity):
+        """Return whether the decoded entity passes the filter."""
+        if self.types is not None and entity.get('type') not in self.types:
+            return False
+        claims = entity.get('claims', {})
+        if not all(claims.get(prop) for prop in self.properties):
+            return False
+        sitelinks = entity.get('sitelinks', {})
+        return all(site in sitelinks for site in self.sitelinks)
+
+
+def _decode_line(line):
+    """Return the entity of a dump line or None for the array brackets."""
+    line = line.strip().rstrip(b',')
+    if not line or line in (b'[', b']'):
+        return None
+    return json.loads(line.decode('utf-8'))
+
+
+def _decode_lines(lines, entity_filter):
+    """Decode and filter the lines of a batch in a worker process."""
+    entities = []
+    for line in lines:
+        entity = _decode_line(line)
+        if entity is not None and (entity_filter is None
+                                   or entity_filter(entity)):
+            entities.append(entity)
+    return entities
+
+
+class JsonDump(object):
+
+    """
+    Represents a Wikibase JSON dump file.
+
+    The dump is decompressed with L{tools.open_archive} and read line by
+    line, so it is never held in memory completely.
+
+    @param filename: the dump file
+    @type filename: str
+    @param entity_filter: filter applied to the entities
+    @type entity_filter: EntityFilter or None
+    @param processes: number of worker processes decoding the lines.
+        Defaults to the number of CPUs. With less than 2 processes the
+        lines are decoded in the current process.
+    @type processes: int
+    @param batch_size: number of lines sent to a worker at once
+    @type batch_size: int
+    """
+
+    def __init__(self, filename, entity_filter=None, processes=None,
+                 batch_size=1000):
+        """Initializer."""
+        self.filename = filename
+        self.entity_filter = entity_filter
+        self.processes = processes or multiprocessing.cpu_count()
+        self.batch_size = batch_size
+
+    def _lines(self):
+        """Yield the lines which may pass the filter."""
+        with open_archive(self.filename) as source:
+            for line in source:
+                if self.entity_filter is None \
+                        or self.entity_filter.match_line(line):
+                    yield line
+
+    def _batches(self):
+        """Yield lists of lines."""
+        batch = []
+        for line in self._lines():
+            batch.append(line)
+            if len(batch) >= self.batch_size:
+                yield batch
+                batch = []
+        if batch:
+            yield batch
+
+    def parse(self):
+        """Generator of the entity dicts passing the filter."""
+        if self.processes < 2:
+            pywikibot.log('Parsing {0} in a single process'
+                          .format(self.filename))
+            for line in self._lines():
+                for entity in _decode_lines([line], self.entity_filter):
+                    yield entity
+            return
+
+        pool = multiprocessing.Pool(self.processes)
+        try:
+            pending = deque()
+            batches = self._batches()
+            while True:
+                # keep a bounded number of batches in progress
+                for batch in batches:
+                    pending.append(pool.apply_async(
+                        _decode_lines, (batch, self.entity_filter)))
+                    if len(pending) >= 2 * self.processes:
+                        break
+                if not pending:
+                    break
+                for entity in pending.popleft().get():
+                    yield entity
+        finally:
+            pool.terminate()
+            pool.join()
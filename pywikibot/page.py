@@ -26,6 +26,10 @@ import sys
 import unicodedata
 
 from collections import Counter, defaultdict, namedtuple, OrderedDict
+try:
+    from collections.abc import MutableMapping
+except ImportError:  # Python 2.7
+    from collections import MutableMapping
 from itertools import chain
 from warnings import warn
 
@@ -326,6 +330,32 @@ class BasePage(UnicodeMixin, ComparableMixin):
             the last pair of brackets(usually removes disambiguation brackets).
         @rtype: str
         """
+        # The variants are cached while the link isn't changed
+        link = self._link
+        state = (link.title, getattr(link, 'section', None))
+        cache = self.__dict__.get('_title_variants')
+        if cache is None or cache[0] is not link or cache[1] != state:
+            cache = self._title_variants = (link, state, {})
+        key = (underscore, with_ns, with_section, as_url, as_link,
+               allow_interwiki, force_interwiki, textlink, as_filename,
+               insite, without_brackets)
+        if as_link and not insite:
+            key += (config.mylang, config.family)
+        try:
+            return cache[2][key]
+        except KeyError:
+            pass
+        title = self._format_title(underscore, with_ns, with_section, as_url,
+                                   as_link, allow_interwiki, force_interwiki,
+                                   textlink, as_filename, insite,
+                                   without_brackets)
+        cache[2][key] = title
+        return title
+
+    def _format_title(self, underscore, with_ns, with_section, as_url,
+                      as_link, allow_interwiki, force_interwiki, textlink,
+                      as_filename, insite, without_brackets):
+        """Return the title of this Page formatted as given by title()."""
         title = self._link.canonical_title()
         label = self._link.title
         if with_section and self.section():
@@ -3011,6 +3041,37 @@ class Category(Page):
                         if total == 0:
                             return
 
+    def crawl(self, recurse=True, member_type=None, namespaces=None,
+              total=None, content=False, workers=None):
+        """
+        Yield the members of the category breadth-first with their depth.
+
+        Unlike L{members} with recurse, the subcategories are expanded
+        level by level, each of them once, and each member is yielded
+        once. See L{APISite.crawlcategories} for details.
+
+        @param recurse: if not False or 0, also iterate the members of
+            subcategories. If an int, limit the recursion to this depth.
+        @type recurse: int or bool
+        @param member_type: member types to yield, any of 'page', 'subcat'
+            and 'file'. By default all members are yielded.
+        @type member_type: str or iterable of str
+        @param namespaces: only yield members in these namespaces
+        @type namespaces: int or list of ints
+        @param total: iterate no more than this number of members
+        @param content: if True, retrieve the content of the current version
+            of each member (default False)
+        @param workers: number of categories retrieved concurrently
+        @type workers: int
+        @return: the members and their depth, which is 0 for the members
+            of this category
+        @rtype: typing.Iterable[(pywikibot.Page, int)]
+        """
+        return self.site.crawlcategories(
+            [self], recurse=recurse, member_type=member_type,
+            namespaces=namespaces, total=total, content=content,
+            workers=workers)
+
     def isEmptyCategory(self):
         """
         Return True if category has no members (including subcategories).
@@ -3706,6 +3767,94 @@ class User(Page):
         return self.isRegistered() and 'bot' not in self.groups()
 
 
+def _json_value(data):
+    """Return the value of a label or description JSON object."""
+    return data['value']
+
+
+def _json_values(data):
+    """Return the values of a list of alias JSON objects."""
+    return [value['value'] for value in data]
+
+
+class _LazyEntityData(MutableMapping):
+
+    """
+    Mapping which converts the JSON of its values on first access.
+
+    Entities with many languages or properties are expensive to convert
+    completely, while most bots only use a few of them. The values are
+    kept as JSON until they are accessed and converted by the converter
+    function then. Iterating over the keys, membership tests and len()
+    do not convert any value.
+    """
+
+    def __init__(self, raw, converter):
+        """
+        Initializer.
+
+        @param raw: the JSON of the values. It is copied, the JSON objects
+            themselves are not.
+        @type raw: dict
+        @param converter: function converting the JSON of a single value
+        @type converter: callable
+        """
+        self._data = {}
+        self._raw = dict(raw)
+        self._convert = converter
+
+    def __getitem__(self, key):
+        """Return the value of key, converting it if necessary."""
+        try:
+            return self._data[key]
+        except KeyError:
+            pass
+        value = self._convert(self._raw[key])
+        del self._raw[key]
+        self._data[key] = value
+        return value
+
+    def __setitem__(self, key, value):
+        """Set the value of key, discarding its JSON."""
+        self._raw.pop(key, None)
+        self._data[key] = value
+
+    def __delitem__(self, key):
+        """Delete key."""
+        if key in self._data:
+            del self._data[key]
+        else:
+            del self._raw[key]
+
+    def __iter__(self):
+        """Iterate over a snapshot of the keys."""
+        return iter(list(self._data) + list(self._raw))
+
+    def __len__(self):
+        """Return the number of keys."""
+        return len(self._data) + len(self._raw)
+
+    def __contains__(self, key):
+        """Return whether key is set without converting its value."""
+        return key in self._data or key in self._raw
+
+    def __repr__(self):
+        """Return the representation of the converted mapping."""
+        return repr(self.copy())
+
+    def copy(self):
+        """Return a dict with all values converted."""
+        return dict(self.items())
+
+    def unconverted(self, key):
+        """
+        Return the JSON of key if its value was not converted yet.
+
+        @rtype: dict, list or None
+        """
+        return self._raw.get(key)
+
+
 class WikibasePage(BasePage):
 
     """
@@ -3980,33 +4129,24 @@ class WikibasePage(BasePage):
         if 'pageid' in self._content:
             self._pageid = self._content['pageid']
 
+        # The values are converted on first access only
         # labels
-        self.labels = {}
-        for lang in self._content.get('labels', {}):
-            if 'removed' not in self._content['labels'][lang]:  # T56767
-                self.labels[lang] = self._content['labels'][lang]['value']
+        labels = {lang: label
+                  for lang, label in self._content.get('labels', {}).items()
+                  if 'removed' not in label}  # T56767
+        self.labels = _LazyEntityData(labels, _json_value)
 
         # descriptions
-        self.descriptions = {}
-        for lang in self._content.get('descriptions', {}):
-            self.descriptions[lang] = self._content[
-                'descriptions'][lang]['value']
+        self.descriptions = _LazyEntityData(
+            self._content.get('descriptions', {}), _json_value)
 
         # aliases
-        self.aliases = {}
-        for lang in self._content.get('aliases', {}):
-            self.aliases[lang] = []
-            for value in self._content['aliases'][lang]:
-                self.aliases[lang].append(value['value'])
+        self.aliases = _LazyEntityData(
+            self._content.get('aliases', {}), _json_values)
 
         # claims
-        self.claims = {}
-        for pid in self._content.get('claims', {}):
-            self.claims[pid] = []
-            for claim in self._content['claims'][pid]:
-                c = Claim.fromJSON(self.repo, claim)
-                c.on_item = self
-                self.claims[pid].append(c)
+        self.claims = _LazyEntityData(
+            self._content.get('claims', {}), self._claims_from_json)
 
         return {'aliases': self.aliases,
                 'labels': self.labels,
@@ -4014,6 +4154,15 @@ class WikibasePage(BasePage):
                 'claims': self.claims,
                 }
 
+    def _claims_from_json(self, data):
+        """Return the claims of a property created from their JSON."""
+        claims = []
+        for claim in data:
+            c = Claim.fromJSON(self.repo, claim)
+            c.on_item = self
+            claims.append(c)
+        return claims
+
     def get_data_for_new_entity(self):
         """
         Return data required for creation of new page.
@@ -4079,16 +4228,23 @@ class WikibasePage(BasePage):
         if aliases:
             data['aliases'] = aliases
 
+        diffto_claims = diffto.get('claims') if diffto else None
         claims = {}
+        unchanged_ids = set()
         for prop in self.claims:
-            if len(self.claims[prop]) > 0:
+            raw = (self.claims.unconverted(prop)
+                   if isinstance(self.claims, _LazyEntityData) else None)
+            if (raw is not None and diffto_claims
+                    and diffto_claims.get(prop) is raw):
+                # the claims were never accessed, so they are unchanged
+                unchanged_ids.update(claim['id'] for claim in raw
+                                     if 'id' in claim)
+            elif len(self.claims[prop]) > 0:
                 claims[prop] = [claim.toJSON() for claim in self.claims[prop]]
 
         if diffto and 'claims' in diffto:
             temp = defaultdict(list)
-            claim_ids = set()
-
-            diffto_claims = diffto['claims']
+            claim_ids = unchanged_ids
 
             for prop in claims:
                 for claim in claims[prop]:
@@ -6002,7 +6158,26 @@ class Link(BaseLink):
         Parse wikitext of the link.
 
         Called internally when accessing attributes.
+
+        The results are cached per source site in L{BaseSite.link_cache}
+        for the default namespace and the link text.
         """
+        cache = self._source.link_cache
+        if cache.maxsize <= 0:
+            self._parse()
+            return
+        key = (self._defaultns, self._text)
+        parsed = cache.get(key)
+        if parsed is None:
+            self._parse()
+            cache[key] = (self._site, self._namespace, self._is_interwiki,
+                          self._section, self._title)
+        else:
+            (self._site, self._namespace, self._is_interwiki,
+             self._section, self._title) = parsed
+
+    def _parse(self):
+        """Parse wikitext of the link without using the cache."""
         self._site = self._source
         self._namespace = self._defaultns
         self._is_interwiki = False
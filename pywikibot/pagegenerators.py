@@ -22,11 +22,13 @@ from __future__ import absolute_import, division, unicode_literals
 
 import calendar
 import codecs
+import collections
 import datetime
 import itertools
 import json
 import re
 import sys
+import threading
 
 from datetime import timedelta
 from functools import partial
@@ -45,9 +47,11 @@ from pywikibot.tools import (
     itergroup,
     ModuleDeprecationWrapper,
     redirect_func,
+    subtract_generators,
+    union_generators,
 )
 
-from pywikibot import date, config, i18n, xmlreader
+from pywikibot import date, config, i18n, jsonreader, xmlreader
 from pywikibot.bot import ListOption
 from pywikibot.comms import http
 from pywikibot.exceptions import (
@@ -84,6 +88,15 @@ GENERATOR OPTIONS
                     Argument can also be given as "-catr:categoryname" or
                     as "-catr:categoryname|fromtitle".
 
+-catcrawl           Like -catr, but crawls the subcategories breadth-first,
+                    expands every subcategory once and yields every page
+                    once, which avoids revisiting subtrees reachable by
+                    several paths or by category cycles. The categories
+                    of a level are retrieved by config.category_crawl_workers
+                    threads.
+                    Argument can also be given as "-catcrawl:categoryname"
+                    or as "-catcrawl:categoryname|fromtitle".
+
 -subcats            Work on all subcategories of a specific category.
                     Argument can also be given as "-subcats:categoryname" or
                     as "-subcats:categoryname|fromtitle".
@@ -244,6 +257,15 @@ GENERATOR OPTIONS
                     https://www.mediawiki.org/wiki/Manual:Pywikibot/MySQL
                     for more details.
 
+-jsondump           Work on the Wikibase entities of a JSON dump file of the
+                    data repository, e.g. latest-all.json.bz2. The entities
+                    are loaded from the dump and not requested again.
+                    Argument can be given as "-jsondump:filename" or
+                    "-jsondump:filename,filter,..." where each filter is
+                    an entity type ("item" or "property"), a property ID
+                    which must have claims or a site ID which must have
+                    a sitelink, e.g. "-jsondump:latest-all.json.gz,P625,enwiki"
+
 -sparql             Takes a SPARQL SELECT query string including ?item
                     and works on the resulting pages.
 
@@ -331,6 +353,10 @@ FILTER OPTIONS
                     dot matches any character, including a newline.
 
 -intersect          Work on the intersection of all the provided generators.
+                    If config.generator_spill_size is positive, the
+                    generators are read one after another and up to that
+                    many pages are remembered in memory and the others in
+                    a temporary file.
 
 -limit              When used with any other argument -limit:n specifies a set
                     of pages, work on no more than n pages in total.
@@ -381,6 +407,11 @@ FILTER OPTIONS
                     be returned.
                     For usage and examples, see -onlyif above.
 
+-prefetch           When the pages are preloaded, -prefetch:n retrieves up to
+                    n batches of pages in advance while the current batch is
+                    processed. -prefetch:0 disables it. The default is given
+                    by config.preload_prefetch.
+
 -ql                 Filter pages based on page quality.
                     This is only applicable if contentmodel equals
                     'proofread-page', otherwise has no effects.
@@ -392,6 +423,8 @@ FILTER OPTIONS
                     and a depth of 1 filters out all pages that are subpages of
                     subpages.
 
+-subtract           Work on the pages of the first provided generator which
+                    are not yielded by the other generators.
 
 -titleregex         A regular expression that needs to match the article title
                     otherwise the page won't be returned.
@@ -403,6 +436,11 @@ FILTER OPTIONS
 
 -titleregexnot      Like -titleregex, but return the page only if the regular
                     expression does not match.
+
+-union              Work on the pages of all the provided generators without
+                    duplicates. This is the default. With -union and
+                    -subtract, up to config.generator_spill_size pages are
+                    remembered in memory and the others in a temporary file.
 """
 
 docuReplacements = {'&params;': parameterHelp}  # noqa: N816
@@ -418,8 +456,12 @@ __doc__ = __doc__.replace('&params;', parameterHelp)
 
 
 # This is the function that will be used to de-duplicate page iterators.
-_filter_unique_pages = partial(
-    filter_unique, key=lambda page: '{}:{}:{}'.format(*page._cmpkey()))
+def _page_key(page):
+    """Return a str key of a page which is unique across sites."""
+    return '{}:{}:{}'.format(*page._cmpkey())
+
+
+_filter_unique_pages = partial(filter_unique, key=_page_key)
 
 
 class GeneratorFactory(object):
@@ -450,11 +492,13 @@ class GeneratorFactory(object):
         self.claimfilter_list = []
         self.catfilter_list = []
         self.intersect = False
+        self.subtract = False
         self.subpage_max_depth = None
         self._site = site
         self._positional_arg_name = positional_arg_name
         self._sparql = None
         self.nopreload = False
+        self.prefetch = None
 
     @property
     def site(self):
@@ -545,11 +589,19 @@ class GeneratorFactory(object):
             if self.intersect:
                 pywikibot.warning(
                     '"-intersect" ignored as only one generator is specified.')
+            if self.subtract:
+                pywikibot.warning(
+                    '"-subtract" ignored as only one generator is specified.')
         elif self.intersect:
             # By definition no duplicates are possible.
-            dupfiltergen = intersect_generators(self.gens)
+            dupfiltergen = intersect_generators(
+                self.gens, key=_page_key, maxsize=config.generator_spill_size)
+        elif self.subtract:
+            dupfiltergen = subtract_generators(
+                self.gens, key=_page_key, maxsize=config.generator_spill_size)
         else:
-            dupfiltergen = _filter_unique_pages(itertools.chain(*self.gens))
+            dupfiltergen = union_generators(
+                self.gens, key=_page_key, maxsize=config.generator_spill_size)
 
         # Add on subpage filter generator
         if self.subpage_max_depth is not None:
@@ -582,7 +634,8 @@ class GeneratorFactory(object):
             if isinstance(dupfiltergen, DequeGenerator):
                 dupfiltergen = DequePreloadingGenerator(dupfiltergen)
             else:
-                dupfiltergen = PreloadingGenerator(dupfiltergen)
+                dupfiltergen = PreloadingGenerator(dupfiltergen,
+                                                   prefetch=self.prefetch)
 
         if self.articlefilter_list:
             dupfiltergen = RegexBodyFilterPageGenerator(
@@ -923,6 +976,14 @@ class GeneratorFactory(object):
         self.limit = _int_none(value)
         return True
 
+    def _handle_prefetch(self, value):
+        """Handle `-prefetch` argument."""
+        if not value:
+            value = pywikibot.input(
+                'How many batches should be retrieved in advance?')
+        self.prefetch = int(value)
+        return True
+
     def _handle_category(self, value):
         """Handle `-category` argument."""
         return self.getCategoryGen(
@@ -935,6 +996,11 @@ class GeneratorFactory(object):
         return self.getCategoryGen(
             value, recurse=True, gen_func=CategorizedPageGenerator)
 
+    def _handle_catcrawl(self, value):
+        """Handle `-catcrawl` argument."""
+        return self.getCategoryGen(
+            value, recurse=True, gen_func=CategoryCrawlPageGenerator)
+
     def _handle_subcats(self, value):
         """Handle `-subcats` argument."""
         return self.getCategoryGen(
@@ -1063,6 +1129,26 @@ class GeneratorFactory(object):
         return WikibaseSearchItemPageGenerator(
             value, language=lang, site=self.site)
 
+    def _handle_jsondump(self, value):
+        """Handle `-jsondump` argument."""
+        if not value:
+            value = pywikibot.input('JSON dump file name:')
+        filename, _, filters = value.partition(',')
+        types = set()
+        properties = []
+        sitelinks = []
+        for key in filter(None, filters.split(',')):
+            if key in ('item', 'property'):
+                types.add(key)
+            elif re.match(r'^[Pp]\d+$', key):
+                properties.append(key)
+            else:
+                sitelinks.append(key)
+        entity_filter = jsonreader.EntityFilter(
+            types=types or None, properties=properties, sitelinks=sitelinks)
+        return WikibaseJSONDumpPageGenerator(
+            filename, site=self.site, entity_filter=entity_filter)
+
     def _handle_search(self, value):
         """Handle `-search` argument."""
         if not value:
@@ -1177,6 +1263,19 @@ class GeneratorFactory(object):
     def _handle_intersect(self, value):
         """Handle `-intersect` argument."""
         self.intersect = True
+        self.subtract = False
+        return True
+
+    def _handle_subtract(self, value):
+        """Handle `-subtract` argument."""
+        self.intersect = False
+        self.subtract = True
+        return True
+
+    def _handle_union(self, value):
+        """Handle `-union` argument."""
+        self.intersect = False
+        self.subtract = False
         return True
 
     def _handle_subpage(self, value):
@@ -1558,6 +1657,29 @@ def CategorizedPageGenerator(category, recurse=False, start=None,
         yield a
 
 
+def CategoryCrawlPageGenerator(category, recurse=True, start=None,
+                               total=None, content=False, namespaces=None):
+    """Yield all pages in a category and its subcategories breadth-first.
+
+    The pages are retrieved by L{pywikibot.Category.crawl}. Each
+    subcategory is expanded once and each page is yielded once. If recurse
+    is an int, only subcategories to that depth are included.
+
+    If start is a string value, only pages whose title comes after start
+    alphabetically are included.
+
+    If content is True (default is False), the current page text of each
+    retrieved page will be downloaded.
+
+    """
+    for page, depth in category.crawl(recurse=recurse,
+                                      member_type=['page', 'file'],
+                                      namespaces=namespaces, total=total,
+                                      content=content):
+        if start is None or page.title(with_ns=False) >= start:
+            yield page
+
+
 @deprecated_args(step=None)
 def SubCategoriesPageGenerator(category, recurse=False, start=None,
                                total=None, content=False):
@@ -2203,15 +2325,8 @@ def RepeatingGenerator(generator, key_func=lambda x: x, sleep_duration=60,
             yield item
 
 
-@deprecated_args(pageNumber='groupsize', step='groupsize', lookahead=None)
-def PreloadingGenerator(generator, groupsize=50):
-    """
-    Yield preloaded pages taken from another generator.
-
-    @param generator: pages to iterate over
-    @param groupsize: how many pages to preload at once
-    @type groupsize: int
-    """
+def _site_groups(generator, groupsize):
+    """Group the pages of a generator by site into lists of groupsize."""
     # pages may be on more than one site, for example if an interwiki
     # generator is used, so use a separate preloader for each site
     sites = {}
@@ -2221,13 +2336,124 @@ def PreloadingGenerator(generator, groupsize=50):
         sites.setdefault(site, []).append(page)
         if len(sites[site]) >= groupsize:
             # if this site is at the groupsize, process it
-            group = sites.pop(site)
-            for i in site.preloadpages(group, groupsize):
-                yield i
+            yield site, sites.pop(site)
+    # process any leftover sites that never reached the groupsize
     for site, pages in sites.items():
-        # process any leftover sites that never reached the groupsize
-        for i in site.preloadpages(pages, groupsize):
-            yield i
+        yield site, pages
+
+
+def _preloaded_size(page):
+    """Return the length of the preloaded text of a page."""
+    revision = page._revisions.get(getattr(page, '_revid', None))
+    if revision is None or revision.text is None:
+        return 0
+    return len(revision.text)
+
+
+class _PreloadPrefetcher(threading.Thread):
+
+    """
+    Retrieve batches of preloaded pages in a background thread.
+
+    At most depth batches and max_bytes of page text are held ahead of the
+    batch which is being consumed. The first batch is always queued even
+    if it exceeds max_bytes.
+    """
+
+    def __init__(self, batches, depth, max_bytes):
+        """Initializer."""
+        super(_PreloadPrefetcher, self).__init__(name='PreloadPrefetcher')
+        self.daemon = True
+        self.batches = batches
+        self.depth = depth
+        self.max_bytes = max_bytes
+        self._condition = threading.Condition()
+        self._queue = collections.deque()
+        self._bytes = 0
+        self._error = None
+        self._done = False
+        self._stopped = False
+
+    def _full(self, size):
+        """Return whether the queue can't take a batch of the given size."""
+        return self._queue and (
+            len(self._queue) >= self.depth
+            or self.max_bytes > 0 and self._bytes + size > self.max_bytes)
+
+    def run(self):
+        """Retrieve the batches and queue them."""
+        try:
+            for batch in self.batches:
+                size = sum(_preloaded_size(page) for page in batch)
+                with self._condition:
+                    while not self._stopped and self._full(size):
+                        self._condition.wait()
+                    if self._stopped:
+                        return
+                    self._queue.append((batch, size))
+                    self._bytes += size
+                    self._condition.notify_all()
+        except Exception as e:
+            self._error = e
+        finally:
+            with self._condition:
+                self._done = True
+                self._condition.notify_all()
+
+    def __iter__(self):
+        """Yield the pages of the queued batches."""
+        self.start()
+        try:
+            while True:
+                with self._condition:
+                    while not self._queue and not self._done:
+                        self._condition.wait()
+                    if not self._queue:
+                        if self._error:
+                            raise self._error
+                        return
+                    batch, size = self._queue.popleft()
+                    self._bytes -= size
+                    self._condition.notify_all()
+                for page in batch:
+                    yield page
+        finally:
+            with self._condition:
+                self._stopped = True
+                self._condition.notify_all()
+
+
+@deprecated_args(pageNumber='groupsize', step='groupsize', lookahead=None)
+def PreloadingGenerator(generator, groupsize=50, prefetch=None):
+    """
+    Yield preloaded pages taken from another generator.
+
+    If prefetch is positive, the next batches are retrieved in a
+    background thread while the current batch is processed. The order of
+    the pages is the same in both modes. The site throttle applies to the
+    background requests as well.
+
+    @param generator: pages to iterate over
+    @param groupsize: how many pages to preload at once
+    @type groupsize: int
+    @param prefetch: how many batches to retrieve in advance. Prefetched
+        pages are also limited by config.preload_prefetch_size. Defaults
+        to config.preload_prefetch.
+    @type prefetch: int
+    """
+    if prefetch is None:
+        prefetch = config.preload_prefetch
+    groups = _site_groups(generator, groupsize)
+    if prefetch > 0:
+        batches = (list(site.preloadpages(pages, groupsize))
+                   for site, pages in groups)
+        for page in _PreloadPrefetcher(
+                batches, prefetch, config.preload_prefetch_size * 1024 * 1024):
+            yield page
+    else:
+        for site, pages in groups:
+            for i in site.preloadpages(pages, groupsize):
+                yield i
 
 
 @deprecated_args(step='groupsize')
@@ -2241,7 +2467,8 @@ def DequePreloadingGenerator(generator, groupsize=50):
         if not page_count:
             return
 
-        for page in PreloadingGenerator(generator, page_count):
+        # prefetching would miss pages added while processing
+        for page in PreloadingGenerator(generator, page_count, prefetch=0):
             yield page
 
 
@@ -2811,6 +3038,11 @@ class XMLDumpOldPageGenerator(IteratorNextMixin):
     @param text_predicate: a callable with entry.text as parameter and boolean
         as result to indicate the generator should return the page or not
     @type text_predicate: function identifier or None
+    @param processes: number of processes parsing the dump in parallel
+        with xmlreader.ParallelXmlDump. The namespace filter is already
+        applied by the worker processes. If not given, the dump is parsed
+        in the current process.
+    @type processes: int or None
 
     @ivar text_predicate: holds text_predicate function
     @ivar skipping: True if start parameter is given, else False
@@ -2819,9 +3051,12 @@ class XMLDumpOldPageGenerator(IteratorNextMixin):
     @ivar parser: holds the xmlreader.XmlDump parse method
     """
 
+    # XmlEntry fields used by the generator
+    _fields = ('title', 'ns', 'text')
+
     @deprecated_args(xmlFilename='filename', xmlStart='start')
     def __init__(self, filename, start=None, namespaces=None, site=None,
-                 text_predicate=None):
+                 text_predicate=None, processes=None):
         """Initializer."""
         self.text_predicate = text_predicate
 
@@ -2837,7 +3072,16 @@ class XMLDumpOldPageGenerator(IteratorNextMixin):
         else:
             self.namespaces = self.site.namespaces.resolve(namespaces)
 
-        dump = xmlreader.XmlDump(filename)
+        if processes:
+            entry_filter = None
+            if namespaces:
+                entry_filter = xmlreader.XmlEntryFilter(
+                    namespaces=self.namespaces)
+            dump = xmlreader.ParallelXmlDump(filename, processes=processes,
+                                             entry_filter=entry_filter,
+                                             fields=self._fields)
+        else:
+            dump = xmlreader.XmlDump(filename, fields=self._fields)
         self.parser = dump.parse()
 
     @property
@@ -2881,6 +3125,50 @@ class XMLDumpPageGenerator(XMLDumpOldPageGenerator):
         return page
 
 
+def WikibaseJSONDumpPageGenerator(filename, site=None, entity_filter=None,
+                                  processes=None):
+    """
+    Yield the entities of a Wikibase JSON dump with their content loaded.
+
+    The pages are created like by L{DataSite.preload_entities}, so no API
+    request is made to load them. Entities of types without a page class
+    are skipped.
+
+    @param filename: filename of the JSON dump
+    @type filename: str
+    @param site: site of the data repository or one of its clients
+    @type site: pywikibot.site.BaseSite or None
+    @param entity_filter: filter applied to the entities before their pages
+        are created
+    @type entity_filter: jsonreader.EntityFilter or None
+    @param processes: number of processes decoding the dump, see
+        L{jsonreader.JsonDump}
+    @type processes: int or None
+    """
+    if site is None:
+        site = pywikibot.Site()
+    repo = site.data_repository()
+    dump = jsonreader.JsonDump(filename, entity_filter=entity_filter,
+                               processes=processes)
+    for entity in dump.parse():
+        cls = repo._type_to_class.get(entity.get('type'))
+        if cls is None:
+            continue
+        page = cls(repo, entity['id'])
+        # No api call is made because page._content is given
+        page._content = entity
+        try:
+            page.get()
+        except pywikibot.IsRedirectPage:
+            pass
+        except pywikibot.NoPage:
+            # old dumps don't include the revision id
+            pywikibot.warning('{0} in {1} has no revision id, skipping'
+                              .format(entity['id'], filename))
+            continue
+        yield page
+
+
 def YearPageGenerator(start=1, end=2050, site=None):
     """
     Year page generator.
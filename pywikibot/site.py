@@ -36,7 +36,7 @@ import pywikibot
 import pywikibot.family
 
 from pywikibot.comms.http import get_authentication
-from pywikibot.data import api
+from pywikibot.data import api, revisionstore, sitemeta
 from pywikibot.echo import Notification
 from pywikibot.exceptions import (
     ArticleExistsConflict,
@@ -68,15 +68,16 @@ from pywikibot.exceptions import (
     UserBlocked,
     UserRightsError,
 )
-from pywikibot.throttle import Throttle
+from pywikibot.throttle import AdaptiveThrottle, Throttle
 from pywikibot.tools import (
     compute_file_hash,
     itergroup, UnicodeMixin, ComparableMixin, SelfCallMixin, SelfCallString,
     deprecated, deprecate_arg, deprecated_args, remove_last_args,
     redirect_func, issue_deprecation_warning,
     manage_wrapping, MediaWikiVersion, first_upper, normalize_username,
-    merge_unique_dicts,
+    merge_unique_dicts, LRUCache,
     PY2,
+    SpillSet,
     filter_unique,
     UnicodeType
 )
@@ -84,9 +85,11 @@ from pywikibot.tools.ip import is_IP
 
 if not PY2:
     from itertools import zip_longest
+    import queue
     from urllib.parse import urlencode, urlparse
 else:
     from itertools import izip_longest as zip_longest
+    import Queue as queue  # noqa: N813
     from urllib import urlencode
     from urlparse import urlparse
 
@@ -99,6 +102,22 @@ class PageInUse(pywikibot.Error):
     """Page cannot be reserved for writing due to existing lock."""
 
 
+class _PageLock(object):
+
+    """
+    Entry of the page lock table of a site.
+
+    The condition shares the mutex of the site. The entry is kept while
+    the page is locked or a thread is waiting for it.
+    """
+
+    def __init__(self, mutex):
+        """Initializer."""
+        self.condition = threading.Condition(mutex)
+        self.locked = False
+        self.waiters = 0
+
+
 class LoginStatus(object):
 
     """
@@ -783,13 +802,29 @@ class BaseSite(ComparableMixin):
 
         # following are for use with lock_page and unlock_page methods
         self._pagemutex = threading.Lock()
-        self._locked_pages = []
+        self._locked_pages = {}
+        self._page_lock_stats = dict.fromkeys(
+            ('locks', 'contended', 'timeouts', 'wait_time', 'max_wait'), 0)
+
+        self._link_cache = LRUCache(pywikibot.config.link_cache_size)
 
     @deprecated(since='20141225')
     def has_api(self):
         """Return whether this site has an API."""
         return False
 
+    @property
+    def link_cache(self):
+        """
+        Return the cache of the links parsed with this site as source.
+
+        Its size is set by config.link_cache_size. The statistics are
+        returned by its info() method.
+
+        @rtype: pywikibot.tools.LRUCache
+        """
+        return self._link_cache
+
     @property
     @deprecated(
         "APISite.siteinfo['case'] or Namespace.case == 'case-sensitive'",
@@ -806,7 +841,10 @@ class BaseSite(ComparableMixin):
     def throttle(self):
         """Return this Site's throttle. Initialize a new one if needed."""
         if not hasattr(self, '_throttle'):
-            self._throttle = Throttle(self, multiplydelay=True)
+            if pywikibot.config.throttle_mode == 'adaptive':
+                self._throttle = AdaptiveThrottle(self, multiplydelay=True)
+            else:
+                self._throttle = Throttle(self, multiplydelay=True)
         return self._throttle
 
     @property
@@ -872,6 +910,8 @@ class BaseSite(ComparableMixin):
         """Remove Lock based classes before pickling."""
         new = self.__dict__.copy()
         del new['_pagemutex']
+        del new['_locked_pages']
+        del new['_link_cache']
         if '_throttle' in new:
             del new['_throttle']
         # site cache contains exception information, which can't be pickled
@@ -883,6 +923,8 @@ class BaseSite(ComparableMixin):
         """Restore things removed in __getstate__."""
         self.__dict__.update(attrs)
         self._pagemutex = threading.Lock()
+        self._locked_pages = {}
+        self._link_cache = LRUCache(pywikibot.config.link_cache_size)
 
     def user(self):
         """Return the currently-logged in bot username, or None."""
@@ -1053,28 +1095,56 @@ class BaseSite(ComparableMixin):
         """Return list of localized PAGENAMEE tags for the site."""
         return ['PAGENAMEE']
 
-    def lock_page(self, page, block=True):
+    def lock_page(self, page, block=True, timeout=None):
         """
         Lock page for writing. Must be called before writing any page.
 
         We don't want different threads trying to write to the same page
-        at the same time, even to different sections.
+        at the same time, even to different sections. A thread waiting
+        for a page is woken up as soon as the page is unlocked.
 
         @param page: the page to be locked
         @type page: pywikibot.Page
         @param block: if true, wait until the page is available to be locked;
             otherwise, raise an exception if page can't be locked
-
+        @param timeout: seconds to wait for the page if block is true;
+            None waits without limit
+        @type timeout: int, float or None
+        @raises PageInUse: the page is locked and block is false or the
+            timeout expired
         """
-        self._pagemutex.acquire()
-        try:
-            while page.title(with_section=False) in self._locked_pages:
+        title = page.title(with_section=False)
+        stats = self._page_lock_stats
+        with self._pagemutex:
+            entry = self._locked_pages.get(title)
+            if entry is None:
+                entry = self._locked_pages[title] = _PageLock(self._pagemutex)
+            elif entry.locked:
                 if not block:
-                    raise PageInUse(page.title(with_section=False))
-                time.sleep(.25)
-            self._locked_pages.append(page.title(with_section=False))
-        finally:
-            self._pagemutex.release()
+                    raise PageInUse(title)
+                stats['contended'] += 1
+                start = time.time()
+                entry.waiters += 1
+                try:
+                    while entry.locked:
+                        if timeout is None:
+                            entry.condition.wait()
+                            continue
+                        remaining = start + timeout - time.time()
+                        if remaining <= 0:
+                            stats['timeouts'] += 1
+                            raise PageInUse(title)
+                        entry.condition.wait(remaining)
+                finally:
+                    entry.waiters -= 1
+                    waited = time.time() - start
+                    stats['wait_time'] += waited
+                    stats['max_wait'] = max(stats['max_wait'], waited)
+                    if not entry.locked and entry.waiters:
+                        # don't lose the notification if interrupted
+                        entry.condition.notify()
+            entry.locked = True
+            stats['locks'] += 1
 
     def unlock_page(self, page):
         """
@@ -1082,13 +1152,35 @@ class BaseSite(ComparableMixin):
 
         @param page: the page to be locked
         @type page: pywikibot.Page
+        @raises ValueError: the page is not locked
+        """
+        title = page.title(with_section=False)
+        with self._pagemutex:
+            entry = self._locked_pages.get(title)
+            if entry is None or not entry.locked:
+                raise ValueError('{0} is not locked'.format(title))
+            entry.locked = False
+            if entry.waiters:
+                entry.condition.notify()
+            else:
+                del self._locked_pages[title]
 
+    def page_lock_stats(self):
         """
-        self._pagemutex.acquire()
-        try:
-            self._locked_pages.remove(page.title(with_section=False))
-        finally:
-            self._pagemutex.release()
+        Return the statistics of lock_page.
+
+        The keys are the number of locks acquired, how many of them had
+        to wait for another thread and how many timed out, the total and
+        maximum time in seconds spent waiting and the number of pages
+        which are locked now.
+
+        @rtype: dict
+        """
+        with self._pagemutex:
+            stats = dict(self._page_lock_stats)
+            stats['locked'] = sum(entry.locked
+                                  for entry in self._locked_pages.values())
+        return stats
 
     def disambcategory(self):
         """Return Category in which disambig pages are listed."""
@@ -1421,10 +1513,66 @@ class Siteinfo(Container):
         ],
     }
 
+    _STORE_TIME_FORMAT = '%Y-%m-%dT%H:%M:%S.%f'
+
     def __init__(self, site):
         """Initialise it with an empty cache."""
         self._site = site
         self._cache = {}
+        self._store_loaded = False
+
+    def _load_stored(self):
+        """Fill the cache from the metadata store."""
+        self._store_loaded = True
+        store = sitemeta.get_store()
+        if not store:
+            return
+        entry = store.load(str(self._site), 'siteinfo')
+        if not entry:
+            return
+        _, _, data, stored = entry
+        for prop, (value, timestamp) in data.items():
+            self._cache[prop] = (value, datetime.datetime.strptime(
+                timestamp, self._STORE_TIME_FORMAT))
+        pywikibot.debug('Loaded siteinfo of {0} from the metadata store'
+                        .format(self._site), _logger)
+        expiry = pywikibot.config.API_config_expiry
+        if expiry and stored + datetime.timedelta(expiry) \
+                < datetime.datetime.utcnow():
+            thread = threading.Thread(target=self._refresh_stored,
+                                      args=(list(data), ))
+            thread.setName('Siteinfo-Refresh-{0}'.format(self._site))
+            thread.setDaemon(True)
+            thread.start()
+
+    def _refresh_stored(self, props):
+        """Request the properties again and update the metadata store."""
+        try:
+            info = self._get_siteinfo(props, datetime.timedelta(0))
+        except Exception as e:
+            pywikibot.log('Refreshing the siteinfo of {0} failed: {1}'
+                          .format(self._site, e))
+            return
+        self._save_stored(info)
+        pywikibot.log('Refreshed the stored siteinfo of {0}'
+                      .format(self._site))
+
+    def _save_stored(self, cache=None):
+        """Save the requested properties to the metadata store."""
+        store = sitemeta.get_store()
+        if not store:
+            return
+        if cache is None:
+            cache = self._cache
+        if 'general' not in cache:
+            return
+        general = cache['general'][0]
+        data = {prop: (value, timestamp.strftime(self._STORE_TIME_FORMAT))
+                for prop, (value, timestamp) in cache.items()
+                # values without timestamp are defaults of unknown props
+                if timestamp}
+        store.store(str(self._site), 'siteinfo', general.get('generator'),
+                    sitemeta.siteinfo_hash(general), data)
 
     @staticmethod
     def _get_default(key):
@@ -1601,6 +1749,8 @@ class Siteinfo(Container):
             if the key was not in the retrieved values.
         @rtype: various (the value), bool (if the default value is used)
         """
+        if not self._store_loaded:
+            self._load_stored()
         if 'general' not in self._cache:
             pywikibot.debug('general siteinfo not loaded yet.', _logger)
             force = True
@@ -1618,6 +1768,7 @@ class Siteinfo(Container):
             default_info = self._get_siteinfo(props, expiry)
             for prop in props:
                 self._cache[prop] = default_info[prop]
+            self._save_stored()
             if key in default_info:
                 return default_info[key]
         if key in self._cache['general'][0]:
@@ -1679,10 +1830,13 @@ class Siteinfo(Container):
         else:
             if cache:
                 self._cache[key] = preloaded
+                self._save_stored()
             return copy.deepcopy(preloaded[0])
 
     def _get_cached(self, key):
         """Return the cached value or a KeyError exception if not cached."""
+        if not self._store_loaded:
+            self._load_stored()
         if 'general' in self._cache:
             if key in self._cache['general'][0]:
                 return (self._cache['general'][0][key],
@@ -3344,6 +3498,11 @@ class APISite(BaseSite):
         else:
             max_ids = int(parameter['limit'])  # T78333, T161783
 
+        store = revisionstore.get_store()
+        if store:
+            # the content is loaded from the store or requested separately
+            rvprop = rvprop[:-1]
+
         for sublist in itergroup(pagelist, min(groupsize, max_ids)):
             # Do not use p.pageid property as it will force page loading.
             pageids = [str(p._pageid) for p in sublist
@@ -3370,6 +3529,8 @@ class APISite(BaseSite):
             rvgen.request['rvprop'] = rvprop
             pywikibot.output('Retrieving %s pages from %s.'
                              % (len(cache), self))
+            if store:
+                rvgen = self._load_stored_revisions(rvgen, store, max_ids)
 
             for pagedata in rvgen:
                 pywikibot.debug('Preloading %s' % pagedata, _logger)
@@ -3413,6 +3574,48 @@ class APISite(BaseSite):
                 priority, page = heapq.heappop(prio_queue)
                 yield page
 
+    def _load_stored_revisions(self, rvgen, store, max_ids):
+        """
+        Add the content of the revisions to the page data of a batch.
+
+        The content is loaded from the revision store. The revisions
+        which are not stored are requested by their ids and stored.
+
+        @param rvgen: the generator of the page data without content
+        @type rvgen: api.PropertyGenerator
+        @param store: the revision store
+        @type store: revisionstore.RevisionStore
+        @param max_ids: the maximum number of revids per request
+        @type max_ids: int
+        @return: the page data of the batch
+        @rtype: list
+        """
+        pagedata_list = list(rvgen)
+        revisions = {}
+        for pagedata in pagedata_list:
+            for revision in pagedata.get('revisions', []):
+                revisions[revision['revid']] = revision
+        stored = store.load(str(self), revisions)
+        missing = [revid for revid in revisions if revid not in stored]
+        pywikibot.log('Loaded {0} of {1} revisions from the revision store.'
+                      .format(len(stored), len(revisions)))
+        retrieved = []
+        for revids in itergroup(missing, max_ids):
+            contentgen = api.PropertyGenerator(
+                'revisions', site=self,
+                parameters={'revids': revids,
+                            'rvprop': 'ids|flags|timestamp|user|comment|'
+                                      'content'})
+            contentgen.set_maximum_items(-1)
+            for pagedata in contentgen:
+                retrieved.extend(pagedata.get('revisions', []))
+        store.store(str(self), retrieved)
+        stored.update((revision['revid'], revision)
+                      for revision in retrieved)
+        for revid, revision in revisions.items():
+            revision.update(stored.get(revid, {}))
+        return pagedata_list
+
     def validate_tokens(self, types):
         """Validate if requested tokens are acceptable.
 
@@ -4213,6 +4416,187 @@ class APISite(BaseSite):
                                  'subcats': 0}
         return category._catinfo
 
+    def loadcategoryinfo(self, categories, groupsize=50):
+        """Retrieve data on contents of many categories at once.
+
+        Categories without contents get empty counts like in
+        L{categoryinfo}.
+
+        @see: U{https://www.mediawiki.org/wiki/API:Categoryinfo}
+
+        @param categories: the categories
+        @type categories: iterable of pywikibot.Category
+        @param groupsize: number of categories per request
+        @type groupsize: int
+        """
+        for sublist in itergroup(categories, groupsize):
+            cache = {category.title(with_section=False): category
+                     for category in sublist}
+            ciquery = api.PropertyGenerator('categoryinfo', site=self)
+            ciquery.request['titles'] = list(cache)
+            for pagedata in ciquery:
+                if pagedata['title'] in cache:
+                    api.update_page(cache[pagedata['title']], pagedata,
+                                    ['categoryinfo'])
+            for category in sublist:
+                if not hasattr(category, '_catinfo'):
+                    category._catinfo = {'size': 0, 'pages': 0, 'files': 0,
+                                         'subcats': 0}
+
+    def crawlcategories(self, categories, recurse=True, member_type=None,
+                        namespaces=None, total=None, content=False,
+                        workers=None):
+        """Iterate the members of categories breadth-first with their depth.
+
+        The categories are expanded level by level. The contents of the
+        categories of a level are retrieved by L{loadcategoryinfo} in
+        batches and only the categories with members of the requested
+        types are queried. Every category is expanded once, so
+        categories reachable by several paths and category cycles are
+        not crawled again, and every member is yielded once.
+
+        The members of the given categories have the depth 0, the
+        members of their subcategories the depth 1 and so on. Within a
+        level the members are yielded while they are retrieved.
+
+        @param categories: the categories to start with
+        @type categories: iterable of pywikibot.Category
+        @param recurse: if not False or 0, also iterate the members of
+            subcategories. If an int, limit the recursion to this depth.
+        @type recurse: int or bool
+        @param member_type: member types to yield, any of 'page', 'subcat'
+            and 'file'. By default all members are yielded.
+        @type member_type: str or iterable of str
+        @param namespaces: only yield members in these namespaces
+        @type namespaces: iterable of int or Namespace
+        @param total: iterate no more than this number of members
+        @type total: int
+        @param content: if True, load the current content of each member
+        @type content: bool
+        @param workers: number of categories retrieved concurrently.
+            Defaults to config.category_crawl_workers.
+        @type workers: int
+        @rtype: generator of (pywikibot.Page, int)
+        """
+        if workers is None:
+            workers = pywikibot.config.category_crawl_workers
+        if member_type is None:
+            member_type = {'page', 'subcat', 'file'}
+        elif isinstance(member_type, UnicodeType):
+            member_type = {member_type}
+        else:
+            member_type = set(member_type)
+        if namespaces is not None:
+            namespaces = set(self.namespaces.resolve(namespaces))
+        counters = {'page': 'pages', 'subcat': 'subcats', 'file': 'files'}
+
+        visited = set()
+        frontier = []
+        for category in categories:
+            title = category.title(with_section=False)
+            if title not in visited:
+                visited.add(title)
+                frontier.append(category)
+
+        depth = 0
+        repeated = 0
+        with SpillSet(pywikibot.config.generator_spill_size) as seen:
+            while frontier:
+                descend = recurse is True or depth < recurse
+                types = member_type | {'subcat'} if descend else member_type
+                query_namespaces = namespaces
+                if descend and namespaces is not None:
+                    query_namespaces = namespaces | {self.namespaces[14]}
+                self.loadcategoryinfo(
+                    [category for category in frontier
+                     if not hasattr(category, '_catinfo')])
+                frontier = [category for category in frontier
+                            if any(category._catinfo[counters[member]]
+                                   for member in types)]
+                next_frontier = []
+                for member in self._category_members(
+                        frontier, types, query_namespaces, content, workers):
+                    title = member.title(with_section=False)
+                    if member.namespace() == 14:
+                        if descend:
+                            if title in visited:
+                                repeated += 1
+                            else:
+                                visited.add(title)
+                                next_frontier.append(
+                                    pywikibot.Category(member))
+                        if 'subcat' not in member_type:
+                            continue
+                    elif namespaces is not None \
+                            and member.namespace() not in namespaces:
+                        continue
+                    if title in seen:
+                        continue
+                    seen.add(title)
+                    yield member, depth
+                    if total is not None:
+                        total -= 1
+                        if total == 0:
+                            return
+                frontier = next_frontier
+                depth += 1
+        pywikibot.debug('crawlcategories: {0} categories expanded, {1} '
+                        'repeated subcategories skipped'
+                        .format(len(visited), repeated), _logger)
+
+    def _category_members(self, categories, member_type, namespaces,
+                          content, workers):
+        """Yield the members of categories retrieved by worker threads."""
+        if workers <= 1 or len(categories) <= 1:
+            for category in categories:
+                for member in self.categorymembers(
+                        category, namespaces, member_type=member_type,
+                        content=content):
+                    yield member
+            return
+
+        pending = queue.Queue()
+        for category in categories:
+            pending.put(category)
+        results = queue.Queue()
+        stop = threading.Event()
+
+        def retrieve():
+            try:
+                while not stop.is_set():
+                    try:
+                        category = pending.get_nowait()
+                    except queue.Empty:
+                        break
+                    for member in self.categorymembers(
+                            category, namespaces, member_type=member_type,
+                            content=content):
+                        if stop.is_set():
+                            break
+                        results.put(member)
+            except Exception as e:
+                results.put(e)
+            finally:
+                results.put(None)
+
+        threads = [threading.Thread(target=retrieve)
+                   for _ in range(min(workers, len(categories)))]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+        finished = 0
+        try:
+            while finished < len(threads):
+                member = results.get()
+                if member is None:
+                    finished += 1
+                elif isinstance(member, Exception):
+                    raise member
+                else:
+                    yield member
+        finally:
+            stop.set()
+
     @deprecated_args(throttle=None, limit='total', step=None,
                      includeredirects='filterredir')
     def allpages(self, start='!', prefix='', namespace=0, filterredir=None,
@@ -5331,6 +5715,98 @@ class APISite(BaseSite):
         finally:
             self.unlock_page(page)
 
+    EditResult = namedtuple('EditResult', 'page saved exception')
+
+    @must_be(group='user')
+    def editpages(self, items, workers=None, groupsize=50, **kwargs):
+        """Submit the edits of many pages, keeping several in flight.
+
+        The items are read in groups of groupsize. For the pages of a
+        group whose latest revision is not loaded yet the revisions are
+        preloaded together and the edit token is retrieved once. The
+        new text is then saved by L{Page.save} in worker threads, so the
+        bot exclusion templates and cosmetic changes are handled as for
+        any other save. The write throttle still spaces the edits, but
+        the next edit does not wait for the response of the previous one.
+
+        The base timestamp of an edit is the latest revision loaded
+        before the edit, as with L{editpage}, so edit conflicts are
+        detected in the same way.
+
+        The results are yielded in the order in which the edits finish.
+        Exceptions raised by Page.save are not raised but returned in the
+        result of the page.
+
+        @param items: the edits as tuples of the page, the new text and
+            the edit summary
+        @type items: iterable of (pywikibot.Page, str, str)
+        @param workers: number of edits in flight. Defaults to
+            config.max_edits_in_flight.
+        @type workers: int
+        @param groupsize: number of pages whose revisions are preloaded
+            at once
+        @type groupsize: int
+        @param kwargs: passed to L{Page.save}, except asynchronous as the
+            edits are already made in worker threads
+        @return: the page, whether it was saved and the raised exception
+            or None
+        @rtype: generator of EditResult
+        """
+        kwargs.pop('asynchronous', None)
+        if workers is None:
+            workers = pywikibot.config.max_edits_in_flight
+        workers = max(workers, 1)
+        pending = queue.Queue(workers)
+        results = queue.Queue()
+
+        def edit():
+            while True:
+                item = pending.get()
+                if item is None:
+                    return
+                page, text, summary = item
+                page.text = text
+                try:
+                    page.save(summary=summary, **kwargs)
+                except Exception as e:
+                    results.put(self.EditResult(page, False, e))
+                else:
+                    results.put(self.EditResult(page, True, None))
+
+        threads = [threading.Thread(target=edit) for _ in range(workers)]
+        for thread in threads:
+            thread.daemon = True
+            thread.start()
+
+        submitted = 0
+        try:
+            for group in itergroup(items, groupsize):
+                missing = [page for page, text, summary in group
+                           if page._latest_cached_revision() is None]
+                if missing:
+                    for _ in self.preloadpages(missing, groupsize):
+                        pass
+                # retrieve the token before the workers need it
+                self.tokens['edit']
+                for item in group:
+                    pending.put(item)
+                    submitted += 1
+                    while not results.empty():
+                        submitted -= 1
+                        yield results.get()
+            while submitted:
+                submitted -= 1
+                yield results.get()
+        finally:
+            # drop the edits not started yet when the generator is closed
+            try:
+                while True:
+                    pending.get_nowait()
+            except queue.Empty:
+                pass
+            for thread in threads:
+                pending.put(None)
+
     OnErrorExc = namedtuple('OnErrorExc', 'exception on_new_page')
 
     # catalog of merge history errors for use in error messages
@@ -50,6 +50,12 @@ except ImportError as e:
 # cache for replaceExcept to avoid recompile or regexes each call
 _regex_cache = {}
 
+# compiled regexes of the sites, see _site_regexes
+_site_regex_bundles = {}
+
+# compiled regexes of compileLinkR by its arguments
+_link_regexes = {}
+
 # This regex is only for use by extract_templates_and_params_regex.
 # It does not support template variables consisting of nested templates,
 # system variables like {{CURRENTYEAR}}, or template variables like {{{1}}}.
@@ -198,7 +204,6 @@ class _MultiTemplateMatchBuilder(object):
         # TODO: add ability to also match contents within the template
         # TODO: add option for template to be None to match any template
         # TODO: use NESTED_TEMPLATE_REGEX with <parameters> instead of <params>
-        namespace = self.site.namespaces[10]
         if isinstance(template, pywikibot.Page):
             if template.namespace() == 10:
                 old = template.title(with_ns=False)
@@ -211,22 +216,7 @@ class _MultiTemplateMatchBuilder(object):
             raise ValueError(
                 '{0!r} is not a valid template'.format(template))
 
-        if namespace.case == 'first-letter':
-            pattern = '[{}{}]{}'.format(re.escape(old[0].upper()),
-                                        re.escape(old[0].lower()),
-                                        re.escape(old[1:]))
-        else:
-            pattern = re.escape(old)
-        # namespaces may be any mixed case
-        namespaces = [''.join('[{0}{1}]'.format(char.upper(), char.lower())
-                              for char in ns)
-                      for ns in namespace]
-        pattern = re.sub(r'_|\\ ', r'[_ ]', pattern)
-        templateRegex = re.compile(r'\{\{ *(' + ':|'.join(namespaces)
-                                   + r':|[mM][sS][gG]:)?' + pattern
-                                   + r'(?P<parameters>\s*\|.+?|) *}}',
-                                   flags)
-        return templateRegex
+        return _site_regexes(self.site).template(old, flags)
 
     def search_any_predicate(self, templates):
         """Return a predicate that matches any template."""
@@ -329,12 +319,7 @@ def _get_regexes(keys, site):
                             since='20151006')
                         site = pywikibot.Site()
 
-                    if (exc, site) not in _regex_cache:
-                        re_text, re_var = _regex_cache[exc]
-                        _regex_cache[(exc, site)] = re.compile(
-                            re_text % re_var(site), re.VERBOSE)
-
-                    result.append(_regex_cache[(exc, site)])
+                    result.append(_site_regexes(site).get(exc))
                 else:
                     result.append(_regex_cache[exc])
             else:
@@ -344,7 +329,8 @@ def _get_regexes(keys, site):
                 result.append(_regex_cache[exc])
             # handle alias
             if exc == 'source':
-                dontTouchRegexes.append(_tag_regex('syntaxhighlight'))
+                dontTouchRegexes.extend(_get_regexes(['syntaxhighlight'],
+                                                     site))
         else:
             # assume it's a regular expression
             dontTouchRegexes.append(exc)
@@ -352,44 +338,217 @@ def _get_regexes(keys, site):
     return result
 
 
-def replaceExcept(text, old, new, exceptions, caseInsensitive=False,
-                  allowoverlap=False, marker='', site=None, count=0):
-    """
-    Return text with 'old' replaced by 'new', ignoring specified types of text.
+class _SiteRegexes(object):
 
-    Skips occurrences of 'old' within exceptions; e.g., within nowiki tags or
-    HTML comments. If caseInsensitive is true, then use case insensitive
-    regex matching. If allowoverlap is true, overlapping occurrences are all
-    replaced (watch out when using this, it might lead to infinite loops!).
+    """
+    Compiled regexes of a site shared by the textlib functions.
 
-    @type text: str
-    @param old: a compiled or uncompiled regular expression
-    @param new: a unicode string (which can contain regular
-        expression references), or a function which takes
-        a match object as parameter. See parameter repl of
-        re.sub().
-    @param exceptions: a list of strings which signal what to leave out,
-        e.g. ['math', 'table', 'template']
-    @type caseInsensitive: bool
-    @param marker: a string that will be added to the last replacement;
-        if nothing is changed, it is added at the end
-    @param count: how many replacements to do at most. See parameter
-        count of re.sub().
-    @type count: int
+    The site dependent regexes of _regex_cache, the template regexes of
+    _MultiTemplateMatchBuilder and the timestamp regexes of TimeStripper
+    are compiled when they are first used and then kept for the site.
     """
-    # if we got a string, compile it as a regular expression
-    if isinstance(old, UnicodeType):
-        if caseInsensitive:
-            old = re.compile(old, re.IGNORECASE | re.UNICODE)
+
+    def __init__(self, site):
+        """Initializer."""
+        self.site = site
+        self._regexes = {}
+        self._templates = {}
+        self._template_namespaces = None
+        self._timestamp = None
+
+    def get(self, key):
+        """Return the regex of a site dependent key of _regex_cache."""
+        try:
+            return self._regexes[key]
+        except KeyError:
+            re_text, re_var = _regex_cache[key]
+            regex = re.compile(re_text % re_var(self.site), re.VERBOSE)
+            self._regexes[key] = regex
+            return regex
+
+    def template(self, title, flags=re.DOTALL):
+        """Return the regex matching the template with the given title."""
+        key = (title, flags)
+        if key in self._templates:
+            return self._templates[key]
+
+        namespace = self.site.namespaces[10]
+        if self._template_namespaces is None:
+            # namespaces may be any mixed case
+            self._template_namespaces = ':|'.join(
+                ''.join('[{0}{1}]'.format(char.upper(), char.lower())
+                        for char in ns)
+                for ns in namespace)
+        if namespace.case == 'first-letter':
+            pattern = '[{}{}]{}'.format(re.escape(title[0].upper()),
+                                        re.escape(title[0].lower()),
+                                        re.escape(title[1:]))
         else:
-            old = re.compile(old)
+            pattern = re.escape(title)
+        pattern = re.sub(r'_|\\ ', r'[_ ]', pattern)
+        regex = re.compile(r'\{\{ *(' + self._template_namespaces
+                           + r':|[mM][sS][gG]:)?' + pattern
+                           + r'(?P<parameters>\s*\|.+?|) *}}', flags)
+        self._templates[key] = regex
+        return regex
 
-    # early termination if not relevant
-    if not old.search(text):
-        return text + marker
+    def timestamp(self):
+        """Return the regexes and month numbers used by TimeStripper."""
+        if self._timestamp is None:
+            self._timestamp = _timestamp_regexes(self.site)
+        return self._timestamp
 
-    dontTouchRegexes = _get_regexes(exceptions, site)
 
+def _site_regexes(site):
+    """Return the shared compiled regexes of a site."""
+    try:
+        return _site_regex_bundles[site]
+    except KeyError:
+        return _site_regex_bundles.setdefault(site, _SiteRegexes(site))
+
+
+_GROUP_REFERENCE_REGEX = re.compile(r'\\(\d+)|\\g<(.+?)>')
+
+
+def _replacement_function(new):
+    """
+    Return a function creating the replacement text for a match.
+
+    The replacement string is parsed only once. The group references
+    are processed manually instead of using match.expand, because it
+    can't handle lookahead or lookbehind (see bug T123185).
+
+    @param new: replacement string or function; see L{replaceExcept}
+    @rtype: callable
+    """
+    if callable(new):
+        # the parameter new can be a function which takes the match
+        # as a parameter.
+        return new
+
+    # it is a little hack to make \n work. It would be better
+    # to fix it previously, but better than nothing.
+    new = new.replace('\\n', '\n')
+
+    parts = []
+    last = 0
+    for group_match in _GROUP_REFERENCE_REGEX.finditer(new):
+        group_id = group_match.group(1) or group_match.group(2)
+        try:
+            group_id = int(group_id)
+        except ValueError:
+            pass
+        parts.append((new[last:group_match.start()], group_id))
+        last = group_match.end()
+    tail = new[last:]
+
+    def replacement(match):
+        result = []
+        for literal, group_id in parts:
+            result.append(literal)
+            try:
+                result.append(match.group(group_id) or '')
+            except IndexError:
+                raise IndexError(
+                    'Invalid group reference: {0}\nGroups found: {1}'
+                    ''.format(group_id, match.groups()))
+        result.append(tail)
+        return ''.join(result)
+
+    return replacement
+
+
+class _ExceptionScanner(object):
+
+    """
+    Find the next exception in a text without searching every regex again.
+
+    The next match of each exception regex is remembered and only searched
+    again when the position passes its start. The result is the same as
+    searching every regex from the position and choosing the leftmost
+    match.
+    """
+
+    def __init__(self, text, regexes):
+        """Initializer."""
+        self.text = text
+        self.regexes = regexes
+        self.matches = [None] * len(regexes)
+        self.positions = [-1] * len(regexes)
+
+    def next_exception(self, index):
+        """Return the span of the next exception starting at index or later.
+
+        @rtype: tuple of int or None
+        """
+        result = None
+        for i, regex in enumerate(self.regexes):
+            match = self.matches[i]
+            if self.positions[i] < 0 or match and match.start() < index:
+                match = self.matches[i] = regex.search(self.text, index)
+                self.positions[i] = index
+            if match and (result is None or match.start() < result[0]):
+                result = match.span()
+        return result
+
+
+def _replace_except_spans(text, old, replacement, exceptions, marker, count):
+    """
+    Replace matches outside of exceptions in a single pass.
+
+    The matches of old and the exceptions are searched left to right in
+    the original text and each exception regex is searched again only
+    when a match passes the exception found previously. The result is
+    joined from a list of parts.
+
+    @see: L{replaceExcept}
+    """
+    scanner = _ExceptionScanner(text, exceptions)
+    parts = []
+    markerpart = None
+    index = 0
+    copied = 0
+    replaced = 0
+    while (not count or replaced < count) and index <= len(text):
+        match = old.search(text, index)
+        if not match:
+            # nothing left to replace
+            break
+
+        exception = scanner.next_exception(index)
+        if exception is not None and exception[0] <= match.start():
+            # an HTML comment or text in nowiki tags stands before the next
+            # valid match. Skip.
+            index = exception[1]
+            continue
+
+        parts.append(text[copied:match.start()])
+        parts.append(replacement(match))
+        markerpart = len(parts)
+        copied = index = match.end()
+        if not match.group():
+            # When the regex allows to match nothing, shift by one char
+            index += 1
+        replaced += 1
+
+    parts.append(text[copied:])
+    if markerpart is None:
+        markerpart = len(parts)
+    parts.insert(markerpart, marker)
+    return ''.join(parts)
+
+
+def _replace_except_legacy(text, old, replacement, exceptions, allowoverlap,
+                           marker, count):
+    """
+    Replace matches outside of exceptions rebuilding the text every time.
+
+    The next exception and the next match are searched again in the
+    modified text after every replacement. This is required for
+    allowoverlap, as overlapping matches may occur in replaced text.
+
+    @see: L{replaceExcept}
+    """
     index = 0
     replaced = 0
     markerpos = len(text)
@@ -403,7 +562,7 @@ def replaceExcept(text, old, new, exceptions, caseInsensitive=False,
 
         # check which exception will occur next.
         nextExceptionMatch = None
-        for dontTouchR in dontTouchRegexes:
+        for dontTouchR in exceptions:
             excMatch = dontTouchR.search(text, index)
             if excMatch and (
                     nextExceptionMatch is None
@@ -417,58 +576,75 @@ def replaceExcept(text, old, new, exceptions, caseInsensitive=False,
             index = nextExceptionMatch.end()
         else:
             # We found a valid match. Replace it.
-            if callable(new):
-                # the parameter new can be a function which takes the match
-                # as a parameter.
-                replacement = new(match)
-            else:
-                # it is not a function, but a string.
-
-                # it is a little hack to make \n work. It would be better
-                # to fix it previously, but better than nothing.
-                new = new.replace('\\n', '\n')
-
-                # We cannot just insert the new string, as it may contain regex
-                # group references such as \2 or \g<name>.
-                # On the other hand, this approach does not work because it
-                # can't handle lookahead or lookbehind (see bug T123185).
-                # So we have to process the group references manually.
-                replacement = ''
-
-                group_regex = re.compile(r'\\(\d+)|\\g<(.+?)>')
-                last = 0
-                for group_match in group_regex.finditer(new):
-                    group_id = group_match.group(1) or group_match.group(2)
-                    try:
-                        group_id = int(group_id)
-                    except ValueError:
-                        pass
-                    try:
-                        replacement += new[last:group_match.start()]
-                        replacement += match.group(group_id) or ''
-                    except IndexError:
-                        raise IndexError(
-                            'Invalid group reference: {0}\nGroups found: {1}'
-                            ''.format(group_id, match.groups()))
-                    last = group_match.end()
-                replacement += new[last:]
-
-            text = text[:match.start()] + replacement + text[match.end():]
+            replacement_text = replacement(match)
+            text = (text[:match.start()] + replacement_text
+                    + text[match.end():])
 
             # continue the search on the remaining text
             if allowoverlap:
                 index = match.start() + 1
             else:
-                index = match.start() + len(replacement)
+                index = match.start() + len(replacement_text)
             if not match.group():
                 # When the regex allows to match nothing, shift by one char
                 index += 1
-            markerpos = match.start() + len(replacement)
+            markerpos = match.start() + len(replacement_text)
             replaced += 1
     text = text[:markerpos] + marker + text[markerpos:]
     return text
 
 
+def replaceExcept(text, old, new, exceptions, caseInsensitive=False,
+                  allowoverlap=False, marker='', site=None, count=0):
+    """
+    Return text with 'old' replaced by 'new', ignoring specified types of text.
+
+    Skips occurrences of 'old' within exceptions; e.g., within nowiki tags or
+    HTML comments. If caseInsensitive is true, then use case insensitive
+    regex matching. If allowoverlap is true, overlapping occurrences are all
+    replaced (watch out when using this, it might lead to infinite loops!).
+
+    Unless allowoverlap is true, all replacements are done in a single
+    pass over the original text. Like with re.sub(), lookbehind assertions
+    of 'old' then see the original text and not the text already replaced.
+
+    @type text: str
+    @param old: a compiled or uncompiled regular expression
+    @param new: a unicode string (which can contain regular
+        expression references), or a function which takes
+        a match object as parameter. See parameter repl of
+        re.sub().
+    @param exceptions: a list of strings which signal what to leave out,
+        e.g. ['math', 'table', 'template']
+    @type caseInsensitive: bool
+    @param marker: a string that will be added to the last replacement;
+        if nothing is changed, it is added at the end
+    @param count: how many replacements to do at most. See parameter
+        count of re.sub().
+    @type count: int
+    """
+    # if we got a string, compile it as a regular expression
+    if isinstance(old, UnicodeType):
+        if caseInsensitive:
+            old = re.compile(old, re.IGNORECASE | re.UNICODE)
+        else:
+            old = re.compile(old)
+
+    # early termination if not relevant
+    if not old.search(text):
+        return text + marker
+
+    dontTouchRegexes = _get_regexes(exceptions, site)
+    replacement = _replacement_function(new)
+
+    if allowoverlap:
+        return _replace_except_legacy(text, old, replacement,
+                                      dontTouchRegexes, allowoverlap,
+                                      marker, count)
+    return _replace_except_spans(text, old, replacement, dontTouchRegexes,
+                                 marker, count)
+
+
 def removeDisabledParts(text, tags=None, include=[], site=None):
     """
     Return text without portions where wiki markup is disabled.
@@ -1570,7 +1746,13 @@ def categoryFormat(categories, insite=None):
 # -------------------------------------
 
 def compileLinkR(withoutBracketed=False, onlyBracketed=False):
-    """Return a regex that matches external links."""
+    """Return a regex that matches external links.
+
+    The regex is compiled once for each combination of the arguments.
+    """
+    key = (withoutBracketed, onlyBracketed)
+    if key in _link_regexes:
+        return _link_regexes[key]
     # RFC 2396 says that URLs may only contain certain characters.
     # For this regex we also accept non-allowed characters, so that the bot
     # will later show these links as broken ('Non-ASCII Characters in URL').
@@ -1597,7 +1779,7 @@ def compileLinkR(withoutBracketed=False, onlyBracketed=False):
     elif onlyBracketed:
         regex = r'\[' + regex
     linkR = re.compile(regex)
-    return linkR
+    return _link_regexes.setdefault(key, linkR)
 
 
 # --------------------------------
@@ -2100,10 +2282,63 @@ class tzoneFixedOffset(datetime.tzinfo):
         )
 
 
+_TimestampRegexes = namedtuple(
+    '_TimestampRegexes',
+    'month_numbers is_digit_month time timezone year month day')
+
+
+def _timestamp_regexes(site):
+    """Return the compiled regexes of TimeStripper for a site."""
+    month_numbers = {}
+    for n, (_long, _short) in enumerate(site.months_names, start=1):
+        month_numbers[_long] = n
+        month_numbers[_short] = n
+        # in some cases month in ~~~~ might end without dot even if
+        # site.months_names do not.
+        if _short.endswith('.'):
+            month_numbers[_short[:-1]] = n
+
+    timeR = (r'(?P<time>(?P<hour>([0-1]\d|2[0-3]))[:\.h]'
+             r'(?P<minute>[0-5]\d))')
+    timeznR = r'\((?P<tzinfo>[A-Z]+)\)'
+    yearR = r'(?P<year>(19|20)\d\d)(?:%s)?' % '\ub144'
+    # if months have 'digits' as names, they need to be
+    # removed; will be handled as digits in regex, adding d+{1,2}\.?
+    escaped_months = [_ for _ in month_numbers if
+                      not _.strip('.').isdigit()]
+    # match longest names first.
+    escaped_months = [re.escape(_) for
+                      _ in sorted(escaped_months, reverse=True)]
+    # work around for cs wiki: if month are in digits, we assume
+    # that format is dd. mm. (with dot and spaces optional)
+    # the last one is workaround for Korean
+    if any(_.isdigit() for _ in month_numbers):
+        is_digit_month = True
+        monthR = r'(?P<month>(%s)|(?:1[012]|0?[1-9])\.)' \
+            % '|'.join(escaped_months)
+        dayR = (
+            r'(?P<day>(3[01]|[12]\d|0?[1-9]))(?:{0})?\.?\s*(?:[01]?\d\.)?'
+            .format('\uc77c'))
+    else:
+        is_digit_month = False
+        monthR = r'(?P<month>(%s))' % '|'.join(escaped_months)
+        dayR = r'(?P<day>(3[01]|[12]\d|0?[1-9]))\.?'
+
+    return _TimestampRegexes(month_numbers, is_digit_month,
+                             re.compile(timeR), re.compile(timeznR),
+                             re.compile(yearR), re.compile(monthR),
+                             re.compile(dayR))
+
+
 class TimeStripper(object):
 
     """Find timestamp in page and return it as pywikibot.Timestamp object."""
 
+    _hyperlink_pat = re.compile(r'\[\s*?http[s]?://[^\]]*?\]')
+    _comment_pat = re.compile(r'<!--(.*?)-->')
+    _wikilink_pat = re.compile(
+        r'\[\[(?P<link>[^\]\|]*?)(?P<anchor>\|[^\]]*)?\]\]')
+
     def __init__(self, site=None):
         """Initializer."""
         if site is None:
@@ -2111,49 +2346,18 @@ class TimeStripper(object):
         else:
             self.site = site
 
-        self.origNames2monthNum = {}
-        for n, (_long, _short) in enumerate(self.site.months_names, start=1):
-            self.origNames2monthNum[_long] = n
-            self.origNames2monthNum[_short] = n
-            # in some cases month in ~~~~ might end without dot even if
-            # site.months_names do not.
-            if _short.endswith('.'):
-                self.origNames2monthNum[_short[:-1]] = n
+        regexes = _site_regexes(self.site).timestamp()
+        self.origNames2monthNum = regexes.month_numbers
+        self.is_digit_month = regexes.is_digit_month
 
         self.groups = ['year', 'month', 'hour', 'time', 'day', 'minute',
                        'tzinfo']
 
-        timeR = (r'(?P<time>(?P<hour>([0-1]\d|2[0-3]))[:\.h]'
-                 r'(?P<minute>[0-5]\d))')
-        timeznR = r'\((?P<tzinfo>[A-Z]+)\)'
-        yearR = r'(?P<year>(19|20)\d\d)(?:%s)?' % '\ub144'
-        # if months have 'digits' as names, they need to be
-        # removed; will be handled as digits in regex, adding d+{1,2}\.?
-        escaped_months = [_ for _ in self.origNames2monthNum if
-                          not _.strip('.').isdigit()]
-        # match longest names first.
-        escaped_months = [re.escape(_) for
-                          _ in sorted(escaped_months, reverse=True)]
-        # work around for cs wiki: if month are in digits, we assume
-        # that format is dd. mm. (with dot and spaces optional)
-        # the last one is workaround for Korean
-        if any(_.isdigit() for _ in self.origNames2monthNum):
-            self.is_digit_month = True
-            monthR = r'(?P<month>(%s)|(?:1[012]|0?[1-9])\.)' \
-                % '|'.join(escaped_months)
-            dayR = (
-                r'(?P<day>(3[01]|[12]\d|0?[1-9]))(?:{0})?\.?\s*(?:[01]?\d\.)?'
-                .format('\uc77c'))
-        else:
-            self.is_digit_month = False
-            monthR = r'(?P<month>(%s))' % '|'.join(escaped_months)
-            dayR = r'(?P<day>(3[01]|[12]\d|0?[1-9]))\.?'
-
-        self.ptimeR = re.compile(timeR)
-        self.ptimeznR = re.compile(timeznR)
-        self.pyearR = re.compile(yearR)
-        self.pmonthR = re.compile(monthR)
-        self.pdayR = re.compile(dayR)
+        self.ptimeR = regexes.time
+        self.ptimeznR = regexes.timezone
+        self.pyearR = regexes.year
+        self.pmonthR = regexes.month
+        self.pdayR = regexes.day
 
         # order is important to avoid mismatch when searching
         self.patterns = [
@@ -2164,11 +2368,6 @@ class TimeStripper(object):
             self.pdayR,
         ]
 
-        self._hyperlink_pat = re.compile(r'\[\s*?http[s]?://[^\]]*?\]')
-        self._comment_pat = re.compile(r'<!--(.*?)-->')
-        self._wikilink_pat = re.compile(
-            r'\[\[(?P<link>[^\]\|]*?)(?P<anchor>\|[^\]]*)?\]\]')
-
         self.tzinfo = tzoneFixedOffset(self.site.siteinfo['timeoffset'],
                                        self.site.siteinfo['timezone'])
 
@@ -1,16 +1,19 @@
 # -*- coding: utf-8 -*-
 """Mechanics to slow down wiki read and/or write rate."""
 #
-# (C) Pywikibot team, 2008-2018
+# (C) Pywikibot team, 2008-2019
 #
 # Distributed under the terms of the MIT license.
 #
 from __future__ import absolute_import, division, unicode_literals
 
 import math
+import sqlite3
 import threading
 import time
 
+from contextlib import contextmanager
+
 import pywikibot
 from pywikibot import config
 from pywikibot.tools import deprecated
@@ -24,6 +27,164 @@ _logger = 'wiki.throttle'
 # process.
 pid = False
 
+_stores = {}
+_stores_lock = threading.Lock()
+
+
+class ThrottleStore(object):
+
+    """
+    Throttle state shared by all bot processes on a host.
+
+    The state is kept in a SQLite database. Every change runs in an
+    exclusive transaction, so concurrent processes can't lose each
+    other's updates.
+
+    The database holds the registry of running processes, which replaces
+    the throttle.ctrl file, and one request schedule per site for reads
+    and one for writes. Each request reserves the next free slot of its
+    schedule. The combined rate of all processes is therefore limited by
+    the delay itself instead of multiplying the delay by the number of
+    processes.
+    """
+
+    _schema = (
+        'CREATE TABLE IF NOT EXISTS processes ('
+        ' pid INTEGER NOT NULL,'
+        ' site TEXT NOT NULL,'
+        ' time REAL NOT NULL,'
+        ' PRIMARY KEY (pid, site))',
+        'CREATE TABLE IF NOT EXISTS schedule ('
+        ' site TEXT NOT NULL,'
+        ' write INTEGER NOT NULL,'
+        ' next REAL NOT NULL,'
+        ' PRIMARY KEY (site, write))',
+    )
+
+    def __init__(self, filename):
+        """Initializer.
+
+        @param filename: path of the database file
+        @type filename: str
+        """
+        self.filename = filename
+        self._lock = threading.RLock()
+        # transactions are started explicitly by _transaction
+        self._connection = sqlite3.connect(filename, timeout=60,
+                                           isolation_level=None,
+                                           check_same_thread=False)
+        with self._transaction() as connection:
+            for statement in self._schema:
+                connection.execute(statement)
+
+    @contextmanager
+    def _transaction(self):
+        """Run the statements in an exclusive transaction."""
+        with self._lock:
+            self._connection.execute('BEGIN IMMEDIATE')
+            try:
+                yield self._connection
+            except Exception:
+                self._connection.execute('ROLLBACK')
+                raise
+            self._connection.execute('COMMIT')
+
+    def close(self):
+        """Close the database connection."""
+        with self._lock:
+            self._connection.close()
+
+    def register(self, pid, site, dropdelay, releasepid):
+        """
+        Register a process and count the processes running for the site.
+
+        Processes which did not register within releasepid seconds are
+        removed from the registry.
+
+        @param pid: the process identifier. If it is not set yet, the
+            next unused identifier is assigned.
+        @type pid: int or bool
+        @param site: the site identifier
+        @type site: str
+        @param dropdelay: count processes which registered for the site
+            within that many seconds
+        @type dropdelay: int
+        @param releasepid: free process identifiers after that many seconds
+        @type releasepid: int
+        @return: the process identifier and the number of processes
+        @rtype: tuple of int
+        """
+        now = time.time()
+        with self._transaction() as connection:
+            connection.execute('DELETE FROM processes WHERE time < ?',
+                               (now - releasepid, ))
+            if not pid:
+                last = connection.execute(
+                    'SELECT MAX(pid) FROM processes').fetchone()[0]
+                pid = (last or 0) + 1
+            connection.execute(
+                'INSERT OR REPLACE INTO processes (pid, site, time) '
+                'VALUES (?, ?, ?)', (pid, site, now))
+            count = connection.execute(
+                'SELECT COUNT(DISTINCT pid) FROM processes '
+                'WHERE site = ? AND time >= ?',
+                (site, now - dropdelay)).fetchone()[0]
+        return pid, count
+
+    def unregister(self, pid):
+        """Remove all entries of a process from the registry."""
+        with self._transaction() as connection:
+            connection.execute('DELETE FROM processes WHERE pid = ?', (pid, ))
+
+    def next_slot(self, site, write):
+        """Return the time when the next request may start."""
+        with self._lock:
+            row = self._connection.execute(
+                'SELECT next FROM schedule WHERE site = ? AND write = ?',
+                (site, write)).fetchone()
+        return row[0] if row else 0.0
+
+    def reserve(self, site, write, delay):
+        """
+        Reserve the next request slot of a schedule.
+
+        @param site: the site identifier
+        @type site: str
+        @param write: whether to use the write schedule
+        @type write: bool
+        @param delay: the time between this request and the next one
+        @type delay: float
+        @return: the time when the request may start
+        @rtype: float
+        """
+        with self._transaction() as connection:
+            row = connection.execute(
+                'SELECT next FROM schedule WHERE site = ? AND write = ?',
+                (site, write)).fetchone()
+            start = max(time.time(), row[0] if row else 0.0)
+            connection.execute(
+                'INSERT OR REPLACE INTO schedule (site, write, next) '
+                'VALUES (?, ?, ?)', (site, write, start + delay))
+        return start
+
+
+def get_store():
+    """
+    Return the shared throttle store if it is enabled by config.
+
+    @rtype: ThrottleStore or None
+    """
+    if config.throttle_backend == 'file':
+        return None
+    if config.throttle_backend != 'sqlite':
+        raise ValueError('Unknown throttle backend {0!r}'
+                         .format(config.throttle_backend))
+    filename = config.datafilepath('throttle.sqlite3')
+    with _stores_lock:
+        if filename not in _stores:
+            _stores[filename] = ThrottleStore(filename)
+        return _stores[filename]
+
 
 class Throttle(object):
 
@@ -35,6 +196,9 @@ class Throttle(object):
     Each Site initiates one Throttle object (site.throttle) to control the
     rate of access.
 
+    With config.throttle_backend = 'sqlite' the processes coordinate via a
+    L{ThrottleStore} instead of the throttle.ctrl file.
+
     """
 
     def __init__(self, site, mindelay=None, maxdelay=None, writedelay=None,
@@ -45,6 +209,7 @@ class Throttle(object):
         self.lock_read = threading.RLock()
         self.mysite = str(site)
         self.ctrlfilename = config.datafilepath('throttle.ctrl')
+        self._store = get_store()
         self.mindelay = mindelay
         if self.mindelay is None:
             self.mindelay = config.minthrottle
@@ -87,6 +252,17 @@ class Throttle(object):
         mysite = self.mysite
         pywikibot.debug('Checking multiplicity: pid = %(pid)s' % globals(),
                         _logger)
+        if self._store:
+            with self.lock:
+                pid, count = self._store.register(
+                    pid, mysite, self.dropdelay, self.releasepid)
+                self.checktime = time.time()
+                self.process_multiplicity = count
+            pywikibot.log(
+                'Found {0} {1} processes running, including this one.'.format(
+                    count, mysite))
+            return
+
         with self.lock:
             processes = []
             my_pid = pid or 1  # start at 1 if global pid not yet set
@@ -177,7 +353,10 @@ class Throttle(object):
                 thisdelay = self.mindelay * self.next_multiplicity
             elif thisdelay > self.maxdelay:
                 thisdelay = self.maxdelay
-            thisdelay *= self.process_multiplicity
+            if not self._store:
+                # the shared schedule already spaces requests of all
+                # processes
+                thisdelay *= self.process_multiplicity
         return thisdelay
 
     def waittime(self, write=False):
@@ -189,6 +368,8 @@ class Throttle(object):
         # delay this time
         thisdelay = self.getDelay(write=write)
         now = time.time()
+        if self._store:
+            return max(self._store.next_slot(self.mysite, write) - now, 0.0)
         if write:
             ago = now - self.last_write
         else:
@@ -203,6 +384,11 @@ class Throttle(object):
         """Remove me from the list of running bot processes."""
         # drop all throttles with this process's pid, regardless of site
         self.checktime = 0
+        if self._store:
+            if pid:
+                self._store.unregister(pid)
+            return
+
         processes = []
         try:
             with open(self.ctrlfilename, 'r') as f:
@@ -267,6 +453,10 @@ class Throttle(object):
         """
         lock = self.lock_write if write else self.lock_read
         with lock:
+            if self._store:
+                self._reserve(requestsize, write)
+                return
+
             wait = self.waittime(write=write)
             # Calculate the multiplicity of the next delay based on how
             # big the request is that is being posted now.
@@ -282,6 +472,33 @@ class Throttle(object):
             else:
                 self.last_read = time.time()
 
+    def _reserve(self, requestsize, write):
+        """Wait for a slot of the shared schedule."""
+        self.next_multiplicity = math.log(1 + requestsize) / math.log(2.0)
+        start = self._store.reserve(self.mysite, write,
+                                    self.getDelay(write=write))
+        self.wait(start - time.time())
+        if write:
+            self.last_write = time.time()
+        else:
+            self.last_read = time.time()
+
+    def record(self, latency=None, lag=None, error=False):
+        """
+        Record the outcome of a request to the site.
+
+        The fixed throttle ignores it. L{AdaptiveThrottle} adjusts its
+        request rates.
+
+        @param latency: the duration of the request in seconds
+        @type latency: float
+        @param lag: the database lag reported by the server in seconds
+        @type lag: float
+        @param error: whether the request failed
+        @type error: bool
+        """
+        pass
+
     def lag(self, lagtime=None):
         """Seize the throttle lock due to server lag.
 
@@ -306,3 +523,246 @@ class Throttle(object):
             # account for any time we waited while acquiring the lock
             wait = delay - (time.time() - started)
             self.wait(wait)
+
+
+class TokenBucket(object):
+
+    """
+    Token bucket limiting the request rate.
+
+    The bucket is refilled at rate tokens per second up to burst tokens.
+    A request takes its tokens immediately. If there were not enough
+    tokens, the bucket goes into debt and the request has to wait until
+    the debt is paid.
+
+    @param rate: tokens per second
+    @type rate: float
+    @param burst: capacity of the bucket
+    @type burst: float
+    """
+
+    def __init__(self, rate, burst):
+        """Initializer."""
+        self.lock = threading.Lock()
+        self.rate = rate
+        self.burst = burst
+        self.tokens = burst
+        self.updated = time.time()
+
+    def _refill(self):
+        """Add the tokens accumulated since the last update."""
+        now = time.time()
+        self.tokens = min(self.burst,
+                          self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def reserve(self, cost=1):
+        """
+        Take tokens from the bucket.
+
+        @param cost: number of tokens to take
+        @type cost: float
+        @return: seconds to wait until the tokens are available
+        @rtype: float
+        """
+        with self.lock:
+            self._refill()
+            self.tokens -= cost
+            return max(-self.tokens / self.rate, 0.0)
+
+    def waittime(self, cost=1):
+        """Return seconds to wait for tokens without taking them."""
+        with self.lock:
+            self._refill()
+            return max((cost - self.tokens) / self.rate, 0.0)
+
+    def set_rate(self, rate):
+        """Change the rate, keeping the tokens accumulated so far."""
+        with self.lock:
+            self._refill()
+            self.rate = rate
+
+
+class AdaptiveThrottle(Throttle):
+
+    """
+    Throttle whose request rates adapt to the condition of the server.
+
+    Reads and writes are limited by separate token buckets which allow
+    bursts of config.adaptive_read_burst and config.adaptive_write_burst
+    requests. The rates are never above the rates given by the fixed
+    delays, or config.adaptive_max_rate if the delay is zero, and never
+    below one request per maxdelay seconds.
+
+    The rates follow the outcome of the requests reported by L{record}:
+    failed requests and a database lag of at least config.maxlag halve
+    the rates, a lag of more than half of it or an average latency of
+    three times the lowest one observed slows them down gradually, and
+    the rates grow by a small step after every other request.
+
+    The current values are returned by L{state} for monitoring.
+    """
+
+    increase = 0.05
+    decrease = 0.5
+    latency_factor = 3.0
+
+    def __init__(self, site, mindelay=None, maxdelay=None, writedelay=None,
+                 multiplydelay=True):
+        """Initializer."""
+        super(AdaptiveThrottle, self).__init__(site, mindelay, maxdelay,
+                                               writedelay, multiplydelay)
+        self.read_bucket = TokenBucket(self.max_read_rate,
+                                       config.adaptive_read_burst)
+        self.write_bucket = TokenBucket(self.max_write_rate,
+                                        config.adaptive_write_burst)
+        self.requests = 0
+        self.errors = 0
+        self.error_rate = 0.0
+        self.latency = None
+        self.min_latency = None
+        self.last_lag = None
+        self._lag_recorded = False
+
+    @staticmethod
+    def _max_rate(delay):
+        """Return the highest rate allowed by a delay."""
+        if delay > 0:
+            return 1.0 / delay
+        return config.adaptive_max_rate
+
+    @property
+    def max_read_rate(self):
+        """Return the highest read rate."""
+        return self._max_rate(self.delay)
+
+    @property
+    def max_write_rate(self):
+        """Return the highest write rate."""
+        return self._max_rate(self.writedelay)
+
+    @property
+    def min_rate(self):
+        """Return the lowest rate."""
+        return self._max_rate(self.maxdelay)
+
+    def setDelays(self, delay=None, writedelay=None, absolute=False):
+        """Set the nominal delays and limit the rates to them."""
+        super(AdaptiveThrottle, self).setDelays(delay, writedelay, absolute)
+        if hasattr(self, 'read_bucket'):
+            self.read_bucket.set_rate(self.max_read_rate)
+            self.write_bucket.set_rate(self.max_write_rate)
+
+    def _factor(self, latency, lag, error):
+        """Return the factor to change the rates by or None to increase."""
+        maxlag = config.maxlag or 5
+        if error or lag is not None and lag >= maxlag:
+            return self.decrease
+        if lag is not None and lag > maxlag / 2:
+            # between 1 and self.decrease
+            return 1 - (1 - self.decrease) * (2 * lag / maxlag - 1)
+        if latency is not None \
+           and self.latency > self.latency_factor * self.min_latency:
+            return 1 - (1 - self.decrease) / 5
+        return None
+
+    def record(self, latency=None, lag=None, error=False):
+        """Adjust the rates to the outcome of a request."""
+        with self.lock:
+            self.requests += 1
+            self.errors += bool(error)
+            self.error_rate += 0.1 * (bool(error) - self.error_rate)
+            if latency is not None:
+                if self.latency is None:
+                    self.latency = latency
+                else:
+                    self.latency += 0.2 * (latency - self.latency)
+                self.min_latency = min(self.min_latency or latency, latency)
+            self._lag_recorded = lag is not None
+            if lag is not None:
+                self.last_lag = lag
+
+            factor = self._factor(latency, lag, error)
+            for bucket, max_rate in ((self.read_bucket, self.max_read_rate),
+                                     (self.write_bucket,
+                                      self.max_write_rate)):
+                if factor is None:
+                    rate = bucket.rate + self.increase * max_rate
+                else:
+                    rate = bucket.rate * factor
+                bucket.set_rate(min(max(rate, self.min_rate), max_rate))
+
+    def state(self):
+        """
+        Return the state of the throttle for monitoring.
+
+        @rtype: dict
+        """
+        with self.lock:
+            return {
+                'site': self.mysite,
+                'read_rate': self.read_bucket.rate,
+                'read_tokens': self.read_bucket.tokens,
+                'write_rate': self.write_bucket.rate,
+                'write_tokens': self.write_bucket.tokens,
+                'lag': self.last_lag,
+                'latency': self.latency,
+                'error_rate': self.error_rate,
+                'requests': self.requests,
+                'errors': self.errors,
+                'processes': self.process_multiplicity
+                if self.multiplydelay else 1,
+            }
+
+    def _cost(self, requestsize):
+        """Return the tokens taken by a request."""
+        cost = max(math.log(1 + requestsize) / math.log(2.0), 1.0)
+        if self.multiplydelay and not self._store:
+            if time.time() > self.checktime + self.checkdelay:
+                self.checkMultiplicity()
+            # share the rate with the other processes
+            cost *= self.process_multiplicity
+        return cost
+
+    def waittime(self, write=False):
+        """Return waiting time in seconds for a request made right now."""
+        bucket = self.write_bucket if write else self.read_bucket
+        if self._store:
+            return max(self._store.next_slot(self.mysite, write)
+                       - time.time(), 0.0)
+        return bucket.waittime(self._cost(1))
+
+    def __call__(self, requestsize=1, write=False):
+        """Block the calling thread until the bucket has enough tokens."""
+        lock = self.lock_write if write else self.lock_read
+        bucket = self.write_bucket if write else self.read_bucket
+        with lock:
+            cost = self._cost(requestsize)
+            if self._store:
+                if self.multiplydelay \
+                   and time.time() > self.checktime + self.checkdelay:
+                    self.checkMultiplicity()
+                # the shared schedule has no burst allowance
+                start = self._store.reserve(self.mysite, write,
+                                            cost / bucket.rate)
+                self.wait(start - time.time())
+            else:
+                self.wait(bucket.reserve(cost))
+
+            if write:
+                self.last_write = time.time()
+            else:
+                self.last_read = time.time()
+
+    def lag(self, lagtime=None):
+        """Slow down and wait due to server lag."""
+        if self._lag_recorded:
+            # the rates were already lowered by the lag header of the
+            # response, only count the error
+            with self.lock:
+                self.errors += 1
+                self.error_rate += 0.1 * (1 - self.error_rate)
+        else:
+            self.record(lag=lagtime or self.retry_after or config.maxlag,
+                        error=True)
+        super(AdaptiveThrottle, self).lag(lagtime)
@@ -10,14 +10,17 @@ from __future__ import absolute_import, division, unicode_literals
 import collections
 import gzip
 import hashlib
+import heapq
 from importlib import import_module
 import inspect
 import itertools
 import os
 import re
+import sqlite3
 import stat
 import subprocess
 import sys
+import tempfile
 import threading
 import time
 import types
@@ -1012,7 +1015,73 @@ class ThreadList(list):
                   % (thd, thd.queue.qsize()), self._logger)
 
 
-def intersect_generators(genlist):
+def _merge_sorted(genlist, sort_key):
+    """
+    Merge generators which are sorted by the same key.
+
+    @return: the first item of each key and the indexes of the
+        generators which yielded the key
+    @rtype: generator of tuple
+    @raises ValueError: a generator is not sorted
+    """
+    def keyed(index, source):
+        previous = None
+        for number, item in enumerate(source):
+            key = sort_key(item)
+            if number and key < previous:
+                raise ValueError(
+                    'Generator {0!r} is not sorted: {1!r} follows {2!r}'
+                    .format(source, key, previous))
+            previous = key
+            # the number avoids comparing items with equal keys
+            yield key, index, number, item
+
+    merged = heapq.merge(*[keyed(index, source)
+                           for index, source in enumerate(genlist)])
+    for _, group in itertools.groupby(merged, key=lambda entry: entry[0]):
+        group = list(group)
+        yield group[0][3], {entry[1] for entry in group}
+
+
+def _intersect_spilled(genlist, key, maxsize):
+    """
+    Intersect generators one after another using L{SpillSet}.
+
+    The keys yielded by the first generator are collected. Each following
+    generator keeps only the collected keys which it yields as well, so
+    the remaining keys are those yielded by every generator read so far.
+    The items of the last generator are yielded if their key remains.
+    """
+    if key is None:
+        def key(item):
+            return item
+
+    common = SpillSet(maxsize)
+    try:
+        for item in genlist[0]:
+            common.add(key(item))
+        for source in genlist[1:-1]:
+            if not common:
+                return
+            remaining = SpillSet(maxsize)
+            for item in source:
+                item_key = key(item)
+                if item_key in common:
+                    remaining.add(item_key)
+            common.close()
+            common = remaining
+        if not common:
+            return
+        with SpillSet(maxsize) as seen:
+            for item in filter_unique((item for item in genlist[-1]
+                                       if key(item) in common),
+                                      container=seen, key=key):
+                yield item
+    finally:
+        common.close()
+
+
+def intersect_generators(genlist, sort_key=None, key=None, maxsize=0):
     """
     Intersect generators listed in genlist.
 
@@ -1025,9 +1094,37 @@ def intersect_generators(genlist):
     Quitting before all generators are finished is attempted if
     there is no more chance of finding an item in all queues.
 
+    If the generators are sorted by sort_key, they are merged in a single
+    thread instead and only their current items are kept in memory.
+
+    If maxsize is positive, the generators are read one after another
+    instead and the keys of the items yielded by all generators read so
+    far are kept in a L{SpillSet}. Items are only yielded while the last
+    generator is read.
+
     @param genlist: list of page generators
     @type genlist: list
+    @param sort_key: function returning the key all generators are sorted
+        by
+    @type sort_key: callable
+    @param key: function to convert an item to a str, bytes or int key,
+        used with maxsize
+    @type key: callable
+    @param maxsize: number of keys kept in memory, see L{SpillSet}
+    @type maxsize: int
+    @raises ValueError: a generator is not sorted by sort_key
     """
+    if sort_key is not None:
+        for item, indexes in _merge_sorted(genlist, sort_key):
+            if len(indexes) == len(genlist):
+                yield item
+        return
+
+    if maxsize > 0 and len(genlist) > 1:
+        for item in _intersect_spilled(genlist, key, maxsize):
+            yield item
+        return
+
     # If any generator is empty, no pages are going to be returned
     for source in genlist:
         if not source:
@@ -1165,6 +1262,156 @@ def filter_unique(iterable, container=None, key=None, add=None):
             return
 
 
+def union_generators(genlist, key=None, sort_key=None, maxsize=0):
+    """
+    Yield the unique items of all generators in genlist.
+
+    The keys of the yielded items are kept in a L{SpillSet}. If the
+    generators are sorted by sort_key, they are merged instead and only
+    their current items are kept in memory.
+
+    @param genlist: list of page generators
+    @type genlist: list
+    @param key: function to convert an item to a str, bytes or int key
+    @type key: callable
+    @param sort_key: function returning the key all generators are sorted
+        by
+    @type sort_key: callable
+    @param maxsize: number of keys kept in memory, see L{SpillSet}
+    @type maxsize: int
+    @raises ValueError: a generator is not sorted by sort_key
+    """
+    if sort_key is not None:
+        for item, _ in _merge_sorted(genlist, sort_key):
+            yield item
+        return
+
+    with SpillSet(maxsize) as seen:
+        for item in filter_unique(itertools.chain(*genlist), container=seen,
+                                  key=key):
+            yield item
+
+
+def subtract_generators(genlist, key=None, sort_key=None, maxsize=0):
+    """
+    Yield the unique items of the first generator not in the others.
+
+    The keys of the items of the other generators are collected in a
+    L{SpillSet} before the first generator is iterated. If the generators
+    are sorted by sort_key, they are merged instead and only their
+    current items are kept in memory.
+
+    @param genlist: list of page generators
+    @type genlist: list
+    @param key: function to convert an item to a str, bytes or int key
+    @type key: callable
+    @param sort_key: function returning the key all generators are sorted
+        by
+    @type sort_key: callable
+    @param maxsize: number of keys kept in memory, see L{SpillSet}
+    @type maxsize: int
+    @raises ValueError: a generator is not sorted by sort_key
+    """
+    if sort_key is not None:
+        for item, indexes in _merge_sorted(genlist, sort_key):
+            if indexes == {0}:
+                yield item
+        return
+
+    with SpillSet(maxsize) as seen:
+        for item in itertools.chain(*genlist[1:]):
+            seen.add(key(item) if key else item)
+        for item in filter_unique(genlist[0], container=seen, key=key):
+            yield item
+
+
+class SpillSet(object):
+
+    """
+    A set which is moved into a temporary SQLite database when it grows.
+
+    The items are kept in memory until there are more than maxsize of
+    them. Then all items are stored in a database file which is removed
+    when the set is closed. Only str, bytes and int items can be stored
+    in the database.
+
+    It can be used as a context manager which closes the set on exit.
+    """
+
+    def __init__(self, maxsize=0):
+        """
+        Initializer.
+
+        @param maxsize: number of items kept in memory. If not positive,
+            all items are kept in memory.
+        @type maxsize: int
+        """
+        self.maxsize = maxsize
+        self.filename = None
+        self._items = set()
+        self._database = None
+        self._length = 0
+
+    def __enter__(self):
+        """Enter a context."""
+        return self
+
+    def __exit__(self, exc_type, exc_value, traceback):
+        """Close the set on exit."""
+        self.close()
+
+    def _spill(self):
+        """Move the items into a temporary database."""
+        fd, self.filename = tempfile.mkstemp(prefix='pywikibot-',
+                                             suffix='.sqlite3')
+        os.close(fd)
+        self._database = sqlite3.connect(self.filename,
+                                         check_same_thread=False)
+        self._database.execute('PRAGMA journal_mode = OFF')
+        self._database.execute('PRAGMA synchronous = OFF')
+        self._database.execute('CREATE TABLE items (item PRIMARY KEY)')
+        self._database.executemany('INSERT INTO items VALUES (?)',
+                                   ((item, ) for item in self._items))
+        self._length = len(self._items)
+        self._items = set()
+        debug('Moved {0} items into {1}'.format(self._length, self.filename),
+              'spillset')
+
+    def add(self, item):
+        """Add an item."""
+        if self._database is None:
+            self._items.add(item)
+            if 0 < self.maxsize < len(self._items):
+                self._spill()
+        else:
+            cursor = self._database.execute(
+                'INSERT OR IGNORE INTO items VALUES (?)', (item, ))
+            self._length += cursor.rowcount
+
+    def __contains__(self, item):
+        """Return whether the item was added."""
+        if self._database is None:
+            return item in self._items
+        return self._database.execute(
+            'SELECT 1 FROM items WHERE item = ?', (item, )).fetchone() \
+            is not None
+
+    def __len__(self):
+        """Return the number of items."""
+        if self._database is None:
+            return len(self._items)
+        return self._length
+
+    def close(self):
+        """Remove all items and the database file."""
+        self._items = set()
+        if self._database is not None:
+            self._database.close()
+            self._database = None
+            os.remove(self.filename)
+            self.filename = None
+
+
 class CombinedError(KeyError, IndexError):
 
     """An error that gets caught by both KeyError and IndexError."""
@@ -1251,6 +1498,79 @@ class DequeGenerator(IteratorNextMixin, collections.deque):
             raise StopIteration
 
 
+CacheInfo = collections.namedtuple('CacheInfo',
+                                   ['hits', 'misses', 'maxsize', 'currsize'])
+
+
+class LRUCache(object):
+
+    """
+    A thread safe mapping which holds a limited number of entries.
+
+    When the cache is full, the least recently used entry is discarded.
+    It counts the hits and misses of L{get} like C{functools.lru_cache}.
+    """
+
+    def __init__(self, maxsize):
+        """
+        Initializer.
+
+        @param maxsize: maximum number of entries. If not positive, nothing
+            is stored.
+        @type maxsize: int
+        """
+        self.maxsize = maxsize
+        self.hits = 0
+        self.misses = 0
+        self._data = collections.OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key, default=None):
+        """Return the value of key and mark it as recently used."""
+        with self._lock:
+            try:
+                value = self._data.pop(key)
+            except KeyError:
+                self.misses += 1
+                return default
+            self._data[key] = value
+            self.hits += 1
+            return value
+
+    def __setitem__(self, key, value):
+        """Store a value, discarding the least recently used entry."""
+        if self.maxsize <= 0:
+            return
+        with self._lock:
+            self._data.pop(key, None)
+            self._data[key] = value
+            if len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+
+    def __contains__(self, key):
+        """Return whether key is cached without marking it as used."""
+        return key in self._data
+
+    def __len__(self):
+        """Return the number of entries."""
+        return len(self._data)
+
+    def clear(self):
+        """Remove all entries and reset the statistics."""
+        with self._lock:
+            self._data.clear()
+            self.hits = self.misses = 0
+
+    def info(self):
+        """
+        Return the statistics of the cache.
+
+        @rtype: CacheInfo
+        """
+        return CacheInfo(self.hits, self.misses, self.maxsize,
+                         len(self._data))
+
+
 def open_archive(filename, mode='rb', use_extension=True):
     """
     Open a file and uncompress it if needed.
@@ -1786,6 +2106,9 @@ def remove_last_args(arg_names):
         @param obj: function being wrapped
         @type obj: object
         """
+        # the argument specification is determined on the first call
+        argspec = []
+
         def wrapper(*__args, **__kw):
             """Replacement function.
 
@@ -1796,7 +2119,9 @@ def remove_last_args(arg_names):
             """
             name = obj.__full_name__
             depth = get_wrapper_depth(wrapper) + 1
-            args, varargs, kwargs, _ = getargspec(wrapper.__wrapped__)
+            if not argspec:
+                argspec.append(getargspec(wrapper.__wrapped__))
+            args, varargs, kwargs, _ = argspec[0]
             if varargs is not None and kwargs is not None:
                 raise ValueError('{0} may not have * or ** args.'.format(
                     name))
@@ -7,22 +7,31 @@ Each XmlEntry object represents a page, as read from an XML source
 The XmlDump class reads a pages_current XML dump (like the ones offered on
 https://dumps.wikimedia.org/backup-index.html) and offers a generator over
 XmlEntry objects which can be used by other bots.
+
+The ParallelXmlDump class splits a multistream bz2 dump or an uncompressed
+dump into shards which are parsed and filtered by worker processes.
 """
 #
-# (C) Pywikibot team, 2005-2018
+# (C) Pywikibot team, 2005-2019
 #
 # Distributed under the terms of the MIT license.
 #
 from __future__ import absolute_import, division, unicode_literals
 
+import multiprocessing
+import os
 import re
 import threading
 
+from collections import deque
+from io import BytesIO
 from xml.etree.cElementTree import iterparse
 
 import xml.sax
 
-from pywikibot.tools import open_archive
+import pywikibot
+
+from pywikibot.tools import bz2, open_archive
 
 
 def parseRestrictions(restrictions):
@@ -50,7 +59,15 @@ def parseRestrictions(restrictions):
 
 class XmlEntry(object):
 
-    """Represent a page."""
+    """
+    Represent a page.
+
+    Fields which were not requested from L{XmlDump} are None.
+    """
+
+    __slots__ = ('title', 'ns', 'id', 'text', 'username', 'ipedit',
+                 'timestamp', 'editRestriction', 'moveRestriction',
+                 'revisionid', 'comment', 'isredirect')
 
     def __init__(self, title, ns, id, text, username, ipedit, timestamp,
                  editRestriction, moveRestriction, revisionid, comment,
@@ -61,7 +78,7 @@ class XmlEntry(object):
         self.ns = ns
         self.id = id
         self.text = text
-        self.username = username.strip()
+        self.username = username.strip() if username is not None else None
         self.ipedit = ipedit
         self.timestamp = timestamp
         self.editRestriction = editRestriction
@@ -70,6 +87,15 @@ class XmlEntry(object):
         self.comment = comment
         self.isredirect = redirect
 
+    def __getstate__(self):
+        """Return the field values for pickling."""
+        return tuple(getattr(self, name) for name in self.__slots__)
+
+    def __setstate__(self, state):
+        """Restore the field values when unpickling."""
+        for name, value in zip(self.__slots__, state):
+            setattr(self, name, value)
+
 
 class XmlParserThread(threading.Thread):
 
@@ -105,79 +131,123 @@ class XmlDump(object):
     @param allrevisions: boolean
         If True, parse all revisions instead of only the latest one.
         Default: False.
+    @param fields: names of the XmlEntry fields to read, e.g.
+        ('title', 'ns', 'text'). The other fields are not extracted from
+        the dump and are None. Default: all fields.
+    @type fields: iterable of str or None
     """
 
-    def __init__(self, filename, allrevisions=False):
+    # qualified tag names are precomputed for these elements
+    _tag_names = ('page', 'revision', 'title', 'ns', 'id', 'restrictions',
+                  'redirect', 'timestamp', 'comment', 'contributor', 'ip',
+                  'username', 'text')
+
+    def __init__(self, filename, allrevisions=False, fields=None):
         """Initializer."""
         self.filename = filename
         if allrevisions:
             self._parse = self._parse_all
         else:
             self._parse = self._parse_only_latest
+        if fields is None:
+            fields = XmlEntry.__slots__
+        self.fields = frozenset(fields)
+        unknown = self.fields.difference(XmlEntry.__slots__)
+        if unknown:
+            raise ValueError('Unknown XmlEntry fields: {0}'.format(
+                ', '.join(sorted(unknown))))
 
     def parse(self):
         """Generator using cElementTree iterparse function."""
         with open_archive(self.filename) as source:
-            # iterparse's event must be a str but they are unicode with
-            # unicode_literals in Python 2
-            context = iterparse(source, events=(str('start'), str('end'),
-                                                str('start-ns')))
-            self.root = None
-
-            for event, elem in context:
-                if event == 'start-ns' and elem[0] == '':
-                    self.uri = elem[1]
-                    continue
-                if event == 'start' and self.root is None:
-                    self.root = elem
-                    continue
-                for rev in self._parse(event, elem):
-                    yield rev
+            for rev in self._parse_source(source):
+                yield rev
+
+    def _parse_source(self, source):
+        """Parse a file-like object with the XML content."""
+        # iterparse's event must be a str but they are unicode with
+        # unicode_literals in Python 2
+        context = iterparse(source, events=(str('start'), str('end'),
+                                            str('start-ns')))
+        self.root = None
+
+        for event, elem in context:
+            if event == 'start-ns' and elem[0] == '':
+                self.uri = elem[1]
+                self._tags = {name: '{%s}%s' % (self.uri, name)
+                              for name in self._tag_names}
+                continue
+            if event == 'start' and self.root is None:
+                self.root = elem
+                continue
+            for rev in self._parse(event, elem):
+                yield rev
 
     def _parse_only_latest(self, event, elem):
         """Parser that yields only the latest revision."""
-        if event == 'end' and elem.tag == '{%s}page' % self.uri:
+        if event == 'end' and elem.tag == self._tags['page']:
             self._headers(elem)
-            revision = elem.find('{%s}revision' % self.uri)
+            revision = elem.find(self._tags['revision'])
             yield self._create_revision(revision)
             elem.clear()
             self.root.clear()
 
     def _parse_all(self, event, elem):
         """Parser that yields all revisions."""
-        if event == 'start' and elem.tag == '{%s}page' % self.uri:
+        if event == 'start' and elem.tag == self._tags['page']:
             self._headers(elem)
-        if event == 'end' and elem.tag == '{%s}revision' % self.uri:
+        if event == 'end' and elem.tag == self._tags['revision']:
             yield self._create_revision(elem)
             elem.clear()
             self.root.clear()
 
     def _headers(self, elem):
         """Extract headers from XML chunk."""
-        self.title = elem.findtext('{%s}title' % self.uri)
-        self.ns = elem.findtext('{%s}ns' % self.uri)
-        self.pageid = elem.findtext('{%s}id' % self.uri)
-        self.restrictions = elem.findtext('{%s}restrictions' % self.uri)
-        self.isredirect = elem.findtext('{%s}redirect' % self.uri) is not None
-        self.editRestriction, self.moveRestriction = parseRestrictions(
-            self.restrictions)
+        fields = self.fields
+        tags = self._tags
+        self.title = (elem.findtext(tags['title'])
+                      if 'title' in fields else None)
+        self.ns = elem.findtext(tags['ns']) if 'ns' in fields else None
+        self.pageid = elem.findtext(tags['id']) if 'id' in fields else None
+        self.isredirect = (elem.find(tags['redirect']) is not None
+                           if 'isredirect' in fields else None)
+        if 'editRestriction' in fields or 'moveRestriction' in fields:
+            self.restrictions = elem.findtext(tags['restrictions'])
+            self.editRestriction, self.moveRestriction = parseRestrictions(
+                self.restrictions)
+        else:
+            self.restrictions = None
+            self.editRestriction = self.moveRestriction = None
 
     def _create_revision(self, revision):
         """Create a Single revision."""
-        revisionid = revision.findtext('{%s}id' % self.uri)
-        timestamp = revision.findtext('{%s}timestamp' % self.uri)
-        comment = revision.findtext('{%s}comment' % self.uri)
-        contributor = revision.find('{%s}contributor' % self.uri)
-        ipeditor = contributor.findtext('{%s}ip' % self.uri)
-        username = ipeditor or contributor.findtext('{%s}username' % self.uri)
+        fields = self.fields
+        tags = self._tags
+        revisionid = (revision.findtext(tags['id'])
+                      if 'revisionid' in fields else None)
+        timestamp = (revision.findtext(tags['timestamp'])
+                     if 'timestamp' in fields else None)
+        comment = (revision.findtext(tags['comment'])
+                   if 'comment' in fields else None)
+        username = ipedit = None
+        if 'username' in fields or 'ipedit' in fields:
+            contributor = revision.find(tags['contributor'])
+            ipeditor = contributor.findtext(tags['ip'])
+            if 'username' in fields:
+                # username might be deleted
+                username = (ipeditor
+                            or contributor.findtext(tags['username']) or '')
+            if 'ipedit' in fields:
+                ipedit = bool(ipeditor)
         # could get comment, minor as well
-        text = revision.findtext('{%s}text' % self.uri)
+        text = ((revision.findtext(tags['text']) or '')
+                if 'text' in fields else None)
         return XmlEntry(title=self.title,
                         ns=self.ns,
                         id=self.pageid,
-                        text=text or '',
-                        username=username or '',  # username might be deleted
-                        ipedit=bool(ipeditor),
+                        text=text,
+                        username=username,
+                        ipedit=ipedit,
                         timestamp=timestamp,
                         editRestriction=self.editRestriction,
                         moveRestriction=self.moveRestriction,
@@ -185,3 +255,241 @@ class XmlDump(object):
                         comment=comment,
                         redirect=self.isredirect
                         )
+
+
+class XmlEntryFilter(object):
+
+    """
+    Filter for XmlEntry objects.
+
+    The filter is passed to the worker processes of L{ParallelXmlDump}, so
+    it only holds picklable values like compiled regular expressions.
+
+    @param namespaces: namespace numbers the entry must be in
+    @type namespaces: iterable of int
+    @param title_all: regexes which all must match the title
+    @type title_all: iterable of regex objects
+    @param title_none: regexes none of which may match the title
+    @type title_none: iterable of regex objects
+    @param text_any: regexes at least one of which must match the text
+    @type text_any: iterable of regex objects
+    @param text_none: regexes none of which may match the text
+    @type text_none: iterable of regex objects
+    """
+
+    def __init__(self, namespaces=None, title_all=(), title_none=(),
+                 text_any=(), text_none=()):
+        """Initializer."""
+        self.namespaces = (None if namespaces is None
+                           else {int(ns) for ns in namespaces})
+        self.title_all = list(title_all)
+        self.title_none = list(title_none)
+        self.text_any = list(text_any)
+        self.text_none = list(text_none)
+
+    def __call__(self, entry):
+        """Return whether the entry passes the filter."""
+        if self.namespaces is not None \
+                and int(entry.ns or 0) not in self.namespaces:
+            return False
+        if not all(regex.search(entry.title) for regex in self.title_all):
+            return False
+        if any(regex.search(entry.title) for regex in self.title_none):
+            return False
+        if self.text_any \
+                and not any(regex.search(entry.text)
+                            for regex in self.text_any):
+            return False
+        return not any(regex.search(entry.text) for regex in self.text_none)
+
+
+_COMPRESSED_EXTENSIONS = ('.bz2', '.gz', '.7z', '.lzma', '.xz')
+
+
+def _decompress_bz2_streams(data):
+    """Decompress concatenated bz2 streams."""
+    parts = []
+    while data:
+        decompressor = bz2.BZ2Decompressor()
+        parts.append(decompressor.decompress(data))
+        data = decompressor.unused_data
+    return b''.join(parts)
+
+
+def _parse_shard(filename, start, end, compressed, uri, allrevisions,
+                 fields, entry_filter):
+    """
+    Parse the pages in a byte range of a dump file.
+
+    This function runs in the worker processes of L{ParallelXmlDump}.
+
+    @return: the entries which pass the filter
+    @rtype: list of XmlEntry
+    """
+    with open(filename, 'rb') as f:
+        f.seek(start)
+        data = f.read(end - start)
+    if compressed:
+        data = _decompress_bz2_streams(data)
+    first = data.find(b'<page>')
+    last = data.rfind(b'</page>')
+    if first < 0 or last < 0:
+        return []
+    source = BytesIO(b''.join((b'<mediawiki xmlns="', uri, b'">',
+                               data[first:last + len(b'</page>')],
+                               b'</mediawiki>')))
+    dump = XmlDump(filename, allrevisions, fields)
+    return [entry for entry in dump._parse_source(source)
+            if entry_filter is None or entry_filter(entry)]
+
+
+class ParallelXmlDump(object):
+
+    """
+    Represents an XML dump file which is parsed by several processes.
+
+    A multistream bz2 dump is split at the stream offsets listed in its
+    index file. An uncompressed dump is split at '<page>' tags near
+    evenly spaced byte offsets. Each shard is parsed in a worker process
+    and only the entries passing entry_filter are sent back. The entries
+    are yielded in the order of the dump.
+
+    Other dumps can't be split. They are parsed in the current process
+    and filtered there.
+
+    @param filename: the dump file
+    @type filename: str
+    @param allrevisions: If True, parse all revisions instead of only the
+        latest one.
+    @type allrevisions: bool
+    @param processes: number of worker processes. Defaults to the number
+        of CPUs.
+    @type processes: int
+    @param entry_filter: filter applied to the entries in the workers. The
+        fields it tests must be included in fields.
+    @type entry_filter: XmlEntryFilter or None
+    @param fields: names of the XmlEntry fields to read, see L{XmlDump}
+    @type fields: iterable of str or None
+    @param index: index file of a multistream dump. By default it is
+        derived from the dump file name.
+    @type index: str
+    @param shard_size: approximate size of a shard in bytes of the dump
+        file
+    @type shard_size: int
+    """
+
+    def __init__(self, filename, allrevisions=False, processes=None,
+                 entry_filter=None, index=None, shard_size=4 * 1024 * 1024,
+                 fields=None):
+        """Initializer."""
+        self.filename = filename
+        self.allrevisions = allrevisions
+        self.fields = None if fields is None else tuple(fields)
+        self.processes = processes or multiprocessing.cpu_count()
+        self.entry_filter = entry_filter
+        if index is None and filename.endswith('multistream.xml.bz2'):
+            index = filename[:-len('.xml.bz2')] + '-index.txt.bz2'
+            if not os.path.exists(index):
+                index = None
+        self.index = index
+        self.shard_size = shard_size
+
+    def _read_uri(self):
+        """Return the XML namespace of the dump as bytes or None."""
+        with open_archive(self.filename) as source:
+            header = source.read(4096)
+        if header.startswith((b'\xff\xfe', b'\xfe\xff')):
+            # Only UTF-8 dumps can be split
+            return None
+        match = re.search(br'<mediawiki[^>]*?\sxmlns="([^"]+)"', header)
+        return match.group(1) if match else None
+
+    def _multistream_shards(self):
+        """Return the byte ranges of the streams grouped into shards."""
+        offsets = set()
+        with open_archive(self.index) as index:
+            for line in index:
+                offsets.add(int(line.split(b':', 1)[0]))
+        offsets = sorted(offsets)
+        offsets.append(os.path.getsize(self.filename))
+        shards = []
+        start = offsets[0]
+        for offset in offsets[1:]:
+            if offset - start >= self.shard_size or offset == offsets[-1]:
+                shards.append((start, offset))
+                start = offset
+        return shards
+
+    def _plain_shards(self):
+        """Return byte ranges starting at '<page>' tags."""
+        size = os.path.getsize(self.filename)
+        starts = []
+        with open(self.filename, 'rb') as f:
+            position = 0
+            while position < size:
+                f.seek(position)
+                buffered = b''
+                found = -1
+                while found < 0:
+                    chunk = f.read(65536)
+                    if not chunk:
+                        break
+                    # keep the end of the previous chunk to find split tags
+                    buffered = buffered[-5:] + chunk
+                    found = buffered.find(b'<page>')
+                    offset = f.tell() - len(buffered)
+                if found < 0:
+                    break
+                starts.append(offset + found)
+                position = max(starts[-1] + 1, position + self.shard_size)
+        return list(zip(starts, starts[1:] + [size]))
+
+    def _sequential(self):
+        """Parse and filter the dump in the current process."""
+        dump = XmlDump(self.filename, self.allrevisions, self.fields)
+        for entry in dump.parse():
+            if self.entry_filter is None or self.entry_filter(entry):
+                yield entry
+
+    def parse(self):
+        """Generator of the XmlEntry objects passing the filter."""
+        extension = os.path.splitext(self.filename)[1].lower()
+        uri = self._read_uri()
+        if uri is None or self.processes < 2:
+            shards = None
+        elif self.index and extension == '.bz2':
+            shards = self._multistream_shards()
+        elif extension in _COMPRESSED_EXTENSIONS:
+            # the compressed stream can't be entered at a byte offset
+            shards = None
+        else:
+            shards = self._plain_shards()
+
+        if not shards:
+            pywikibot.log('Parsing {0} in a single process'
+                          .format(self.filename))
+            for entry in self._sequential():
+                yield entry
+            return
+
+        compressed = self.index is not None
+        pool = multiprocessing.Pool(self.processes)
+        try:
+            pending = deque()
+            shards = iter(shards)
+            while True:
+                # keep a bounded number of shards in progress
+                for start, end in shards:
+                    pending.append(pool.apply_async(
+                        _parse_shard,
+                        (self.filename, start, end, compressed, uri,
+                         self.allrevisions, self.fields, self.entry_filter)))
+                    if len(pending) >= 2 * self.processes:
+                        break
+                if not pending:
+                    break
+                for entry in pending.popleft().get():
+                    yield entry
+        finally:
+            pool.terminate()
+            pool.join()
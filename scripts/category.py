@@ -73,6 +73,13 @@ Options for "tidy" action:
 Options for several actions:
 
  -rebuild     - Reset the database.
+ -sqlite      - Keep the database in category.sqlite3 instead of
+                category.dump.bz2. Every category is stored when it has
+                been retrieved and only the categories which are used are
+                read, so tree and tidy work on large trees without loading
+                the whole database.
+ -ttl:n       - With -sqlite, retrieve categories again which were stored
+                more than n days ago.
  -from:       - The category to move from (for the move option)
                 Also, the category to remove from in the remove option
                 Also, the category to make a list of in the listify option.
@@ -96,9 +103,9 @@ Options for several actions:
                 listed.
 
 For the actions tidy and tree, the bot will store the category structure
-locally in category.dump. This saves time and server load, but if it uses
-these data later, they may be outdated; use the -rebuild parameter in this
-case.
+locally in category.dump or with -sqlite in category.sqlite3. This saves
+time and server load, but if it uses these data later, they may be
+outdated; use the -rebuild or -ttl parameter in this case.
 
 For example, to create a new category from a list of persons, type:
 
@@ -127,10 +134,13 @@ This will move all pages in the category US to the category United States.
 from __future__ import absolute_import, division, unicode_literals
 
 import codecs
+import json
 import math
 import os
 import pickle
 import re
+import sqlite3
+import time
 
 from operator import methodcaller
 
@@ -400,6 +410,125 @@ class CategoryDatabase(object):
                                  .format(config.shortpath(filename)))
 
 
+class CategoryStore(CategoryDatabase):
+
+    """Category database kept in a SQLite file.
+
+    Unlike L{CategoryDatabase}, which loads and saves all categories as
+    one pickle, the entries are keyed by site and category title. Every
+    entry is written when it has been retrieved, so an interrupted run
+    keeps what it retrieved. A lookup loads this entry only. Entries
+    older than ttl are retrieved again.
+    """
+
+    _schema = (
+        'CREATE TABLE IF NOT EXISTS categories ('
+        ' site TEXT NOT NULL,'
+        ' title TEXT NOT NULL,'
+        ' kind TEXT NOT NULL,'
+        ' members TEXT NOT NULL,'
+        ' timestamp REAL NOT NULL,'
+        ' PRIMARY KEY (site, title, kind))',
+    )
+
+    def __init__(self, rebuild=False, filename='category.sqlite3',
+                 ttl=None):
+        """Initializer.
+
+        @param rebuild: delete all entries
+        @type rebuild: bool
+        @param filename: path of the database file
+        @type filename: str
+        @param ttl: maximum age of the entries in days. If None, the
+            entries don't expire.
+        @type ttl: float
+        """
+        if not os.path.isabs(filename):
+            filename = config.datafilepath(filename)
+        self.filename = filename
+        self.ttl = ttl
+        self._connection = sqlite3.connect(filename, timeout=60)
+        with self._connection:
+            for statement in self._schema:
+                self._connection.execute(statement)
+        if rebuild:
+            self.rebuild()
+
+    @property
+    def is_loaded(self):
+        """Return True, the entries are loaded when they are used."""
+        return True
+
+    def _load(self):
+        """Nothing to do, the entries are loaded when they are used."""
+
+    def rebuild(self):
+        """Delete all entries."""
+        with self._connection:
+            self._connection.execute('DELETE FROM categories')
+
+    def _get(self, cat, kind):
+        """Return the stored members of a category or None if expired."""
+        row = self._connection.execute(
+            'SELECT members, timestamp FROM categories '
+            'WHERE site = ? AND title = ? AND kind = ?',
+            (str(cat.site), cat.title(with_section=False), kind)).fetchone()
+        if row is None:
+            return None
+        members, timestamp = row
+        if self.ttl is not None and time.time() - timestamp > self.ttl * 86400:
+            return None
+        return json.loads(members)
+
+    def _put(self, cat, kind, members):
+        """Store the members of a category."""
+        with self._connection:
+            self._connection.execute(
+                'INSERT OR REPLACE INTO categories '
+                '(site, title, kind, members, timestamp) '
+                'VALUES (?, ?, ?, ?, ?)',
+                (str(cat.site), cat.title(with_section=False), kind,
+                 json.dumps(members), time.time()))
+
+    def _content(self, cat):
+        """Return the subcategories and articles of a category."""
+        content = self._get(cat, 'content')
+        if content is None:
+            subcatset = set(cat.subcategories())
+            articleset = set(cat.articles())
+            self._put(cat, 'content', {
+                'subcats': [subcat.title() for subcat in subcatset],
+                'articles': [article.title() for article in articleset]})
+            return subcatset, articleset
+        return ({pywikibot.Category(cat.site, title)
+                 for title in content['subcats']},
+                {pywikibot.Page(cat.site, title)
+                 for title in content['articles']})
+
+    def getSubcats(self, supercat):
+        """Return the list of subcategories for a given supercategory."""
+        return self._content(supercat)[0]
+
+    def getArticles(self, cat):
+        """Return the list of pages for a given category."""
+        return self._content(cat)[1]
+
+    def getSupercats(self, subcat):
+        """Return the supercategory (or a set of) for a given subcategory."""
+        supercats = self._get(subcat, 'supercats')
+        if supercats is None:
+            supercatset = set(subcat.categories())
+            self._put(subcat, 'supercats',
+                      [supercat.title() for supercat in supercatset])
+            return supercatset
+        return {pywikibot.Category(subcat.site, title)
+                for title in supercats}
+
+    def dump(self, filename=None):
+        """Close the database, the entries are already written."""
+        self._connection.close()
+
+
 class CategoryAddBot(MultipleSitesBot, CategoryPreprocess):
 
     """A robot to mass-add a category to a list of pages."""
@@ -1279,6 +1408,19 @@ class CategoryTreeRobot(object):
             * currentDepth - the current level in the tree (for recursion).
             * parent - the Category of the category we're coming from.
 
+        """
+        return ''.join(self.treeview_lines(cat, currentDepth, parent))
+
+    def treeview_lines(self, cat, currentDepth=0, parent=None):
+        """Yield the lines of the tree view of all subcategories of cat.
+
+        Only the categories on the path to the current category are kept,
+        so the memory used does not grow with the size of the tree.
+
+        @param cat: the Category of the node we're currently opening
+        @param currentDepth: the current level in the tree
+        @param parent: the Category of the category we're coming from
+        @rtype: generator of str
         """
         result = '#' * currentDepth
         if currentDepth > 0:
@@ -1303,15 +1445,16 @@ class CategoryTreeRobot(object):
                                              {'alsocat': comma.join(
                                                  supercat_names)})
         del supercat_names
-        result += '\n'
+        yield result + '\n'
         if currentDepth < self.maxDepth:
             for subcat in self.catDB.getSubcats(cat):
                 # recurse into subdirectories
-                result += self.treeview(subcat, currentDepth + 1, parent=cat)
+                for line in self.treeview_lines(subcat, currentDepth + 1,
+                                                parent=cat):
+                    yield line
         elif self.catDB.getSubcats(cat):
             # show that there are more categories beyond the depth limit
-            result += '#' * (currentDepth + 1) + ' [...]\n'
-        return result
+            yield '#' * (currentDepth + 1) + ' [...]\n'
 
     def run(self):
         """Handle the multi-line string generated by treeview.
@@ -1320,14 +1463,16 @@ class CategoryTreeRobot(object):
         console or saved it to a file.
         """
         cat = pywikibot.Category(self.site, self.catTitle)
-        pywikibot.output('Generating tree...', newline=False)
-        tree = self.treeview(cat)
-        pywikibot.output('')
         if self.filename:
-            pywikibot.output('Saving results in ' + self.filename)
+            pywikibot.output('Saving tree in ' + self.filename)
             with codecs.open(self.filename, 'a', 'utf-8') as f:
-                f.write(tree)
+                for line in self.treeview_lines(cat):
+                    f.write(line)
+            pywikibot.output('')
         else:
+            pywikibot.output('Generating tree...', newline=False)
+            tree = self.treeview(cat)
+            pywikibot.output('')
             pywikibot.stdout(tree)
 
 
@@ -1355,6 +1500,8 @@ def main(*args):
     wikibase = True
     history = False
     rebuild = False
+    sqlite = False
+    ttl = None
     allow_split = False
     move_together = False
     keep_sortkey = None
@@ -1394,6 +1541,10 @@ def main(*args):
             sort_by_last_name = True
         elif option == 'rebuild':
             rebuild = True
+        elif option == 'sqlite':
+            sqlite = True
+        elif option == 'ttl':
+            ttl = float(value)
         elif option == 'from':
             old_cat_title = value.replace('_', ' ')
             from_given = True
@@ -1447,7 +1598,10 @@ def main(*args):
     cat_db = None
     bot = None
 
-    cat_db = CategoryDatabase(rebuild=rebuild)
+    if sqlite:
+        cat_db = CategoryStore(rebuild=rebuild, ttl=ttl)
+    else:
+        cat_db = CategoryDatabase(rebuild=rebuild)
     gen = gen_factory.getCombinedGenerator()
 
     if action == 'add':
@@ -309,11 +309,18 @@ The following arguments influence how many pages the bot works on at once:
     -query:        The maximum number of pages that the bot will load at once.
                    Default value is 50.
 
+    -inflight:     The number of queries to different sites the bot runs at
+                   the same time. The default is 1, but can be changed in the
+                   config variable interwiki_queries_in_flight
+
 Some configuration option can be used to change the working of this bot:
 
  interwiki_min_subjects: the minimum amount of subjects that should be
                      processed at the same time.
 
+ interwiki_queries_in_flight: the number of queries to different sites
+                     which are run at the same time.
+
  interwiki_backlink: if set to True, all problems in foreign wikis will
                      be reported
 
@@ -355,6 +362,8 @@ import re
 import shelve
 import socket
 import sys
+import threading
+import time
 
 import pywikibot
 
@@ -363,9 +372,14 @@ from pywikibot import titletranslate
 
 from pywikibot.bot import ListOption, StandardOption
 from pywikibot.cosmetic_changes import moved_links
-from pywikibot.tools import first_upper, UnicodeType
+from pywikibot.tools import first_upper, PY2, UnicodeType
 from pywikibot.tools.formatter import color_format
 
+if not PY2:
+    import queue
+else:
+    import Queue as queue  # noqa: N813
+
 docuReplacements = {
     '&params;': pagegenerators.parameterHelp
 }
@@ -441,6 +455,7 @@ class InterwikiBotConfig(object):
     rememberno = False
     followinterwiki = True
     minsubjects = config.interwiki_min_subjects
+    queriesinflight = config.interwiki_queries_in_flight
     nobackonly = False
     askhints = False
     hintnobracket = False
@@ -535,6 +550,9 @@ class InterwikiBotConfig(object):
         elif arg == 'query':
             if value.isdigit():
                 self.maxquerysize = int(value)
+        elif arg == 'inflight':
+            if value.isdigit():
+                self.queriesinflight = int(value)
         elif arg == 'back':
             self.nobackonly = True
         elif arg == 'async':
@@ -2020,6 +2038,12 @@ class InterwikiBot(object):
         self.pageGenerator = None
         self.generated = 0
         self.conf = conf
+        # Queries in progress and their results if run concurrently.
+        # sites are keys, the subjects waiting for the query are values.
+        self.inflight = {}
+        self.results = queue.Queue()
+        # number of queries, pages and seconds per site
+        self.querystats = {}
 
     def add(self, page, hints=None):
         """Add a single subject to the list."""
@@ -2133,12 +2157,14 @@ class InterwikiBot(object):
         if self.subjects:
             return self.subjects[0]
 
-    def maxOpenSite(self):
+    def maxOpenSite(self, exclude=()):
         """
         Return the site that has the most open queries plus the number.
 
         If there is nothing left, return None.
         Only languages that are TODO for the first Subject are returned.
+
+        @param exclude: sites which must not be returned
         """
         max = 0
         maxlang = None
@@ -2150,17 +2176,23 @@ class InterwikiBot(object):
             # because we have to wait before submitting another modification to
             # go live. Select any language from counts.
             oc = self.counts
-        if pywikibot.Site() in oc:
+        if pywikibot.Site() in oc and pywikibot.Site() not in exclude:
             return pywikibot.Site()
         for lang in oc:
+            if lang in exclude:
+                continue
             count = self.counts[lang]
             if count > max:
                 max = count
                 maxlang = lang
         return maxlang
 
-    def selectQuerySite(self):
-        """Select the site the next query should go out for."""
+    def selectQuerySite(self, exclude=()):
+        """
+        Select the site the next query should go out for.
+
+        @param exclude: sites which must not be selected
+        """
         # How many home-language queries we still have?
         mycount = self.counts.get(pywikibot.Site(), 0)
         # Do we still have enough subjects to work on for which the
@@ -2186,30 +2218,29 @@ class InterwikiBot(object):
             # If we have a few, getting the home language is a good thing.
             if not self.conf.restore_all:
                 try:
-                    if self.counts[pywikibot.Site()] > 4:
+                    if (self.counts[pywikibot.Site()] > 4
+                            and pywikibot.Site() not in exclude):
                         return pywikibot.Site()
                 except KeyError:
                     pass
         # If getting the home language doesn't make sense, see how many
         # foreign page queries we can find.
-        return self.maxOpenSite()
+        return self.maxOpenSite(exclude)
 
-    def oneQuery(self):
+    def assembleBatch(self, site):
         """
-        Perform one step in the solution process.
+        Assemble a reasonable list of pages to get from a site.
 
-        Returns True if pages could be preloaded, or false
-        otherwise.
+        Subjects which are waiting for a query in progress are skipped.
+
+        @return: the subjects and the pages of the batch
+        @rtype: tuple of (list, list)
         """
-        # First find the best language to work on
-        site = self.selectQuerySite()
-        if site is None:
-            pywikibot.output('NOTE: Nothing left to do')
-            return False
-        # Now assemble a reasonable list of pages to get
         subjectGroup = []
         pageGroup = []
         for subject in self.subjects:
+            if subject.pending:
+                continue
             # Promise the subject that we will work on the site.
             # We will get a list of pages we can do.
             pages = subject.whatsNextPageBatch(site)
@@ -2219,9 +2250,11 @@ class InterwikiBot(object):
                 if len(pageGroup) >= self.conf.maxquerysize:
                     # We have found enough pages to fill the bandwidth.
                     break
-        if len(pageGroup) == 0:
-            pywikibot.output('NOTE: Nothing left to do 2')
-            return False
+        return subjectGroup, pageGroup
+
+    def loadBatch(self, site, pageGroup):
+        """Load the pages of a batch from the site and record the time."""
+        start = time.time()
         # Get the content of the assembled list in one blow
         gen = site.preloadpages(pageGroup, templates=True, langlinks=True,
                                 pageprops=True)
@@ -2229,17 +2262,93 @@ class InterwikiBot(object):
             # we don't want to do anything with them now. The
             # page contents will be read via the Subject class.
             pass
+        self.recordQuery(site, len(pageGroup), time.time() - start)
+
+    def recordQuery(self, site, pages, seconds):
+        """Add a query to the statistics of the site."""
+        queries, total, duration = self.querystats.get(site, (0, 0, 0.0))
+        self.querystats[site] = (queries + 1, total + pages,
+                                 duration + seconds)
+
+    def oneQuery(self):
+        """
+        Perform one step in the solution process.
+
+        Returns True if pages could be preloaded, or false
+        otherwise.
+        """
+        if self.conf.queriesinflight > 1:
+            return self.concurrentQuery()
+        # First find the best language to work on
+        site = self.selectQuerySite()
+        if site is None:
+            pywikibot.output('NOTE: Nothing left to do')
+            return False
+        subjectGroup, pageGroup = self.assembleBatch(site)
+        if len(pageGroup) == 0:
+            pywikibot.output('NOTE: Nothing left to do 2')
+            return False
+        self.loadBatch(site, pageGroup)
+        # Tell all of the subjects that the promised work is done
+        for subject in subjectGroup:
+            subject.batchLoaded(self)
+        return True
+
+    def concurrentQuery(self):
+        """
+        Perform one step with several queries in progress.
+
+        Queries to further sites are started until conf.queriesinflight
+        queries are in progress. Each query runs in its own thread and
+        only one query per site is in progress, so each query is delayed
+        by the throttle of its site only. Then the subjects of the first
+        query which is complete are told that their batch was loaded.
+
+        Returns True if pages could be preloaded, or false
+        otherwise.
+        """
+        exclude = set(self.inflight)
+        while len(self.inflight) < self.conf.queriesinflight:
+            site = self.selectQuerySite(exclude)
+            if site is None:
+                break
+            exclude.add(site)
+            subjectGroup, pageGroup = self.assembleBatch(site)
+            if not pageGroup:
+                continue
+            self.inflight[site] = subjectGroup
+            thread = threading.Thread(target=self._query,
+                                      args=(site, pageGroup))
+            thread.daemon = True
+            thread.start()
+        if not self.inflight:
+            pywikibot.output('NOTE: Nothing left to do')
+            return False
+        site, error = self.results.get()
+        subjectGroup = self.inflight.pop(site)
+        if error is not None:
+            raise error
         # Tell all of the subjects that the promised work is done
         for subject in subjectGroup:
             subject.batchLoaded(self)
         return True
 
+    def _query(self, site, pageGroup):
+        """Load a batch in a thread and pass the result to the bot."""
+        try:
+            self.loadBatch(site, pageGroup)
+        except Exception as e:
+            self.results.put((site, e))
+        else:
+            self.results.put((site, None))
+
     def queryStep(self):
         """Delete the ones that are done now."""
         self.oneQuery()
         for i in range(len(self.subjects) - 1, -1, -1):
             subj = self.subjects[i]
-            if subj.isDone():
+            # subjects of a query in progress are not done
+            if subj.isDone() and not subj.pending:
                 subj.finish()
                 subj.clean()
                 del self.subjects[i]
@@ -2259,10 +2368,33 @@ class InterwikiBot(object):
         """Helper routine that the Subject class expects in a counter."""
         self.counts[site] -= count
 
+    def queryStatistics(self):
+        """
+        Return statistics of the queries per site.
+
+        Use them to tune maxquerysize, minsubjects and queriesinflight.
+
+        @return: tuples (site, depth, queries, pages, seconds) where depth
+            is the number of pages still to be loaded from the site and
+            seconds the average duration of a query
+        @rtype: list
+        """
+        statistics = []
+        for site in sorted(set(self.counts) | set(self.querystats), key=str):
+            queries, pages, seconds = self.querystats.get(site, (0, 0, 0.0))
+            statistics.append((site, self.counts.get(site, 0), queries, pages,
+                               seconds / queries if queries else 0.0))
+        return statistics
+
     def run(self):
         """Start the process until finished."""
         while not self.isDone():
             self.queryStep()
+        for site, depth, queries, pages, seconds in self.queryStatistics():
+            if queries:
+                pywikibot.log('{0}: {1} queries for {2} pages, {3:.2f} '
+                              'seconds per query, {4} pages queued'
+                              .format(site, queries, pages, seconds, depth))
 
     def __len__(self):
         """Return length of subjects."""
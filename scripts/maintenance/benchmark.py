@@ -0,0 +1,325 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+r"""
+Benchmarks for performance critical parts of the framework.
+
+Syntax:
+
+    python pwb.py benchmark <name> [-repeat:n] [-lines:n] [generator options]
+
+The benchmarks run on the text of the pages given by the page generator
+options, e.g. long list articles or village pumps. Without page generator
+options a synthetic wikitext is used and no network access is needed.
+
+Available benchmarks:
+
+replaceexcept     Compare the single pass engine and the legacy engine of
+                  textlib.replaceExcept.
+
+linkparse         Parse the links of the texts and format the titles of
+                  their pages with and without the link cache of the site
+                  (config.link_cache_size).
+
+apistream         Compare the time and the peak memory of decoding a query
+                  response with the revisions of the texts at once and
+                  streamed (config.API_stream_results). The memory is only
+                  measured on Python 3.
+
+regexbundle       Compare compiling the site dependent regexes of textlib
+                  for every page and once per site for the texts on all
+                  language editions of the family of the site. The site
+                  data of the editions is retrieved before measuring.
+
+The following parameters are supported:
+
+-repeat:n         Run each benchmark n times and report the best time.
+                  Default is 5.
+
+-lines:n          Number of lines of the synthetic wikitext. Default is 5000.
+
+&params;
+"""
+#
+# (C) Pywikibot team, 2019
+#
+# Distributed under the terms of the MIT license.
+#
+from __future__ import absolute_import, division, unicode_literals
+
+import json
+import re
+
+from collections import OrderedDict
+from timeit import default_timer
+
+import pywikibot
+
+from pywikibot import pagegenerators, textlib
+from pywikibot.data import api
+from pywikibot.tools import LRUCache
+
+try:
+    import tracemalloc
+except ImportError:  # Python 2
+    tracemalloc = None
+
+docuReplacements = {'&params;': pagegenerators.parameterHelp}  # noqa: N816
+
+_SYNTHETIC_LINE = (
+    '* [[Article {0}|The article {0}]] was created in {0}<ref>{{{{cite web'
+    '|url=http://example.org/{0}|title=The {0}}}}}</ref> <!-- the {0} -->'
+    ' and <nowiki>[[the {0}]]</nowiki> the end.')
+
+
+def synthetic_text(lines):
+    """Return a list article like wikitext."""
+    return '\n'.join(_SYNTHETIC_LINE.format(i) for i in range(lines))
+
+
+def best_time(func, repeat):
+    """Return the result and the best time of calling func repeatedly."""
+    times = []
+    for _ in range(repeat):
+        start = default_timer()
+        result = func()
+        times.append(default_timer() - start)
+    return result, min(times)
+
+
+def replaceexcept(texts, site, repeat):
+    """Compare the engines of textlib.replaceExcept."""
+    replacements = [
+        (r'\bthe\b', 'THE'),
+        (r'\[\[([^|\]]+)\|([^\]]+)\]\]', r'[[\2|\1]]'),
+        (r'(\d+)', lambda match: match.group(1)[::-1]),
+    ]
+    exceptions = textlib._get_regexes(
+        ['comment', 'nowiki', 'template', 'ref', 'pre', 'source', 'math'],
+        site)
+    engines = OrderedDict([
+        ('single pass', lambda text, old, replacement: (
+            textlib._replace_except_spans(text, old, replacement, exceptions,
+                                          '', 0))),
+        ('legacy', lambda text, old, replacement: (
+            textlib._replace_except_legacy(text, old, replacement,
+                                           exceptions, False, '', 0))),
+    ])
+    for old, new in replacements:
+        old = re.compile(old)
+        replacement = textlib._replacement_function(new)
+        pywikibot.output('Replacing {0!r}:'.format(old.pattern))
+        results = {}
+        for name, engine in engines.items():
+            results[name], seconds = best_time(
+                lambda: [engine(text, old, replacement) for text in texts],
+                repeat)
+            pywikibot.output('  {0:<12} {1:8.3f} s'.format(name, seconds))
+        if len(set(map(tuple, results.values()))) > 1:
+            pywikibot.warning('The engines returned different results.')
+
+
+def linkparse(texts, site, repeat):
+    """Compare parsing links with and without the link cache."""
+    titles = [match.group('title') for text in texts
+              for match in pywikibot.link_regex.finditer(text)]
+    pywikibot.output('{0} links, {1} distinct'.format(
+        len(titles), len(set(titles))))
+
+    def parse():
+        results = []
+        for title in titles:
+            try:
+                page = pywikibot.Page(pywikibot.Link(title, site))
+            except pywikibot.Error:
+                continue
+            results.append((page.title(), page.title(as_link=True),
+                            page.title(with_ns=False)))
+        return results
+
+    old_cache = site._link_cache
+    results = {}
+    try:
+        for name, size in (('uncached', 0), ('cached', len(titles))):
+            caches = []
+
+            def run():
+                # each run starts with an empty cache
+                caches.append(LRUCache(size))
+                site._link_cache = caches[-1]
+                return parse()
+
+            results[name], seconds = best_time(run, repeat)
+            pywikibot.output('  {0:<12} {1:8.3f} s'.format(name, seconds))
+        info = caches[-1].info()
+        pywikibot.output('  cache hits: {0}, misses: {1}'.format(
+            info.hits, info.misses))
+    finally:
+        site._link_cache = old_cache
+    if results['uncached'] != results['cached']:
+        pywikibot.warning('The results with and without cache differ.')
+
+
+def apistream(texts, site, repeat):
+    """Compare decoding query responses at once and streamed."""
+    copies = max(1, 50 // len(texts))
+    pages = {}
+    for pageid, text in enumerate(texts * copies, start=1):
+        pages[str(pageid)] = {
+            'pageid': pageid, 'ns': 0, 'title': 'Page {0}'.format(pageid),
+            'revisions': [{'revid': pageid, 'contentformat': 'text/x-wiki',
+                           'contentmodel': 'wikitext', '*': text}]}
+    raw = json.dumps({'batchcomplete': '', 'query': {'pages': pages}})
+    del pages
+    pywikibot.output('Response of {0} pages with {1} characters'.format(
+        len(texts) * copies, len(raw)))
+
+    def consume(results):
+        # like a generator consumer which doesn't keep the pages
+        return sum(len(page['revisions'][0]['*']) for page in results)
+
+    decoders = OrderedDict([
+        ('decoded', lambda: consume(
+            json.loads(raw)['query']['pages'].values())),
+        ('streamed', lambda: consume(
+            api._stream_json(raw, 'pages')['query']['pages'])),
+    ])
+    results = {}
+    for name, decode in decoders.items():
+        results[name], seconds = best_time(decode, repeat)
+        if tracemalloc:
+            tracemalloc.start()
+            decode()
+            peak = tracemalloc.get_traced_memory()[1]
+            tracemalloc.stop()
+            memory = '{0:8.1f} MiB peak'.format(peak / 2 ** 20)
+        else:
+            memory = ''
+        pywikibot.output('  {0:<12} {1:8.3f} s {2}'.format(
+            name, seconds, memory))
+    if results['decoded'] != results['streamed']:
+        pywikibot.warning('The decoded and streamed results differ.')
+
+
+def regexbundle(texts, site, repeat):
+    """Compare building the textlib regexes for each page and per site."""
+    sites = []
+    for code in site.family.languages_by_size:
+        try:
+            other = pywikibot.Site(code, site.family)
+            # retrieve the site data before measuring
+            textlib.TimeStripper(other)
+            textlib._get_regexes(['interwiki', 'invoke', 'property'], other)
+        except pywikibot.Error as e:
+            pywikibot.warning('Skipping {0}: {1}'.format(code, e))
+            continue
+        sites.append(other)
+    pywikibot.output('{0} sites'.format(len(sites)))
+
+    def clear():
+        textlib._site_regex_bundles.clear()
+        textlib._link_regexes.clear()
+        re.purge()
+
+    def startup(other):
+        textlib._get_regexes(['category', 'file', 'interwiki', 'invoke',
+                              'property'], other)
+        textlib._MultiTemplateMatchBuilder(other).pattern('Cite web')
+        textlib.compileLinkR()
+        return textlib.TimeStripper(other)
+
+    def treat(other, text):
+        text = textlib.removeLanguageLinks(text, other)
+        text = textlib.removeCategoryLinks(text, other)
+        builder = textlib._MultiTemplateMatchBuilder(other)
+        templates = len(builder.pattern('Cite web').findall(text))
+        links = len(textlib.compileLinkR().findall(text))
+        timestamp = textlib.TimeStripper(other).timestripper(text[-200:])
+        return len(text), templates, links, timestamp
+
+    def per_page():
+        results = []
+        for other in sites:
+            for text in texts:
+                clear()
+                results.append(treat(other, text))
+        return results
+
+    def per_site():
+        clear()
+        return [treat(other, text) for other in sites for text in texts]
+
+    def build():
+        clear()
+        return [startup(other) for other in sites]
+
+    _, seconds = best_time(build, repeat)
+    pywikibot.output('  {0:<12} {1:8.3f} s, {2:.2f} ms per site'.format(
+        'startup', seconds, 1000 * seconds / max(len(sites), 1)))
+    results = {}
+    pages = max(len(sites) * len(texts), 1)
+    for name, func in (('per page', per_page), ('per site', per_site)):
+        results[name], seconds = best_time(func, repeat)
+        pywikibot.output('  {0:<12} {1:8.3f} s, {2:.2f} ms per page'.format(
+            name, seconds, 1000 * seconds / pages))
+    if results['per page'] != results['per site']:
+        pywikibot.warning('The results differ.')
+
+
+BENCHMARKS = OrderedDict([
+    ('replaceexcept', replaceexcept),
+    ('linkparse', linkparse),
+    ('apistream', apistream),
+    ('regexbundle', regexbundle),
+])
+
+
+def main(*args):
+    """
+    Process command line arguments and invoke the benchmarks.
+
+    If args is an empty list, sys.argv is used.
+
+    @param args: command line arguments
+    @type args: unicode
+    """
+    names = []
+    repeat = 5
+    lines = 5000
+    local_args = pywikibot.handle_args(args)
+    gen_factory = pagegenerators.GeneratorFactory()
+    for arg in local_args:
+        if gen_factory.handleArg(arg):
+            continue
+        option, _, value = arg.partition(':')
+        if option == '-repeat':
+            repeat = int(value)
+        elif option == '-lines':
+            lines = int(value)
+        elif arg in BENCHMARKS:
+            names.append(arg)
+        else:
+            pywikibot.bot.suggest_help(unknown_parameters=[arg])
+            return False
+
+    if not names:
+        pywikibot.bot.suggest_help(
+            additional_text='Available benchmarks: {0}'.format(
+                ', '.join(BENCHMARKS)))
+        return False
+
+    site = pywikibot.Site()
+    gen = gen_factory.getCombinedGenerator(preload=True)
+    if gen:
+        texts = [page.text for page in gen]
+    else:
+        texts = [synthetic_text(lines)]
+    pywikibot.output('Running on {0} texts with {1} characters.'.format(
+        len(texts), sum(len(text) for text in texts)))
+
+    for name in names:
+        pywikibot.output('\n{0}:'.format(name))
+        BENCHMARKS[name](texts, site, repeat)
+
+
+if __name__ == '__main__':
+    main()
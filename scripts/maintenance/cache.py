@@ -5,9 +5,12 @@ This script runs commands on each entry in the API caches.
 
 Syntax:
 
-    python pwb.py cache [-password] [-delete] [-c "..."] [-o "..."] [dir ...]
+    python pwb.py cache [-password] [-delete] [-c "..."] [-o "..."]
+                        [-site:family:code] [-older:days] [-expired]
+                        [dir ...] [file.sqlite3 ...]
 
-If no directory are specified, it will detect the API caches.
+If no directory are specified, it will detect the API caches. Paths ending
+with '.sqlite3' are databases written by the 'sqlite' API cache backend.
 
 If no command is specified, it will print the filename of all entries.
 If only -delete is specified, it will delete all entries.
@@ -23,6 +26,18 @@ The following parameters are supported:
 -o                Output command which is output when the filter evaluated to
                   True. If it returns None it won't output anything.
 
+The following parameters are only supported for '.sqlite3' databases. They
+are evaluated by querying the database index, so only the selected entries
+are loaded. Together with -delete and without -c and -o the entries are
+deleted without loading any of them.
+
+-site:family:code Only process entries of the given site.
+
+-older:days       Only process entries which are older than the given number
+                  of days.
+
+-expired          Only process entries whose expiry time has passed.
+
 Examples
 --------
 
@@ -45,6 +60,11 @@ Examples
     -c has_password
     -o uniquedesc
 
+  Delete all entries of the English Wikipedia older than a week from a
+  SQLite cache:
+
+    -delete -site:wikipedia:en -older:7 apicache-py3.sqlite3
+
 Available filter commands:
 
     has_password(entry)
@@ -73,12 +93,13 @@ from __future__ import absolute_import, division, unicode_literals
 
 import datetime
 import hashlib
+import operator
 import os
 import pickle
 
 import pywikibot
 
-from pywikibot.data import api
+from pywikibot.data import api, apicache
 
 # The follow attributes are used by eval()
 from pywikibot.page import User
@@ -88,7 +109,8 @@ from pywikibot.tools import PYTHON_VERSION
 
 __all__ = (
     'User', 'APISite', 'ClosedSite', 'DataSite', 'LoginStatus',
-    'ParseError', 'CacheEntry', 'process_entries', 'main',
+    'ParseError', 'CacheEntry', 'IndexedCacheEntry', 'process_entries',
+    'process_database', 'main',
     'has_password', 'is_logout', 'empty_response', 'not_accessed',
     'incorrect_hash',
     'older_than', 'newer_than', 'older_than_one_day', 'recent',
@@ -221,6 +243,106 @@ class CacheEntry(api.CachedRequest):
         os.remove(self._cachefile_path())
 
 
+class IndexedCacheEntry(CacheEntry):
+
+    """A Request cache entry stored in a SQLite cache database."""
+
+    def __init__(self, backend, key, description, cachetime):
+        """Initializer."""
+        super(IndexedCacheEntry, self).__init__(
+            os.path.dirname(backend.filename), key)
+        self.backend = backend
+        self.key = description
+        self._cachetime = cachetime
+
+    def __repr__(self):
+        """Representation of object."""
+        return '{0}:{1}'.format(self.backend.filename, self.filename)
+
+    @property
+    def _data(self):
+        """Load the response data only when it is used."""
+        if not hasattr(self, '_loaded_data'):
+            entry = self.backend.load(self.filename)
+            self._loaded_data = entry[1] if entry else None
+        return self._loaded_data
+
+    def _load_cache(self):
+        """The index data has been loaded by the initializer."""
+        return True
+
+    def _delete(self):
+        """Delete the cache entry."""
+        self.backend.delete(self.filename)
+
+
+def process_database(db_path, func, output_func=None, action_func=None,
+                     site=None, older_than=None, expired=False):
+    """
+    Check the contents of a SQLite cache database.
+
+    The entries are selected by querying the index of the database.
+    The data of an entry is only loaded if the filter or output command
+    uses it.
+
+    @param site: only process entries of this site
+    @type site: BaseSite
+    @param older_than: only process entries older than this interval
+    @type older_than: datetime.timedelta
+    @param expired: only process expired entries
+    @type expired: bool
+    """
+    if not os.path.exists(db_path):
+        pywikibot.error('%s: no such file or directory' % db_path)
+        return
+
+    backend = apicache.SQLiteCacheBackend(db_path)
+    try:
+        # Deletion is chosen only, abbreviate this request
+        if func is None and output_func is None \
+           and action_func == CacheEntry._delete:
+            count = backend.purge(site, older_than, expired)
+            pywikibot.output('{0} entries deleted'.format(count))
+            return
+
+        # CacheEntry._delete would skip the IndexedCacheEntry override
+        if action_func == CacheEntry._delete:
+            action_func = operator.methodcaller('_delete')
+
+        for key, _, description, cachetime in backend.entries(
+                site, older_than, expired):
+            entry = IndexedCacheEntry(backend, key, description, cachetime)
+            try:
+                entry.parse_key()
+            except ParseError:
+                pywikibot.error('Problems parsing %s with key %s'
+                                % (entry.filename, entry.key))
+                pywikibot.exception()
+                continue
+
+            try:
+                entry._rebuild()
+            except Exception as e:
+                pywikibot.error('Problems loading %s with key %s, %r'
+                                % (entry.filename, entry.key,
+                                   entry._parsed_key))
+                pywikibot.exception(e, tb=True)
+                continue
+
+            if func is None or func(entry):
+                if output_func or action_func is None:
+                    if output_func is None:
+                        output = entry
+                    else:
+                        output = output_func(entry)
+                    if output is not None:
+                        pywikibot.output(output)
+                if action_func:
+                    action_func(entry)
+    finally:
+        backend.close()
+
+
 def process_entries(cache_path, func, use_accesstime=None, output_func=None,
                     action_func=None):
     """
@@ -416,6 +538,9 @@ def main():
     delete = False
     command = None
     output = None
+    site = None
+    older_than = None
+    expired = False
 
     for arg in local_args:
         if command == '':
@@ -424,6 +549,13 @@ def main():
             output = arg
         elif arg == '-delete':
             delete = True
+        elif arg.startswith('-site:'):
+            family, _, code = arg[len('-site:'):].partition(':')
+            site = pywikibot.Site(code, family)
+        elif arg.startswith('-older:'):
+            older_than = datetime.timedelta(days=float(arg[len('-older:'):]))
+        elif arg == '-expired':
+            expired = True
         elif arg == '-password':
             command = 'has_password(entry)'
         elif arg == '-c':
@@ -444,6 +576,7 @@ def main():
 
     if not cache_paths:
         folders = ('apicache', 'apicache-py2', 'apicache-py3')
+        folders += tuple(folder + '.sqlite3' for folder in folders[1:])
         cache_paths = list(folders)
         # Add tests folders
         cache_paths += [os.path.join('tests', f) for f in folders]
@@ -481,8 +614,16 @@ def main():
     for cache_path in cache_paths:
         if len(cache_paths) > 1:
             pywikibot.output('Processing %s' % cache_path)
-        process_entries(cache_path, filter_func, output_func=output_func,
-                        action_func=action_func)
+        if cache_path.endswith('.sqlite3'):
+            process_database(cache_path, filter_func, output_func=output_func,
+                             action_func=action_func, site=site,
+                             older_than=older_than, expired=expired)
+        elif site or older_than or expired:
+            pywikibot.error('{0}: -site, -older and -expired are only '
+                            'supported for .sqlite3 caches'.format(cache_path))
+        else:
+            process_entries(cache_path, filter_func, output_func=output_func,
+                            action_func=action_func)
 
 
 if __name__ == '__main__':
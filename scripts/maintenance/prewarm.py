@@ -0,0 +1,108 @@
+#!/usr/bin/python
+# -*- coding: utf-8 -*-
+r"""
+Fill the persistent site metadata store.
+
+The store keeps the siteinfo and the paraminfo of all API modules of a
+site, so later bot runs don't need to request them on startup. It is
+used by bots if config.API_metadata_store is enabled.
+
+Syntax:
+
+    python pwb.py prewarm [-all] [-refresh] [-list] [-family:x] [-lang:x]
+
+The following parameters are supported:
+
+-all              Prewarm all sites of the family instead of the current
+                  site only.
+
+-refresh          Delete the stored metadata of the sites first and request
+                  it again.
+
+-list             List the sites with stored metadata and exit.
+
+Examples:
+
+    python pwb.py prewarm -family:wikipedia -all
+
+    python pwb.py prewarm -family:wiktionary -lang:de -refresh
+"""
+#
+# (C) Pywikibot team, 2019
+#
+# Distributed under the terms of the MIT license.
+#
+from __future__ import absolute_import, division, unicode_literals
+
+import pywikibot
+
+from pywikibot import config
+from pywikibot.data import api, sitemeta
+from pywikibot.exceptions import Error
+
+
+def prewarm(site, store, refresh=False):
+    """Request the metadata of a site and store it."""
+    if refresh:
+        store.delete(str(site))
+    # an expiry of 0 requests the siteinfo again
+    site.siteinfo.get('general', expiry=0 if refresh else False)
+    paraminfo = api.ParamInfo(site)
+    modules = paraminfo.module_paths
+    paraminfo.fetch(modules)
+    pywikibot.output('{0}: {1} modules, MediaWiki {2}'.format(
+        site, len(modules), site.mw_version))
+
+
+def main(*args):
+    """
+    Process command line arguments and prewarm the store.
+
+    If args is an empty list, sys.argv is used.
+
+    @param args: command line arguments
+    @type args: unicode
+    """
+    all_sites = False
+    refresh = False
+    list_only = False
+    for arg in pywikibot.handle_args(args):
+        if arg == '-all':
+            all_sites = True
+        elif arg == '-refresh':
+            refresh = True
+        elif arg == '-list':
+            list_only = True
+        else:
+            pywikibot.bot.suggest_help(unknown_parameters=[arg])
+            return False
+
+    store = sitemeta.get_store(force=True)
+    if list_only:
+        for site in store.sites():
+            pywikibot.output(site)
+        return True
+
+    # the site objects use the store only if it is enabled
+    config.API_metadata_store = True
+    site = pywikibot.Site()
+    if all_sites:
+        sites = [pywikibot.Site(code, site.family)
+                 for code in sorted(site.family.langs)]
+    else:
+        sites = [site]
+
+    failed = 0
+    for site in sites:
+        try:
+            prewarm(site, store, refresh)
+        except Error as e:
+            failed += 1
+            pywikibot.error('{0}: {1}'.format(site, e))
+    pywikibot.output('Prewarmed {0} of {1} sites.'.format(
+        len(sites) - failed, len(sites)))
+    return not failed
+
+
+if __name__ == '__main__':
+    main()
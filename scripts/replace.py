@@ -35,6 +35,12 @@ Furthermore, the following command line parameters are supported:
                   before the one specified (may also be given as
                   -xmlstart:Article).
 
+-xmlprocesses:n   (Only works with -xml) Parse the XML dump with n worker
+                  processes. Multistream bz2 dumps with their index file and
+                  uncompressed dumps are split between the processes, which
+                  already skip pages without a match or with an excepted
+                  title or text.
+
 -addcat:cat_name  Adds "cat_name" category to every altered page.
 
 -excepttitle:XYZ  Skip pages with titles that contain XYZ. If the -regex
@@ -416,9 +422,17 @@ class XmlDumpReplacePageGenerator(object):
     @param exceptions: A dictionary which defines when to ignore an
         occurrence. See docu of the ReplaceRobot initializer below.
     @type exceptions: dict
+    @param processes: number of processes parsing the dump with
+        xmlreader.ParallelXmlDump. If not given, the dump is parsed in the
+        current process.
+    @type processes: int or None
     """
 
-    def __init__(self, xmlFilename, xmlStart, replacements, exceptions, site):
+    # XmlEntry fields used by the generator
+    _fields = ('title', 'text')
+
+    def __init__(self, xmlFilename, xmlStart, replacements, exceptions, site,
+                 processes=None):
         """Initializer."""
         self.xmlFilename = xmlFilename
         self.replacements = replacements
@@ -436,9 +450,33 @@ class XmlDumpReplacePageGenerator(object):
             self.site = site
         else:
             self.site = pywikibot.Site()
-        dump = xmlreader.XmlDump(self.xmlFilename)
+        if processes:
+            dump = xmlreader.ParallelXmlDump(
+                self.xmlFilename, processes=processes,
+                entry_filter=self._entry_filter(), fields=self._fields)
+        else:
+            dump = xmlreader.XmlDump(self.xmlFilename, fields=self._fields)
         self.parser = dump.parse()
 
+    def _entry_filter(self):
+        """
+        Return a filter skipping entries which can't be changed.
+
+        The filter is applied by the worker processes. It is not used
+        with xmlStart because the start entry itself might be skipped.
+
+        @rtype: xmlreader.XmlEntryFilter or None
+        """
+        from pywikibot import xmlreader
+        if self.skipping:
+            return None
+        return xmlreader.XmlEntryFilter(
+            title_all=self.exceptions.get('require-title', []),
+            title_none=self.exceptions.get('title', []),
+            text_any=[replacement.old_regex
+                      for replacement in self.replacements],
+            text_none=self.exceptions.get('text-contains', []))
+
     def __iter__(self):
         """Iterator method."""
         try:
@@ -898,6 +936,7 @@ def main(*args):
     # the dump's path, either absolute or relative, which will be used
     # if -xml flag is present
     xmlFilename = None
+    xml_processes = None
     useSql = False
     sql_query = None
     # will become True when the user presses a ('yes to all') or uses the
@@ -938,6 +977,8 @@ def main(*args):
                     'Please enter the dumped article to start with:')
             else:
                 xmlStart = arg[10:]
+        elif arg.startswith('-xmlprocesses:'):
+            xml_processes = int(arg[len('-xmlprocesses:'):])
         elif arg.startswith('-xml'):
             if len(arg) == 4:
                 xmlFilename = i18n.input('pywikibot-enter-xml-filename')
@@ -1168,7 +1209,8 @@ def main(*args):
         except NameError:
             xmlStart = None
         gen = XmlDumpReplacePageGenerator(xmlFilename, xmlStart,
-                                          replacements, exceptions, site)
+                                          replacements, exceptions, site,
+                                          processes=xml_processes)
     elif useSql:
         if not sql_query:
             whereClause = 'WHERE (%s)' % ' OR '.join(
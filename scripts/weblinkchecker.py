@@ -61,6 +61,11 @@ Furthermore, the following command line parameters are supported:
 -day         Do not report broken link if the link is there only since
              x days or less. If not set, the default is 7 days.
 
+-sqlite      Keep the dead links in a .sqlite3 file instead of the .dat file.
+             Every observation is written when it is made. The links of an
+             existing .dat file are imported when the .sqlite3 file is
+             created. Use it with -repeat to work on the pages found there.
+
 The following config variables are supported:
 
  max_external_links         The maximum number of web pages that should be
@@ -117,6 +122,7 @@ import datetime
 import pickle
 import re
 import socket
+import sqlite3
 import threading
 import time
 
@@ -139,17 +145,21 @@ from pywikibot.bot import ExistingPageBot, SingleSiteBot, suggest_help
 from pywikibot.pagegenerators import (
     XMLDumpPageGenerator as _XMLDumpPageGenerator,
 )
-from pywikibot.tools import deprecated, PY2, UnicodeType
+from pywikibot.tools import (
+    deprecated, deprecated_args, issue_deprecation_warning, PY2, UnicodeType,
+)
 from pywikibot.tools.formatter import color_format
 
 import requests
 
 if not PY2:
     import http.client as httplib
+    import queue
     import urllib.parse as urlparse
     import urllib.request as urllib
 else:
     import httplib
+    import Queue as queue  # noqa: N813
     import urllib
     import urlparse
 
@@ -572,10 +582,14 @@ class LinkCheckThread(threading.Thread):
     """A thread responsible for checking one URL.
 
     After checking the page, it will die.
+
+    DEPRECATED: Use LinkCheckEngine instead.
     """
 
     def __init__(self, page, url, history, HTTPignore, day):
         """Initializer."""
+        issue_deprecation_warning('LinkCheckThread', 'LinkCheckEngine',
+                                  since='20261018')
         threading.Thread.__init__(self)
         self.page = page
         self.url = url
@@ -628,6 +642,216 @@ class LinkCheckThread(threading.Thread):
                                      config.weblink_dead_days)
 
 
+def normalize_url(url):
+    """
+    Return the URL as used to identify checked links.
+
+    The scheme and the host are lowercased, default ports and the
+    fragment are removed and an empty path is replaced by '/'.
+
+    @rtype: str
+    """
+    scheme, netloc, path, query, _ = urlparse.urlsplit(url)
+    scheme = scheme.lower()
+    netloc = netloc.lower()
+    default_port = {'http': ':80', 'https': ':443'}.get(scheme)
+    if default_port and netloc.endswith(default_port):
+        netloc = netloc[:-len(default_port)]
+    return urlparse.urlunsplit((scheme, netloc, path or '/', query, ''))
+
+
+class LinkCheckEngine(object):
+
+    """
+    Check the links found on pages with a fixed number of worker threads.
+
+    Each URL is checked once per run; pages containing a URL which is
+    being checked or was checked before get the same result. URLs are
+    compared by L{normalize_url}.
+
+    At most max_per_host requests to the same host are in progress and
+    requests to a host are started at least host_delay seconds apart. A
+    link is checked with a HEAD request first and with a GET request
+    only if HEAD fails. Connections are kept open by the session of
+    L{pywikibot.comms.http} and reused for further links of a host.
+
+    Results are recorded in the history, which passes dead links on to
+    the DeadLinkReportThread as soon as they are found.
+    """
+
+    header = {
+        'Accept': 'text/xml,application/xml,application/xhtml+xml,'
+                  'text/html;q=0.9,text/plain;q=0.8,image/png,*/*;q=0.5',
+        'Accept-Language': 'de-de,de;q=0.8,en-us;q=0.5,en;q=0.3',
+        'Accept-Charset': 'ISO-8859-1,utf-8;q=0.7,*;q=0.7',
+        'Keep-Alive': '30',
+        'Connection': 'keep-alive',
+    }
+
+    def __init__(self, history, HTTPignore=None, workers=None,
+                 max_per_host=None, host_delay=None):
+        """
+        Initializer.
+
+        @param history: the history recording the results
+        @type history: History
+        @param HTTPignore: HTTP status codes to ignore
+        @type HTTPignore: list
+        @param workers: number of links checked at the same time.
+            Defaults to config.max_external_links.
+        @type workers: int
+        @param max_per_host: number of links to the same host checked at
+            the same time. Defaults to config.weblink_host_connections.
+        @type max_per_host: int
+        @param host_delay: minimum time in seconds between the starts of
+            two requests to a host. Defaults to config.weblink_host_delay.
+        @type host_delay: float
+        """
+        self.history = history
+        self.HTTPignore = HTTPignore or []
+        if workers is None:
+            workers = config.max_external_links
+        if max_per_host is None:
+            max_per_host = config.weblink_host_connections
+        if host_delay is None:
+            host_delay = config.weblink_host_delay
+        workers = max(workers, 1)
+        self.max_per_host = max(max_per_host, 1)
+        self.host_delay = host_delay
+        self._use_fake_user_agent = config.fake_user_agent_default.get(
+            'weblinkchecker', False)
+        self.checked = 0
+        self.cached = 0
+        self._lock = threading.Lock()
+        self._results = {}
+        self._pending = {}
+        self._hosts = {}
+        self._tasks = queue.Queue(workers)
+        self._stopping = threading.Event()
+        self._threads = []
+        for number in range(workers):
+            thread = threading.Thread(target=self._work,
+                                      name='LinkCheck-{0}'.format(number))
+            thread.daemon = True
+            thread.start()
+            self._threads.append(thread)
+
+    def submit(self, page, url):
+        """
+        Check a link found on a page.
+
+        Blocks while all workers are busy and the queue is full.
+        """
+        key = normalize_url(url)
+        with self._lock:
+            result = self._results.get(key)
+            if result is None:
+                if key in self._pending:
+                    self._pending[key].append(page)
+                    self.cached += 1
+                    return
+                self._pending[key] = [page]
+            else:
+                self.cached += 1
+        if result is None:
+            self._tasks.put((key, url))
+        else:
+            self.record(page, url, *result)
+
+    def unfinished(self):
+        """Return the number of links which are not checked yet."""
+        with self._lock:
+            return len(self._pending)
+
+    def stop(self):
+        """Stop the workers after the queued links are checked."""
+        self._stopping.set()
+
+    def _work(self):
+        """Check queued links until stopped."""
+        while True:
+            try:
+                key, url = self._tasks.get(timeout=0.1)
+            except queue.Empty:
+                if self._stopping.is_set():
+                    return
+                continue
+            try:
+                ok, message = self.check(url)
+            except Exception as e:
+                pywikibot.exception()
+                ok, message = False, e.__class__.__name__
+            with self._lock:
+                self._results[key] = (ok, message)
+                self.checked += 1
+                pages = self._pending.pop(key)
+            for page in pages:
+                try:
+                    self.record(page, url, ok, message)
+                except Exception:
+                    pywikibot.exception()
+
+    def _host_slot(self, url):
+        """Wait for a free request slot of the URL's host and return it."""
+        host = urlparse.urlsplit(url).netloc.lower()
+        with self._lock:
+            slot = self._hosts.get(host)
+            if slot is None:
+                slot = [threading.BoundedSemaphore(self.max_per_host), 0.0]
+                self._hosts[host] = slot
+        slot[0].acquire()
+        with self._lock:
+            start = max(time.time(), slot[1])
+            slot[1] = start + self.host_delay
+        delay = start - time.time()
+        if delay > 0:
+            time.sleep(delay)
+        return slot[0]
+
+    def _fetch(self, url, method):
+        """Request the URL within the limits of its host."""
+        semaphore = self._host_slot(url)
+        try:
+            return comms.http.fetch(
+                url, method=method, headers=dict(self.header),
+                use_fake_user_agent=self._use_fake_user_agent,
+                default_error_handling=False)
+        finally:
+            semaphore.release()
+
+    def check(self, url):
+        """
+        Return whether the link is alive and its status or error.
+
+        @rtype: tuple of (bool, str)
+        """
+        for method in ('HEAD', 'GET'):
+            r = self._fetch(url, method)
+            if r.exception is None and r.status == requests.codes.ok:
+                return True, '{0}'.format(r.status)
+        if isinstance(r.exception, requests.exceptions.InvalidURL):
+            return False, i18n.twtranslate(self.history.site,
+                                           'weblinkchecker-badurl_msg',
+                                           {'URL': url})
+        if r.exception is not None:
+            return False, r.exception.__class__.__name__
+        if r.status in self.HTTPignore:
+            return True, '{0}'.format(r.status)
+        return False, '{0}'.format(r.status)
+
+    def record(self, page, url, ok, message):
+        """Record the result for a link found on a page in the history."""
+        if ok:
+            if self.history.setLinkAlive(url):
+                pywikibot.output('*Link to {0} in [[{1}]] is back alive.'
+                                 .format(url, page.title()))
+        else:
+            pywikibot.output('*[[{0}]] links to {1} - {2}.'
+                             .format(page.title(), url, message))
+            self.history.setLinkDead(url, message, page,
+                                     config.weblink_dead_days)
+
+
 class History(object):
 
     """
@@ -679,7 +903,7 @@ class History(object):
             errorReport = '* {0} ([{1} archive])\n'.format(url, archiveURL)
         else:
             errorReport = '* {0}\n'.format(url)
-        for (pageTitle, date, error) in self.historyDict[url]:
+        for (pageTitle, date, error) in self.observations(url):
             # ISO 8601 formulation
             isoDate = time.strftime('%Y-%m-%d %H:%M:%S', time.gmtime(date))
             errorReport += '** In [[{0}]] on {1}, {2}\n'.format(
@@ -717,22 +941,25 @@ class History(object):
                 # (default is a week), it should probably be fixed or removed.
                 # We'll list it in a file so that it can be removed manually.
                 if timeSinceFirstFound > 60 * 60 * 24 * weblink_dead_days:
-                    # search for archived page
-                    try:
-                        archiveURL = get_archive_url(url)
-                    except Exception as e:
-                        pywikibot.warning(
-                            'get_closest_memento_url({0}) failed: {1}'.format(
-                                url, e))
-                        archiveURL = None
-                    if archiveURL is None:
-                        archiveURL = weblib.getInternetArchiveURL(url)
-                    if archiveURL is None:
-                        archiveURL = weblib.getWebCitationURL(url)
-                    self.log(url, error, page, archiveURL)
+                    self.log(url, error, page, self._archive_url(url))
             else:
                 self.historyDict[url] = [(page.title(), now, error)]
 
+    @staticmethod
+    def _archive_url(url):
+        """Search for an archived version of the URL."""
+        try:
+            archiveURL = get_archive_url(url)
+        except Exception as e:
+            pywikibot.warning(
+                'get_closest_memento_url({0}) failed: {1}'.format(url, e))
+            archiveURL = None
+        if archiveURL is None:
+            archiveURL = weblib.getInternetArchiveURL(url)
+        if archiveURL is None:
+            archiveURL = weblib.getWebCitationURL(url)
+        return archiveURL
+
     def setLinkAlive(self, url):
         """
         Record that the link is now alive.
@@ -753,33 +980,237 @@ class History(object):
         else:
             return False
 
+    def observations(self, url):
+        """
+        Return when and where the link was found dead.
+
+        @return: tuples (title, date, error), the oldest first
+        @rtype: list
+        """
+        return self.historyDict.get(url, [])
+
+    def dead_links(self, days=0):
+        """
+        Yield the links first found dead more than the given days ago.
+
+        @return: tuples (url, date), the oldest first
+        """
+        limit = time.time() - days * 60 * 60 * 24
+        for first, url in sorted((entries[0][1], url)
+                                 for url, entries in self.historyDict.items()
+                                 if entries[0][1] < limit):
+            yield url, first
+
+    def links_in(self, title):
+        """Return the dead links found on the page with the given title."""
+        return sorted(url for url, entries in self.historyDict.items()
+                      if any(entry[0] == title for entry in entries))
+
+    def page_titles(self):
+        """Return the titles of the pages containing dead links, sorted."""
+        return sorted({entry[0] for entries in self.historyDict.values()
+                       for entry in entries})
+
     def save(self):
         """Save the .dat file to disk."""
         with open(self.datfilename, 'wb') as f:
             pickle.dump(self.historyDict, f, protocol=config.pickle_protocol)
 
 
+class HistoryStore(History):
+
+    """
+    Store previously found dead links in a SQLite file.
+
+    Unlike L{History}, which loads and saves all links as one pickle, each
+    observation is committed when it is made, so an interrupted run keeps
+    what it found. The links are indexed by URL, page title and the time
+    they were first found dead, and the queries only read the rows they
+    need.
+
+    When the database is created, the links of an existing
+    deadlinks-<family>-<code>.dat file are imported.
+    """
+
+    _schema = (
+        'CREATE TABLE IF NOT EXISTS links ('
+        ' url TEXT PRIMARY KEY,'
+        ' first REAL NOT NULL,'
+        ' last REAL NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS links_first ON links (first)',
+        'CREATE TABLE IF NOT EXISTS observations ('
+        ' url TEXT NOT NULL,'
+        ' title TEXT NOT NULL,'
+        ' date REAL NOT NULL,'
+        ' error TEXT NOT NULL)',
+        'CREATE INDEX IF NOT EXISTS observations_url ON observations (url)',
+        'CREATE INDEX IF NOT EXISTS observations_title '
+        'ON observations (title)',
+    )
+
+    def __init__(self, reportThread, site=None, filename=None):
+        """
+        Initializer.
+
+        @param reportThread: thread reporting dead links on talk pages
+        @type reportThread: DeadLinkReportThread or None
+        @param site: the site of the links
+        @type site: pywikibot.site.BaseSite
+        @param filename: path of the database file. Defaults to
+            deadlinks-<family>-<code>.sqlite3 in the deadlinks directory.
+        @type filename: str
+        """
+        self.reportThread = reportThread
+        self.site = site or pywikibot.Site()
+        # the connection is shared by the link checking threads
+        self.semaphore = threading.RLock()
+        name = 'deadlinks-{0}-{1}'.format(self.site.family.name,
+                                          self.site.code)
+        self.datfilename = pywikibot.config.datafilepath(
+            'deadlinks', name + '.dat')
+        self.filename = filename or pywikibot.config.datafilepath(
+            'deadlinks', name + '.sqlite3')
+        self.logCount = 0
+        self._connection = sqlite3.connect(self.filename, timeout=60,
+                                           check_same_thread=False)
+        with self._connection:
+            for statement in self._schema:
+                self._connection.execute(statement)
+            version = self._connection.execute(
+                'PRAGMA user_version').fetchone()[0]
+            if version == 0:
+                self._migrate()
+                self._connection.execute('PRAGMA user_version = 1')
+
+    def _migrate(self):
+        """Import the links of the pickled history."""
+        try:
+            with open(self.datfilename, 'rb') as datfile:
+                historyDict = pickle.load(datfile)
+        except (IOError, EOFError):
+            return
+        pywikibot.output('Importing {0} links from {1}'
+                         .format(len(historyDict), self.datfilename))
+        for url, entries in historyDict.items():
+            self._connection.execute(
+                'INSERT OR REPLACE INTO links (url, first, last) '
+                'VALUES (?, ?, ?)', (url, entries[0][1], entries[-1][1]))
+            self._connection.executemany(
+                'INSERT INTO observations (url, title, date, error) '
+                'VALUES (?, ?, ?, ?)',
+                ((url, title, date, error) for title, date, error in entries))
+
+    def _add(self, url, title, date, error):
+        """Add an observation of a dead link."""
+        self._connection.execute(
+            'INSERT INTO observations (url, title, date, error) '
+            'VALUES (?, ?, ?, ?)', (url, title, date, error))
+
+    def setLinkDead(self, url, error, page, weblink_dead_days):
+        """Add the fact that the link was found dead to the database."""
+        with self.semaphore:
+            now = time.time()
+            row = self._connection.execute(
+                'SELECT first, last FROM links WHERE url = ?',
+                (url, )).fetchone()
+            if row is None:
+                with self._connection:
+                    self._connection.execute(
+                        'INSERT INTO links (url, first, last) '
+                        'VALUES (?, ?, ?)', (url, now, now))
+                    self._add(url, page.title(), now, error)
+                return
+            first, last = row
+            # if the last time we found this dead link is less than an hour
+            # ago, we won't save it in the history this time.
+            if now - last > 60 * 60:
+                with self._connection:
+                    self._connection.execute(
+                        'UPDATE links SET last = ? WHERE url = ?', (now, url))
+                    self._add(url, page.title(), now, error)
+            if now - first > 60 * 60 * 24 * weblink_dead_days:
+                self.log(url, error, page, self._archive_url(url))
+
+    def setLinkAlive(self, url):
+        """
+        Record that the link is now alive.
+
+        If link was previously found dead, remove it from the database.
+
+        @return: True if previously found dead, else returns False.
+        """
+        with self.semaphore, self._connection:
+            deleted = self._connection.execute(
+                'DELETE FROM links WHERE url = ?', (url, )).rowcount
+            self._connection.execute(
+                'DELETE FROM observations WHERE url = ?', (url, ))
+        return deleted > 0
+
+    def observations(self, url):
+        """
+        Return when and where the link was found dead.
+
+        @return: tuples (title, date, error), the oldest first
+        @rtype: list
+        """
+        with self.semaphore:
+            return self._connection.execute(
+                'SELECT title, date, error FROM observations '
+                'WHERE url = ? ORDER BY date', (url, )).fetchall()
+
+    def dead_links(self, days=0):
+        """
+        Yield the links first found dead more than the given days ago.
+
+        @return: tuples (url, date), the oldest first
+        """
+        limit = time.time() - days * 60 * 60 * 24
+        with self.semaphore:
+            rows = self._connection.execute(
+                'SELECT url, first FROM links WHERE first < ? '
+                'ORDER BY first', (limit, )).fetchall()
+        for row in rows:
+            yield tuple(row)
+
+    def links_in(self, title):
+        """Return the dead links found on the page with the given title."""
+        with self.semaphore:
+            return [url for url, in self._connection.execute(
+                'SELECT DISTINCT url FROM observations WHERE title = ? '
+                'ORDER BY url', (title, ))]
+
+    def page_titles(self):
+        """Return the titles of the pages containing dead links, sorted."""
+        with self.semaphore:
+            return [title for title, in self._connection.execute(
+                'SELECT DISTINCT title FROM observations ORDER BY title')]
+
+    def save(self):
+        """Close the database, the links are already written."""
+        with self.semaphore:
+            self._connection.close()
+
+
 class DeadLinkReportThread(threading.Thread):
 
     """
     A Thread that is responsible for posting error reports on talk pages.
 
-    There is only one DeadLinkReportThread, and it is using a semaphore to make
-    sure that two LinkCheckerThreads can not access the queue at the same time.
+    There is only one DeadLinkReportThread. Dead links are passed to it
+    through a queue and reported in the order they were found.
     """
 
     def __init__(self):
         """Initializer."""
         threading.Thread.__init__(self)
         self.semaphore = threading.Semaphore()
-        self.queue = []
+        self.queue = queue.Queue()
         self.finishing = False
         self.killed = False
 
     def report(self, url, errorReport, containingPage, archiveURL):
         """Report error on talk page of the page containing the dead link."""
-        with self.semaphore:
-            self.queue.append((url, errorReport, containingPage, archiveURL))
+        self.queue.put((url, errorReport, containingPage, archiveURL))
 
     def shutdown(self):
         """Finish thread."""
@@ -793,70 +1224,71 @@ class DeadLinkReportThread(threading.Thread):
     def run(self):
         """Run thread."""
         while not self.killed:
-            if len(self.queue) == 0:
+            try:
+                report = self.queue.get(timeout=0.1)
+            except queue.Empty:
                 if self.finishing:
                     break
-                else:
-                    time.sleep(0.1)
-            else:
-                with self.semaphore:
-                    url, errorReport, containingPage, archiveURL = \
-                        self.queue[0]
-                    self.queue = self.queue[1:]
-                    talkPage = containingPage.toggleTalkPage()
-                    pywikibot.output(color_format(
-                        '{lightaqua}** Reporting dead link on '
-                        '{0}...{default}',
-                        talkPage.title(as_link=True)))
-                    try:
-                        content = talkPage.get() + '\n\n\n'
-                        if url in content:
-                            pywikibot.output(color_format(
-                                '{lightaqua}** Dead link seems to have '
-                                'already been reported on {0}{default}',
-                                talkPage.title(as_link=True)))
-                            continue
-                    except (pywikibot.NoPage, pywikibot.IsRedirectPage):
-                        content = ''
-
-                    if archiveURL:
-                        archiveMsg = '\n' + \
-                                     i18n.twtranslate(
-                                         containingPage.site,
-                                         'weblinkchecker-archive_msg',
-                                         {'URL': archiveURL})
-                    else:
-                        archiveMsg = ''
-                    # The caption will default to "Dead link". But if there
-                    # is already such a caption, we'll use "Dead link 2",
-                    # "Dead link 3", etc.
-                    caption = i18n.twtranslate(containingPage.site,
-                                               'weblinkchecker-caption')
-                    i = 1
-                    count = ''
-                    # Check if there is already such a caption on
-                    # the talk page.
-                    while re.search('= *{0}{1} *='.format(caption, count),
-                                    content) is not None:
-                        i += 1
-                        count = ' ' + str(i)
-                    caption += count
-                    content += '== {0} ==\n\n{1}\n\n{2}{3}\n--~~~~'.format(
-                        caption, i18n.twtranslate(containingPage.site,
-                                                  'weblinkchecker-report'),
-                        errorReport, archiveMsg)
-
-                    comment = '[[{0}#{1}|→]] {2}'.format(
-                        talkPage.title(), caption,
-                        i18n.twtranslate(containingPage.site,
-                                         'weblinkchecker-summary'))
-                    try:
-                        talkPage.put(content, comment)
-                    except pywikibot.SpamfilterError as error:
-                        pywikibot.output(color_format(
-                            '{lightaqua}** SpamfilterError while trying to '
-                            'change {0}: {1}{default}',
-                            talkPage.title(as_link=True), error.url))
+                continue
+            with self.semaphore:
+                self._report(*report)
+
+    def _report(self, url, errorReport, containingPage, archiveURL):
+        """Post an error report on the talk page of the containing page."""
+        talkPage = containingPage.toggleTalkPage()
+        pywikibot.output(color_format(
+            '{lightaqua}** Reporting dead link on '
+            '{0}...{default}',
+            talkPage.title(as_link=True)))
+        try:
+            content = talkPage.get() + '\n\n\n'
+            if url in content:
+                pywikibot.output(color_format(
+                    '{lightaqua}** Dead link seems to have '
+                    'already been reported on {0}{default}',
+                    talkPage.title(as_link=True)))
+                return
+        except (pywikibot.NoPage, pywikibot.IsRedirectPage):
+            content = ''
+
+        if archiveURL:
+            archiveMsg = '\n' + \
+                         i18n.twtranslate(
+                             containingPage.site,
+                             'weblinkchecker-archive_msg',
+                             {'URL': archiveURL})
+        else:
+            archiveMsg = ''
+        # The caption will default to "Dead link". But if there
+        # is already such a caption, we'll use "Dead link 2",
+        # "Dead link 3", etc.
+        caption = i18n.twtranslate(containingPage.site,
+                                   'weblinkchecker-caption')
+        i = 1
+        count = ''
+        # Check if there is already such a caption on
+        # the talk page.
+        while re.search('= *{0}{1} *='.format(caption, count),
+                        content) is not None:
+            i += 1
+            count = ' ' + str(i)
+        caption += count
+        content += '== {0} ==\n\n{1}\n\n{2}{3}\n--~~~~'.format(
+            caption, i18n.twtranslate(containingPage.site,
+                                      'weblinkchecker-report'),
+            errorReport, archiveMsg)
+
+        comment = '[[{0}#{1}|→]] {2}'.format(
+            talkPage.title(), caption,
+            i18n.twtranslate(containingPage.site,
+                             'weblinkchecker-summary'))
+        try:
+            talkPage.put(content, comment)
+        except pywikibot.SpamfilterError as error:
+            pywikibot.output(color_format(
+                '{lightaqua}** SpamfilterError while trying to '
+                'change {0}: {1}{default}',
+                talkPage.title(as_link=True), error.url))
 
 
 class WeblinkCheckerRobot(SingleSiteBot, ExistingPageBot):
@@ -864,10 +1296,11 @@ class WeblinkCheckerRobot(SingleSiteBot, ExistingPageBot):
     """
     Bot which will search for dead weblinks.
 
-    It uses several LinkCheckThreads at once to process pages from generator.
+    The links of the pages from generator are checked by a LinkCheckEngine.
     """
 
-    def __init__(self, generator, HTTPignore=None, day=7, site=True):
+    @deprecated_args(day=None)
+    def __init__(self, generator, HTTPignore=None, site=True, sqlite=False):
         """Initializer."""
         super(WeblinkCheckerRobot, self).__init__(
             generator=generator, site=site)
@@ -880,12 +1313,13 @@ class WeblinkCheckerRobot(SingleSiteBot, ExistingPageBot):
             reportThread.start()
         else:
             reportThread = None
-        self.history = History(reportThread, site=self.site)
+        history_class = HistoryStore if sqlite else History
+        self.history = history_class(reportThread, site=self.site)
         if HTTPignore is None:
             self.HTTPignore = []
         else:
             self.HTTPignore = HTTPignore
-        self.day = day
+        self.engine = LinkCheckEngine(self.history, self.HTTPignore)
 
     def treat_page(self):
         """Process one page."""
@@ -897,40 +1331,21 @@ class WeblinkCheckerRobot(SingleSiteBot, ExistingPageBot):
                 if ignoreR.match(url):
                     ignoreUrl = True
             if not ignoreUrl:
-                # Limit the number of threads started at the same time. Each
-                # thread will check one page, then die.
-                while threading.activeCount() >= config.max_external_links:
-                    pywikibot.sleep(config.retry_wait)
-                thread = LinkCheckThread(page, url, self.history,
-                                         self.HTTPignore, self.day)
-                # thread dies when program terminates
-                thread.setDaemon(True)
-                try:
-                    thread.start()
-                except threading.ThreadError:
-                    pywikibot.warning(
-                        "Can't start a new thread.\nPlease decrease "
-                        'max_external_links in your user-config.py or use\n'
-                        "'-max_external_links:' option with a smaller value. "
-                        'Default is 50.')
-                    raise
+                self.engine.submit(page, url)
 
 
-def RepeatPageGenerator():
+def RepeatPageGenerator(sqlite=False):
     """Generator for pages in History."""
-    history = History(None)
-    pageTitles = set()
-    for value in history.historyDict.values():
-        for entry in value:
-            pageTitles.add(entry[0])
-    for pageTitle in sorted(pageTitles):
+    history = (HistoryStore if sqlite else History)(None)
+    for pageTitle in history.page_titles():
         page = pywikibot.Page(pywikibot.Site(), pageTitle)
         yield page
 
 
+@deprecated('LinkCheckEngine.unfinished', since='20261018')
 def countLinkCheckThreads():
     """
-    Count LinkCheckThread threads.
+    DEPRECATED: Count LinkCheckThread threads.
 
     @return: number of LinkCheckThread threads
     @rtype: int
@@ -961,6 +1376,8 @@ def main(*args):
     gen = None
     xmlFilename = None
     HTTPignore = []
+    repeat = False
+    sqlite = False
 
     if isinstance(memento_client, ImportError):
         warn('memento_client not imported: {0}'.format(memento_client),
@@ -976,7 +1393,9 @@ def main(*args):
         elif arg == '-notalk':
             config.report_dead_links_on_talk = False
         elif arg == '-repeat':
-            gen = RepeatPageGenerator()
+            repeat = True
+        elif arg == '-sqlite':
+            sqlite = True
         elif arg.startswith('-ignore:'):
             HTTPignore.append(int(arg[8:]))
         elif arg.startswith('-day:'):
@@ -1002,6 +1421,8 @@ def main(*args):
             xmlStart = None
         gen = XmlDumpPageGenerator(xmlFilename, xmlStart,
                                    genFactory.namespaces)
+    elif repeat:
+        gen = RepeatPageGenerator(sqlite)
 
     if not gen:
         gen = genFactory.getCombinedGenerator()
@@ -1012,7 +1433,7 @@ def main(*args):
             pageNumber = max(240, config.max_external_links * 2)
             gen = pagegenerators.PreloadingGenerator(gen, groupsize=pageNumber)
         gen = pagegenerators.RedirectFilterPageGenerator(gen)
-        bot = WeblinkCheckerRobot(gen, HTTPignore, config.weblink_dead_days)
+        bot = WeblinkCheckerRobot(gen, HTTPignore, sqlite=sqlite)
         try:
             bot.run()
         except ImportError:
@@ -1020,22 +1441,23 @@ def main(*args):
             return False
         finally:
             waitTime = 0
-            # Don't wait longer than 30 seconds for threads to finish.
-            while countLinkCheckThreads() > 0 and waitTime < 30:
+            # Don't wait longer than 30 seconds for links to be checked.
+            while bot.engine.unfinished() > 0 and waitTime < 30:
                 try:
-                    pywikibot.output('Waiting for remaining {0} threads to '
-                                     'finish, please wait...'
-                                     .format(countLinkCheckThreads()))
+                    pywikibot.output('Waiting for remaining {0} links to be '
+                                     'checked, please wait...'
+                                     .format(bot.engine.unfinished()))
                     # wait 1 second
                     time.sleep(1)
                     waitTime += 1
                 except KeyboardInterrupt:
                     pywikibot.output('Interrupted.')
                     break
-            if countLinkCheckThreads() > 0:
-                pywikibot.output('Remaining {0} threads will be killed.'
-                                 .format(countLinkCheckThreads()))
+            if bot.engine.unfinished() > 0:
+                pywikibot.output('Remaining {0} links will not be checked.'
+                                 .format(bot.engine.unfinished()))
                 # Threads will die automatically because they are daemonic.
+            bot.engine.stop()
             if bot.history.reportThread:
                 bot.history.reportThread.shutdown()
                 # wait until the report thread is shut down; the user can
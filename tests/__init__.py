@@ -86,11 +86,16 @@ library_test_modules = [
     'tools_chars',
     'tools_ip',
     'xmlreader',
+    'jsonreader',
     'textlib',
     'diff',
     'http',
+    'throttle',
     'namespace',
     'dry_api',
+    'sitemeta',
+    'revisionstore',
+    'urlindex',
     'dry_site',
     'api',
     'exceptions',
@@ -132,6 +137,7 @@ script_test_modules = [
     'add_text',
     'archivebot',
     'category_bot',
+    'interwiki_bot',
     'checkimages',
     'data_ingestion',
     'deletionbot',
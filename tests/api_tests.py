@@ -9,6 +9,7 @@ from __future__ import absolute_import, division, unicode_literals
 
 from collections import defaultdict
 import datetime
+import json
 import types
 
 import pywikibot.data.api as api
@@ -17,6 +18,7 @@ import pywikibot.login
 import pywikibot.page
 import pywikibot.site
 
+from pywikibot import config
 from pywikibot.throttle import Throttle
 from pywikibot.tools import (
     suppress_warnings,
@@ -790,6 +792,109 @@ class TestPropertyGenerator(TestCase):
         self.assertLength(links, count)
 
 
+class TestStreamedResult(TestCase):
+
+    """Test decoding query responses with a streamed result."""
+
+    net = False
+
+    def test_stream(self):
+        """Test that the entries and the members around them are decoded."""
+        text = ('{"continue": {"continue": "-||"}, "query": {"normalized": '
+                '[{"from": "a", "to": "A"}], "pages": {"2": {"title": "B"}, '
+                '"1": {"title": "A"}}, "pageids": ["2", "1"]}, '
+                '"batchcomplete": ""}\n')
+        data = api._stream_json(text, 'pages')
+        self.assertEqual(data['continue'], {'continue': '-||'})
+        self.assertEqual(data['query']['normalized'],
+                         [{'from': 'a', 'to': 'A'}])
+        self.assertNotIn('pageids', data['query'])
+        self.assertNotIn('batchcomplete', data)
+        self.assertIsInstance(data['query']['pages'], api._StreamedResult)
+        self.assertEqual(list(data['query']['pages']),
+                         [{'title': 'B'}, {'title': 'A'}])
+        self.assertEqual(data['query']['pageids'], ['2', '1'])
+        self.assertEqual(data['batchcomplete'], '')
+        self.assertEqual(list(data['query']['pages']), [])
+
+    def test_list(self):
+        """Test streaming a list result."""
+        data = api._stream_json(
+            '{"query": {"allpages": [{"title": "A"}, [], 1, "x"]}}',
+            'allpages')
+        self.assertEqual(list(data['query']['allpages']),
+                         [{'title': 'A'}, [], 1, 'x'])
+        data = api._stream_json('{"query": {"allpages": []}}', 'allpages')
+        self.assertEqual(list(data['query']['allpages']), [])
+
+    def test_no_result(self):
+        """Test responses without a result."""
+        for text in ('{"error": {"code": "x"}}', '{"query": []}',
+                     '{"query": {"pages": "x"}}', '{}'):
+            self.assertEqual(api._stream_json(text, 'pages'),
+                             json.loads(text))
+
+    def test_invalid(self):
+        """Test that invalid JSON raises ValueError."""
+        for text in ('', '[]', '{"query": {"pages": {}}', '{"a": 1,}',
+                     '{"a": 1} x', '{"query": {"pages": [1 2]}}'):
+            with self.assertRaises(ValueError):
+                data = api._stream_json(text, 'pages')
+                list(data['query']['pages'])
+                self.fail('{0!r} was decoded'.format(text))
+
+
+class TestDryStreamedPropertyGenerator(DefaultDrySiteTestCase):
+
+    """Test PropertyGenerator with streamed results."""
+
+    responses = [
+        '{"continue": {"rvcontinue": "1|2", "continue": "||"}, '
+        '"query": {"pages": {"1": {"title": "A", "revisions": [{"revid": 1}]}'
+        ', "2": {"title": "B", "revisions": [{"revid": 2}]}}}}',
+        '{"batchcomplete": "", "continue": {"continue": "-||"}, '
+        '"query": {"pages": {"2": {"title": "B", "revisions": [{"revid": 3}]}'
+        ', "3": {"title": "C"}}}}',
+        '{"batchcomplete": "", "query": {"pages": {"4": {"title": "D"}}}}',
+    ]
+
+    def setUp(self):
+        """Decode the responses with the request of the generator."""
+        super(TestDryStreamedPropertyGenerator, self).setUp()
+        self.gen = api.PropertyGenerator(
+            site=self.get_site(), prop='revisions',
+            parameters={'titles': 'A|B|C|D'})
+        self.gen.set_maximum_items(-1)
+        responses = iter(self.responses)
+        self.gen.request.submit = types.MethodType(
+            lambda self: self._json_loads(next(responses)), self.gen.request)
+
+    def _results(self):
+        """Return the titles and revision ids of the results."""
+        pages = []
+        for pagedata in self.gen:
+            pages.append((pagedata['title'], [rev['revid'] for rev
+                                              in pagedata.get('revisions',
+                                                              [])]))
+        return pages
+
+    def test_streamed(self):
+        """Test that continued results are merged."""
+        with patch.object(config, 'API_stream_results', True):
+            # A is only known to be complete when the response is decoded
+            self.assertEqual(self._results(),
+                             [('B', [2, 3]), ('C', []), ('A', [1]),
+                              ('D', [])])
+        self.assertEqual(self.gen.request._stream_key, 'pages')
+        self.assertEqual(self.gen.request['continue'], ['-', '', ''])
+
+    def test_decoded(self):
+        """Test the same results without streaming."""
+        self.assertEqual(self._results(),
+                         [('A', [1]), ('B', [2, 3]), ('C', []), ('D', [])])
+        self.assertIsNone(self.gen.request._stream_key)
+
+
 class TestDryQueryGeneratorNamespaceParam(TestCase):
 
     """Test setting of namespace param with ListGenerator.
@@ -15,9 +15,11 @@ import pywikibot.bot
 from pywikibot import i18n
 from pywikibot.tools import PY2, suppress_warnings
 
+from tests import mock
 from tests.aspects import (
     unittest, DefaultSiteTestCase, SiteAttributeTestCase, TestCase,
 )
+from tests.utils import DrySite
 
 
 class TWNBotTestCase(TestCase):
@@ -367,6 +369,58 @@ class LiveBotTestCase(TestBotTreatExit, DefaultSiteTestCase):
         self.bot.run()
 
 
+class TestPutPages(TestCase):
+
+    """Test BaseBot.put_pages."""
+
+    net = False
+
+    def test_put_pages(self):
+        """Test that the edits are passed to editpages of their site."""
+        site = DrySite('en', 'wikipedia', None, None)
+        page_a = pywikibot.Page(site, 'A')
+        page_b = pywikibot.Page(site, 'B')
+        results = [site.EditResult(page_b, True, None),
+                   site.EditResult(page_a, False,
+                                   pywikibot.EditConflict(page_a))]
+        bot = pywikibot.bot.BaseBot(always=True)
+        items = [(page_a, 'a', 'summary'), (page_b, 'b', 'summary')]
+        with mock.patch.object(site, 'editpages',
+                               return_value=results) as editpages:
+            with self.assertRaises(pywikibot.EditConflict):
+                list(bot.put_pages(items, workers=2))
+            self.assertEqual(list(bot.put_pages(
+                items, ignore_save_related_errors=True)),
+                [(page_b, True), (page_a, False)])
+        self.assertEqual(editpages.call_args_list[0][1], {'workers': 2})
+        self.assertEqual(bot._save_counter, 2)
+
+    def test_nobots(self):
+        """Test that pages are saved by Page.save with 'always'."""
+        site = DrySite('en', 'wikipedia', None, None)
+        site.login = lambda sysop=False: None
+        site.tokens = {'edit': 'token'}
+        site.user = lambda: 'Bot'
+        page_a = pywikibot.Page(site, 'A')
+        page_b = pywikibot.Page(site, 'B')
+        page_a._templates = []
+        page_b._templates = [pywikibot.Page(site, 'Template:Nobots')]
+        for page in (page_a, page_b):
+            page._latest_cached_revision = lambda: True
+        bot = pywikibot.bot.BaseBot(always=True)
+        items = [(page_a, 'a', 'summary'),
+                 (page_b, '{{nobots}}\nb', 'summary')]
+        with mock.patch.object(site, 'editpage',
+                               return_value=True) as editpage:
+            self.assertCountEqual(
+                bot.put_pages(items, botflag=False, show_diff=False,
+                              ignore_save_related_errors=True),
+                [(page_a, True), (page_b, False)])
+        editpage.assert_called_once_with(
+            page_a, summary='summary', minor=True, watch=None, bot=False)
+        self.assertEqual(page_a.text, 'a')
+
+
 if __name__ == '__main__':  # pragma: no cover
     try:
         unittest.main()
@@ -7,6 +7,12 @@
 #
 from __future__ import absolute_import, division, unicode_literals
 
+import datetime
+import os
+import shutil
+import tempfile
+
+from pywikibot.data import apicache
 from pywikibot.site import BaseSite
 
 import scripts.maintenance.cache as cache
@@ -38,5 +44,90 @@ class RequestCacheTests(TestCase):
         cache.process_entries(join_cache_path(), self._check_cache_entry)
 
 
+class SQLiteCacheBackendTests(TestCase):
+
+    """Test the SQLite API cache backend."""
+
+    net = False
+
+    def setUp(self):
+        """Create a backend in a temporary directory."""
+        super(SQLiteCacheBackendTests, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.backend = apicache.SQLiteCacheBackend(
+            os.path.join(self.directory, 'apicache.sqlite3'))
+        self.expiry = datetime.timedelta(days=1)
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self.backend.close()
+        shutil.rmtree(self.directory)
+        super(SQLiteCacheBackendTests, self).tearDown()
+
+    def _store(self, key, site, age=0, data='data'):
+        """Store an entry which is age days old."""
+        cachetime = (datetime.datetime.utcnow()
+                     - datetime.timedelta(days=age))
+        self.backend.store(key, site, site + key, data, cachetime,
+                           self.expiry)
+
+    def test_load_store(self):
+        """Test storing, loading and deleting an entry."""
+        self.assertIsNone(self.backend.load('a'))
+        self._store('a', 'site1', data={'query': [1, 2]})
+        description, data, cachetime = self.backend.load('a')
+        self.assertEqual(description, 'site1a')
+        self.assertEqual(data, {'query': [1, 2]})
+        self.assertIsInstance(cachetime, datetime.datetime)
+        self.backend.delete('a')
+        self.assertIsNone(self.backend.load('a'))
+
+    def test_purge(self):
+        """Test bulk expiry by site and age."""
+        self._store('a', 'site1')
+        self._store('b', 'site1', age=5)
+        self._store('c', 'site2', age=5)
+        self.assertEqual(self.backend.purge(expired=True), 2)
+        self.assertEqual([entry[0] for entry in self.backend.entries()],
+                         ['a'])
+        self._store('b', 'site1', age=5)
+        self._store('c', 'site2', age=5)
+        self.assertEqual(
+            self.backend.purge(site='site2',
+                               older_than=datetime.timedelta(days=2)), 1)
+        self.assertEqual(
+            sorted(entry[0] for entry in self.backend.entries()), ['a', 'b'])
+
+    def test_eviction(self):
+        """Test that the least recently used entries are evicted."""
+        self._store('a', 'site1', age=3, data='x' * 100)
+        self._store('b', 'site1', age=2, data='x' * 100)
+        self._store('c', 'site1', age=1, data='x' * 100)
+        self.backend.load('a')
+        self.backend.max_size = self.backend.size() - 1
+        self._store('d', 'site1', data='x')
+        self.assertIsNone(self.backend.load('b'))
+        for key in 'acd':
+            self.assertIsNotNone(self.backend.load(key))
+
+    def test_process_database_delete(self):
+        """Test deleting filtered entries of a database."""
+        key_format = ("APISite('en', 'wikipedia')"
+                      "LoginStatus(NOT_LOGGED_IN)[('action', 'query'), "
+                      "('titles', '{0}')]")
+        for title in 'AB':
+            self.backend.store(title, 'wikipedia:en', key_format.format(title),
+                               {}, datetime.datetime.utcnow(), self.expiry)
+        self.backend.close()
+        cache.process_database(
+            self.backend.filename,
+            lambda entry: entry._params['titles'] == ['A'],
+            output_func=lambda entry: entry._params['titles'],
+            action_func=cache.CacheEntry._delete)
+        self.backend = apicache.SQLiteCacheBackend(self.backend.filename)
+        self.assertIsNone(self.backend.load('A'))
+        self.assertIsNotNone(self.backend.load('B'))
+
+
 if __name__ == '__main__':  # pragma: no cover
     unittest.main()
@@ -7,13 +7,20 @@
 #
 from __future__ import absolute_import, division, unicode_literals
 
+import os
+import shutil
+import tempfile
+
 import pywikibot
 from pywikibot import BaseSite
 
-from scripts.category import CategoryPreprocess, CategoryMoveRobot
+from scripts.category import (
+    CategoryPreprocess, CategoryMoveRobot, CategoryStore,
+)
 
 from tests import patch, Mock
 from tests.aspects import unittest, DefaultSiteTestCase, TestCase
+from tests.utils import DrySite
 
 
 MOCKED_USERNAME = Mock(return_value='FakeUsername')
@@ -112,6 +119,74 @@ class TestPreprocessingCategory(TestCase):
         self.assertEqual(bot.includeonly, [])
 
 
+class TestCategoryStore(TestCase):
+
+    """Test the SQLite category database."""
+
+    net = False
+
+    def setUp(self):
+        """Create a store in a temporary directory."""
+        super(TestCategoryStore, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'category.sqlite3')
+        self.site = DrySite('en', 'wikipedia', None, None)
+        self.cat = pywikibot.Category(self.site, 'Foo')
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        shutil.rmtree(self.directory)
+        super(TestCategoryStore, self).tearDown()
+
+    def _retrieve(self, store):
+        """Return the contents and how often they were retrieved."""
+        subcats = Mock(return_value=[pywikibot.Category(self.site, 'Bar')])
+        articles = Mock(return_value=[pywikibot.Page(self.site, 'Baz'),
+                                      pywikibot.Page(self.site, 'File:B.png')])
+        supercats = Mock(return_value=[pywikibot.Category(self.site, 'Qux')])
+        with patch.object(pywikibot.Category, 'subcategories', subcats), \
+                patch.object(pywikibot.Category, 'articles', articles), \
+                patch.object(pywikibot.Category, 'categories', supercats):
+            contents = (store.getSubcats(self.cat),
+                        store.getArticles(self.cat),
+                        store.getSupercats(self.cat))
+        return contents, (subcats.call_count, supercats.call_count)
+
+    def test_persistence(self):
+        """Test that the entries are written and read again."""
+        store = CategoryStore(filename=self.filename)
+        retrieved, calls = self._retrieve(store)
+        self.assertEqual(calls, (1, 1))
+        store.dump()
+        store = CategoryStore(filename=self.filename)
+        stored, calls = self._retrieve(store)
+        self.assertEqual(calls, (0, 0))
+        self.assertEqual(stored, retrieved)
+        self.assertEqual([cat.title() for cat in stored[0]], ['Category:Bar'])
+        self.assertEqual(sorted(page.title() for page in stored[1]),
+                         ['Baz', 'File:B.png'])
+        store.dump()
+
+    def test_expiry(self):
+        """Test that expired entries are retrieved again."""
+        store = CategoryStore(filename=self.filename, ttl=1)
+        self._retrieve(store)
+        self.assertEqual(self._retrieve(store)[1], (0, 0))
+        store.ttl = 0
+        with patch('time.time', return_value=1e12):
+            self.assertEqual(self._retrieve(store)[1], (1, 1))
+        store.dump()
+
+    def test_rebuild(self):
+        """Test that rebuild deletes the entries."""
+        store = CategoryStore(filename=self.filename)
+        self._retrieve(store)
+        store.dump()
+        store = CategoryStore(rebuild=True, filename=self.filename)
+        self.assertEqual(self._retrieve(store)[1], (1, 1))
+        store.dump()
+
+
 if __name__ == '__main__':  # pragma: no cover
     try:
         unittest.main()
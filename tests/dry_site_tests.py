@@ -7,18 +7,25 @@
 #
 from __future__ import absolute_import, division, unicode_literals
 
+import pickle
+import threading
+
 import pywikibot
+from pywikibot import config
 from pywikibot.tools import deprecated
-from pywikibot.site import must_be, need_version
+from pywikibot.site import must_be, need_version, PageInUse
 from pywikibot.comms.http import user_agent
-from pywikibot.exceptions import UserRightsError
+from pywikibot.exceptions import EditConflict, UserRightsError
 
 from tests.aspects import (
     unittest,
     DefaultDrySiteTestCase,
     DebugOnlyTestCase,
     DeprecationTestCase,
+    TestCase,
 )
+from tests import mock
+from tests.utils import DrySite
 
 
 class TestDrySite(DefaultDrySiteTestCase):
@@ -298,5 +305,297 @@ class TestNeedVersion(DeprecationTestCase):
             __name__ + '.TestNeedVersion.deprecated_available_method2')
 
 
+class TestAsyncPutPerSite(TestCase):
+
+    """Test asynchronous requests processed per site."""
+
+    net = False
+
+    def setUp(self):
+        """Enable one put thread per site."""
+        super(TestAsyncPutPerSite, self).setUp()
+        self._async_put_per_site = config.async_put_per_site
+        config.async_put_per_site = True
+
+    def tearDown(self):
+        """Restore the config."""
+        config.async_put_per_site = self._async_put_per_site
+        super(TestAsyncPutPerSite, self).tearDown()
+
+    def test_parallel_sites(self):
+        """Test a blocked site does not delay requests to other sites."""
+        site_en = DrySite('en', 'wikipedia', None, None)
+        site_de = DrySite('de', 'wikipedia', None, None)
+        self.assertEqual(pywikibot._request_site(site_en.user, ()), site_en)
+        release = threading.Event()
+        done = []
+
+        def request(site, name):
+            if site == site_en:
+                release.wait(10)
+            done.append((name, threading.current_thread().name))
+
+        pywikibot.async_request(request, site_en, 'en1')
+        pywikibot.async_request(request, site_en, 'en2')
+        pywikibot.async_request(request, site_de, 'de')
+        pywikibot.async_request(request, None, 'none')
+        for _ in range(100):
+            if len(done) == 2:
+                break
+            release.wait(0.05)
+        self.assertCountEqual(
+            done, [('de', 'Put-Thread-wikipedia:de'),
+                   ('none', 'Put-Thread-default')])
+        self.assertEqual(pywikibot.put_queue_sizes()[site_en], 1)
+
+        release.set()
+        pywikibot.page_put_queue.join()
+        self.assertEqual(done[2:], [('en1', 'Put-Thread-wikipedia:en'),
+                                    ('en2', 'Put-Thread-wikipedia:en')])
+        self.assertEqual(pywikibot.put_queue_sizes()[site_en], 0)
+
+
+class TestLockPage(TestCase):
+
+    """Test the page lock table of a site."""
+
+    net = False
+
+    def setUp(self):
+        """Create the pages to lock."""
+        super(TestLockPage, self).setUp()
+        self.site = DrySite('en', 'wikipedia', None, None)
+        self.page = pywikibot.Page(self.site, 'Foo#bar')
+        self.other = pywikibot.Page(self.site, 'Bar')
+
+    def test_lock(self):
+        """Test locking and unlocking pages."""
+        self.site.lock_page(self.page)
+        self.site.lock_page(self.other)
+        with self.assertRaises(PageInUse):
+            self.site.lock_page(pywikibot.Page(self.site, 'Foo'), block=False)
+        self.assertEqual(self.site.page_lock_stats()['locked'], 2)
+        self.site.unlock_page(self.page)
+        self.site.lock_page(self.page, block=False)
+        self.site.unlock_page(self.page)
+        self.site.unlock_page(self.other)
+        self.assertEqual(self.site._locked_pages, {})
+        self.assertRaises(ValueError, self.site.unlock_page, self.page)
+        stats = self.site.page_lock_stats()
+        self.assertEqual(stats['locks'], 3)
+        self.assertEqual(stats['contended'], 0)
+        self.assertEqual(stats['locked'], 0)
+
+    def test_timeout(self):
+        """Test that waiting for a page times out."""
+        self.site.lock_page(self.page)
+        with self.assertRaises(PageInUse):
+            self.site.lock_page(self.page, timeout=0.05)
+        self.site.unlock_page(self.page)
+        self.assertEqual(self.site._locked_pages, {})
+        stats = self.site.page_lock_stats()
+        self.assertEqual(stats['contended'], 1)
+        self.assertEqual(stats['timeouts'], 1)
+        self.assertGreaterEqual(stats['max_wait'], 0.05)
+
+    def test_contention(self):
+        """Test that a waiting thread gets the page when it is unlocked."""
+        self.site.lock_page(self.page)
+        done = []
+
+        def write(name):
+            self.site.lock_page(self.page)
+            done.append(name)
+            self.site.unlock_page(self.page)
+
+        threads = [threading.Thread(target=write, args=(i, ))
+                   for i in range(3)]
+        for thread in threads:
+            thread.start()
+        for _ in range(100):
+            if self.site.page_lock_stats()['contended'] == 3:
+                break
+            threading.Event().wait(0.01)
+        try:
+            self.assertEqual(done, [])
+            self.assertEqual(
+                self.site._locked_pages['Foo'].waiters, 3)
+        finally:
+            self.site.unlock_page(self.page)
+        for thread in threads:
+            thread.join(10)
+        self.assertCountEqual(done, [0, 1, 2])
+        self.assertEqual(self.site._locked_pages, {})
+        stats = self.site.page_lock_stats()
+        self.assertEqual(stats['locks'], 4)
+        self.assertEqual(stats['contended'], 3)
+        self.assertEqual(stats['timeouts'], 0)
+
+    def test_pickle(self):
+        """Test that the lock table is recreated when unpickling."""
+        self.site.lock_page(self.page)
+        site = pickle.loads(pickle.dumps(self.site))
+        self.assertEqual(site._locked_pages, {})
+        site.lock_page(self.page, block=False)
+        site.unlock_page(self.page)
+
+
+class TestEditPages(TestCase):
+
+    """Test the pipelined edits of APISite.editpages."""
+
+    net = False
+
+    def setUp(self):
+        """Create a dry site which does not log in."""
+        super(TestEditPages, self).setUp()
+        self.site = DrySite('en', 'wikipedia', None, None)
+        self.site.login = lambda sysop=False: None
+        self.site.tokens = {'edit': 'token'}
+        self.site.user = lambda: 'Bot'
+        self.pages = [pywikibot.Page(self.site, title)
+                      for title in ('A', 'B', 'C')]
+        for page in self.pages:
+            # no bot exclusion templates
+            page._templates = []
+
+    def test_editpages(self):
+        """Test that edits are in flight together and results streamed."""
+        second_consumed = threading.Event()
+        edits = []
+
+        def editpage(page, summary=None, **kwargs):
+            edits.append((page.title(), page.text, summary))
+            if page.title() == 'A':
+                # waits until the result of B is consumed
+                second_consumed.wait(10)
+            elif page.title() == 'C':
+                raise EditConflict(page)
+            return True
+
+        cached = self.pages[1]
+        cached._latest_cached_revision = lambda: True
+        results = []
+        with mock.patch.object(self.site, 'editpage', side_effect=editpage):
+            with mock.patch.object(self.site, 'preloadpages',
+                                   return_value=[]) as preloadpages:
+                for result in self.site.editpages(
+                        ((page, page.title() + '!', 'summary')
+                         for page in self.pages), workers=2):
+                    results.append(result)
+                    if result.page == self.pages[1]:
+                        second_consumed.set()
+        self.assertTrue(second_consumed.is_set())
+        self.assertEqual(preloadpages.call_args[0][0],
+                         [self.pages[0], self.pages[2]])
+        self.assertCountEqual(edits, [('A', 'A!', 'summary'),
+                                      ('B', 'B!', 'summary'),
+                                      ('C', 'C!', 'summary')])
+        self.assertLength(results, 3)
+        self.assertEqual(results[0], (self.pages[1], True, None))
+        by_page = {result.page: result for result in results}
+        self.assertTrue(by_page[self.pages[0]].saved)
+        self.assertFalse(by_page[self.pages[2]].saved)
+        self.assertIsInstance(by_page[self.pages[2]].exception, EditConflict)
+
+    def test_close(self):
+        """Test that edits not started are dropped when closing."""
+        edits = []
+
+        def editpage(page, summary=None, **kwargs):
+            edits.append(page.title())
+            return True
+
+        for page in self.pages:
+            page._latest_cached_revision = lambda: True
+        with mock.patch.object(self.site, 'editpage', side_effect=editpage):
+            gen = self.site.editpages(
+                ((page, 'text', 'summary') for page in self.pages * 10),
+                workers=1, groupsize=30)
+            next(gen)
+            gen.close()
+        self.assertLess(len(edits), 30)
+
+
+class TestCrawlCategories(TestCase):
+
+    """Test the breadth-first category crawler."""
+
+    net = False
+
+    # Root contains A, A contains B and Root, B contains A
+    graph = {
+        'Root': ['Category:A', 'P1'],
+        'A': ['Category:B', 'P2', 'Category:Root'],
+        'B': ['Category:A', 'P1', 'File:F.jpg', 'Category:Empty'],
+        'Empty': [],
+    }
+
+    def setUp(self):
+        """Create a dry site returning the members of the graph."""
+        super(TestCrawlCategories, self).setUp()
+        self.site = DrySite('en', 'wikipedia', None, None)
+        self.queried = []
+        self.site.categorymembers = self._categorymembers
+        self.site.loadcategoryinfo = self._loadcategoryinfo
+
+    def _members(self, category):
+        return [pywikibot.Page(self.site, title)
+                for title in self.graph[category.title(with_ns=False)]]
+
+    def _categorymembers(self, category, namespaces=None, member_type=None,
+                         content=False):
+        self.queried.append(category.title(with_ns=False))
+        types = {6: 'file', 14: 'subcat'}
+        for member in self._members(category):
+            if types.get(member.namespace(), 'page') in member_type:
+                yield member
+
+    def _loadcategoryinfo(self, categories):
+        for category in categories:
+            members = self._members(category)
+            subcats = sum(member.namespace() == 14 for member in members)
+            files = sum(member.namespace() == 6 for member in members)
+            category._catinfo = {
+                'size': len(members), 'subcats': subcats, 'files': files,
+                'pages': len(members) - subcats - files}
+
+    def _crawl(self, **kwargs):
+        root = pywikibot.Category(self.site, 'Root')
+        return [(page.title(), depth) for page, depth in root.crawl(**kwargs)]
+
+    def test_crawl(self):
+        """Test the members and their depth."""
+        self.assertEqual(self._crawl(), [
+            ('Category:A', 0), ('P1', 0),
+            ('Category:B', 1), ('P2', 1), ('Category:Root', 1),
+            ('File:F.jpg', 2), ('Category:Empty', 2)])
+        # every category with members is queried once
+        self.assertEqual(self.queried, ['Root', 'A', 'B'])
+
+    def test_member_type(self):
+        """Test yielding only some member types."""
+        self.assertEqual(self._crawl(member_type=['page', 'file']),
+                         [('P1', 0), ('P2', 1), ('File:F.jpg', 2)])
+        self.assertEqual(self._crawl(member_type='subcat', total=2),
+                         [('Category:A', 0), ('Category:B', 1)])
+
+    def test_recurse_depth(self):
+        """Test limiting the depth."""
+        self.assertEqual(self._crawl(recurse=False),
+                         [('Category:A', 0), ('P1', 0)])
+        self.assertEqual(self._crawl(recurse=1, member_type='page'),
+                         [('P1', 0), ('P2', 1)])
+
+    def test_workers(self):
+        """Test retrieving the categories of a level concurrently."""
+        self.graph = dict(self.graph, Root=['Category:A', 'Category:B'])
+        self.assertCountEqual(self._crawl(workers=2), [
+            ('Category:A', 0), ('Category:B', 0),
+            ('P2', 1), ('Category:Root', 1), ('P1', 1),
+            ('File:F.jpg', 1), ('Category:Empty', 1)])
+        self.assertCountEqual(self.queried, ['Root', 'A', 'B'])
+
+
 if __name__ == '__main__':  # pragma: no cover
     unittest.main()
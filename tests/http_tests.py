@@ -9,6 +9,8 @@ from __future__ import absolute_import, division, unicode_literals
 
 import json
 import re
+import threading
+import time
 import warnings
 
 import requests
@@ -629,6 +631,104 @@ class TestDeprecatedGlobalCookieJar(DeprecationTestCase):
         self.assertIs(main_module_cookie_jar, http.cookie_jar)
 
 
+class HttpWorkerPoolTestCase(TestCase):
+
+    """Test the concurrent processing of requests by HttpWorkerPool."""
+
+    net = False
+
+    def setUp(self):
+        """Create a pool with a fake process function."""
+        super(HttpWorkerPoolTestCase, self).setUp()
+        self.lock = threading.Lock()
+        self.active = {}
+        self.max_active = {}
+        self.max_total = 0
+        self.pool = http.HttpWorkerPool(self._process, 4, 2)
+
+    def tearDown(self):
+        """Stop the pool."""
+        self.pool.stop()
+        super(HttpWorkerPoolTestCase, self).tearDown()
+
+    def _process(self, request):
+        """Record the concurrency per host and set a fake response."""
+        host = request.hostname
+        with self.lock:
+            self.active[host] = self.active.get(host, 0) + 1
+            self.max_active[host] = max(self.max_active.get(host, 0),
+                                        self.active[host])
+            self.max_total = max(self.max_total, sum(self.active.values()))
+        time.sleep(0.05)
+        with self.lock:
+            self.active[host] -= 1
+        request.data = requests.Response()
+
+    def test_per_host_limit(self):
+        """Test that hosts are limited but processed concurrently."""
+        requests_ = [threadedhttp.HttpRequest('https://{0}.example/'
+                                              .format(host))
+                     for host in 'aaaab']
+        for request in requests_:
+            self.pool.submit(request)
+        for request in requests_:
+            self.assertTrue(request.wait(5))
+        self.assertEqual(self.max_active, {'a.example': 2, 'b.example': 1})
+
+    def test_callback_error(self):
+        """Test that a failing callback does not stop the worker."""
+        def callback(request):
+            raise ValueError('callback')
+
+        failing = threadedhttp.HttpRequest('https://a.example/',
+                                           callbacks=[callback])
+        request = threadedhttp.HttpRequest('https://a.example/')
+        with patch('pywikibot.comms.http.error') as error:
+            self.pool.submit(failing)
+            self.pool.submit(request)
+            self.assertTrue(failing.wait(5))
+            self.assertTrue(request.wait(5))
+        self.assertEqual(error.call_count, 1)
+
+    def test_process_now(self):
+        """Test that blocking requests are not limited by the workers."""
+        self.pool.stop()
+        self.pool = http.HttpWorkerPool(self._process, 1, 2)
+        requests_ = [threadedhttp.HttpRequest('https://{0}.example/'
+                                              .format(host))
+                     for host in 'aaabcd']
+        threads = [threading.Thread(target=self.pool.process_now,
+                                    args=(request, ))
+                   for request in requests_]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join(5)
+        for request in requests_:
+            self.assertTrue(request.wait(0))
+        self.assertEqual(self.max_active['a.example'], 2)
+        self.assertGreater(self.max_total, 1)
+
+    def test_resize_adapters(self):
+        """Test that only the default adapters are enlarged."""
+        session = requests.Session()
+        custom = type(str('CustomAdapter'), (requests.adapters.HTTPAdapter, ),
+                      {})()
+        session.mount('https://', custom)
+        with patch('pywikibot.comms.http.session', session):
+            http._resize_adapters(20, 30)
+        self.assertIs(session.adapters['https://'], custom)
+        self.assertEqual(custom._pool_maxsize, 10)
+        self.assertEqual(session.adapters['http://']._pool_maxsize, 30)
+        self.assertEqual(session.adapters['http://']._pool_connections, 20)
+
+    def test_stop(self):
+        """Test that requests can't be submitted after stopping."""
+        self.pool.stop()
+        self.assertRaises(RuntimeError, self.pool.submit,
+                          threadedhttp.HttpRequest('https://a.example/'))
+
+
 class QueryStringParamsTestCase(HttpbinTestCase):
 
     """
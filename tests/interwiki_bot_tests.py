@@ -0,0 +1,116 @@
+# -*- coding: utf-8 -*-
+"""Tests for the interwiki script."""
+#
+# (C) Pywikibot team, 2019
+#
+# Distributed under the terms of the MIT license.
+#
+from __future__ import absolute_import, division, unicode_literals
+
+import threading
+
+from scripts.interwiki import InterwikiBot, InterwikiBotConfig
+
+from tests import Mock, patch
+from tests.aspects import unittest, TestCase
+
+
+class FakeSubject(object):
+
+    """Subject with one page to load from each of its sites."""
+
+    def __init__(self, sites):
+        """Initializer."""
+        self.todo = list(sites)
+        self.pending = []
+        self.loaded = []
+
+    def whatsNextPageBatch(self, site):
+        """Promise to load the page of the site."""
+        assert not self.pending
+        if site not in self.todo:
+            return []
+        self.todo.remove(site)
+        self.pending = ['{0}:page'.format(site.code)]
+        return list(self.pending)
+
+    def batchLoaded(self, counter):
+        """Record the loaded pages."""
+        self.loaded.extend(self.pending)
+        self.pending = []
+
+
+class TestConcurrentQuery(TestCase):
+
+    """Test queries to several sites in progress at once."""
+
+    net = False
+
+    def setUp(self):
+        """Set up a bot with fake sites and subjects."""
+        super(TestConcurrentQuery, self).setUp()
+        self.started = {}
+        self.sites = [self._site(code) for code in ('de', 'fr', 'nl')]
+        self.conf = InterwikiBotConfig()
+        self.conf.queriesinflight = 2
+        self.bot = InterwikiBot(self.conf)
+        self.bot.subjects = [FakeSubject(self.sites[:2]),
+                             FakeSubject(self.sites[1:]),
+                             FakeSubject(self.sites)]
+        patcher = patch.object(self.bot, 'selectQuerySite',
+                               side_effect=self._select)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _site(self, code):
+        """Return a site whose preloadpages waits for another query."""
+        site = Mock(code=code)
+        self.started[code] = threading.Event()
+
+        def preloadpages(pages, **kwargs):
+            self.started[code].set()
+            others = [event for other, event in self.started.items()
+                      if other != code]
+            # another query is in progress at the same time
+            assert any(event.wait(5) for event in others)
+            return iter(pages)
+
+        site.preloadpages.side_effect = preloadpages
+        return site
+
+    def _select(self, exclude=()):
+        """Return the first site with work which is not excluded."""
+        for site in self.sites:
+            if site not in exclude and any(site in subject.todo
+                                           for subject in self.bot.subjects):
+                return site
+        return None
+
+    def test_queries(self):
+        """Test all pages are loaded with two queries in progress."""
+        queries = 0
+        while self.bot.oneQuery():
+            queries += 1
+            self.assertLessEqual(len(self.bot.inflight), 1)
+        self.assertEqual(self.bot.inflight, {})
+        self.assertEqual([subject.loaded for subject in self.bot.subjects],
+                         [['de:page', 'fr:page'], ['fr:page', 'nl:page'],
+                          ['de:page', 'fr:page', 'nl:page']])
+        statistics = self.bot.queryStatistics()
+        self.assertEqual(sum(queries for _, _, queries, _, _ in statistics),
+                         queries)
+        self.assertEqual(sum(pages for _, _, _, pages, _ in statistics), 7)
+
+    def test_error(self):
+        """Test an error of a query is raised by the bot."""
+        self.sites[0].preloadpages.side_effect = ValueError('failed')
+        with self.assertRaisesRegex(ValueError, 'failed'):
+            while self.bot.oneQuery():
+                pass
+
+
+if __name__ == '__main__':  # pragma: no cover
+    try:
+        unittest.main()
+    except SystemExit:
+        pass
@@ -0,0 +1,178 @@
+# -*- coding: utf-8 -*-
+"""Tests for jsonreader module."""
+#
+# (C) Pywikibot team, 2019
+#
+# Distributed under the terms of the MIT license.
+#
+from __future__ import absolute_import, division, unicode_literals
+
+import bz2
+import gzip
+import json
+import os
+import shutil
+import tempfile
+
+import pywikibot
+
+from pywikibot import jsonreader, pagegenerators
+
+from tests import join_pages_path
+from tests.aspects import unittest, TestCase, WikidataTestCase
+
+
+def _entities():
+    """Return the entities of the test dump."""
+    with open(join_pages_path('Q60.wd')) as f:
+        q60 = json.load(f)
+    return [
+        q60,
+        {'type': 'item', 'id': 'Q2', 'lastrevid': 2, 'labels': {},
+         'descriptions': {}, 'aliases': {}, 'claims': {}, 'sitelinks': {}},
+        {'type': 'property', 'id': 'P1', 'lastrevid': 3,
+         'datatype': 'string', 'labels': {'en': {'language': 'en',
+                                                 'value': 'P1 label'}},
+         'descriptions': {}, 'aliases': {}, 'claims': {}},
+        {'type': 'lexeme', 'id': 'L1', 'lastrevid': 4, 'lemmas': {}},
+    ]
+
+
+def _write_dump(path, entities):
+    """Write the entities in the dump format."""
+    lines = [json.dumps(entity) for entity in entities]
+    data = '[\n' + ',\n'.join(lines) + '\n]\n'
+    with open(path, 'wb') as f:
+        f.write(data.encode('utf-8'))
+
+
+class JsonDumpTestBase(TestCase):
+
+    """Base class writing a JSON dump into a temporary directory."""
+
+    net = False
+
+    def setUp(self):
+        """Write the test dump."""
+        super(JsonDumpTestBase, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.entities = _entities()
+        self.filename = os.path.join(self.directory, 'dump.json')
+        _write_dump(self.filename, self.entities)
+
+    def tearDown(self):
+        """Remove the test dump."""
+        shutil.rmtree(self.directory)
+        super(JsonDumpTestBase, self).tearDown()
+
+    def _ids(self, filename=None, **kwargs):
+        """Return the ids of the entities of the dump."""
+        kwargs.setdefault('processes', 1)
+        dump = jsonreader.JsonDump(filename or self.filename, **kwargs)
+        return [entity['id'] for entity in dump.parse()]
+
+
+class JsonDumpTestCase(JsonDumpTestBase):
+
+    """Test reading JSON dumps."""
+
+    def test_parse(self):
+        """Test that all entities are read in order."""
+        dump = jsonreader.JsonDump(self.filename, processes=1)
+        self.assertEqual(list(dump.parse()), self.entities)
+
+    def test_compressed(self):
+        """Test reading compressed dumps."""
+        with open(self.filename, 'rb') as f:
+            data = f.read()
+        for name, module in (('dump.json.bz2', bz2), ('dump.json.gz', gzip)):
+            filename = os.path.join(self.directory, name)
+            with module.open(filename, 'wb') as f:
+                f.write(data)
+            self.assertEqual(self._ids(filename), ['Q60', 'Q2', 'P1', 'L1'])
+
+    def test_processes(self):
+        """Test decoding the lines in worker processes."""
+        self.assertEqual(self._ids(processes=2, batch_size=1),
+                         ['Q60', 'Q2', 'P1', 'L1'])
+        entity_filter = jsonreader.EntityFilter(types=['item'])
+        self.assertEqual(self._ids(processes=2, batch_size=3,
+                                   entity_filter=entity_filter),
+                         ['Q60', 'Q2'])
+
+
+class EntityFilterTestCase(JsonDumpTestBase):
+
+    """Test filtering the entities of JSON dumps."""
+
+    def test_types(self):
+        """Test the entity type filter."""
+        entity_filter = jsonreader.EntityFilter(types=['property', 'lexeme'])
+        self.assertEqual(self._ids(entity_filter=entity_filter),
+                         ['P1', 'L1'])
+
+    def test_properties(self):
+        """Test the property filter."""
+        entity_filter = jsonreader.EntityFilter(properties=['P17', 'p213'])
+        self.assertEqual(self._ids(entity_filter=entity_filter), ['Q60'])
+        entity_filter = jsonreader.EntityFilter(properties=['P17', 'P1'])
+        self.assertEqual(self._ids(entity_filter=entity_filter), [])
+
+    def test_sitelinks(self):
+        """Test the sitelink filter."""
+        entity_filter = jsonreader.EntityFilter(sitelinks=['enwiki'])
+        self.assertEqual(self._ids(entity_filter=entity_filter), ['Q60'])
+        entity_filter = jsonreader.EntityFilter(sitelinks=['xxwiki'])
+        self.assertEqual(self._ids(entity_filter=entity_filter), [])
+
+    def test_match_line(self):
+        """Test that lines are skipped before decoding."""
+        entity_filter = jsonreader.EntityFilter(properties=['P17'],
+                                                sitelinks=['enwiki'])
+        self.assertTrue(entity_filter.match_line(
+            b'{"claims":{"P17":[]},"sitelinks":{"enwiki":{}}},'))
+        self.assertFalse(entity_filter.match_line(
+            b'{"claims":{"P17":[]},"sitelinks":{}},'))
+        # the line is only a candidate, P17 has no claims
+        self.assertFalse(entity_filter(
+            {'claims': {'P17': []}, 'sitelinks': {'enwiki': {}}}))
+
+
+class TestJSONDumpPageGenerator(JsonDumpTestBase, WikidataTestCase):
+
+    """Test WikibaseJSONDumpPageGenerator."""
+
+    dry = True
+
+    def test_generator(self):
+        """Test that pages are created with their content loaded."""
+        repo = self.get_repo()
+        pages = list(pagegenerators.WikibaseJSONDumpPageGenerator(
+            self.filename, site=repo, processes=1))
+        self.assertEqual([page.getID() for page in pages],
+                         ['Q60', 'Q2', 'P1'])
+        q60, q2, p1 = pages
+        self.assertIsInstance(q60, pywikibot.ItemPage)
+        self.assertEqual(q60.latest_revision_id,
+                         self.entities[0]['lastrevid'])
+        self.assertIn('enwiki', q60.sitelinks)
+        self.assertIsInstance(q60.claims['P17'][0], pywikibot.Claim)
+        self.assertEqual(q2.claims.copy(), {})
+        self.assertIsInstance(p1, pywikibot.PropertyPage)
+        self.assertEqual(p1.type, 'string')
+        self.assertEqual(p1.labels['en'], 'P1 label')
+
+    def test_factory(self):
+        """Test the -jsondump option."""
+        gen_factory = pagegenerators.GeneratorFactory(site=self.get_repo())
+        self.assertTrue(gen_factory.handleArg(
+            '-jsondump:{0},item,P17'.format(self.filename)))
+        gen = gen_factory.getCombinedGenerator()
+        self.assertEqual([page.getID() for page in gen], ['Q60'])
+
+
+if __name__ == '__main__':  # pragma: no cover
+    try:
+        unittest.main()
+    except SystemExit:
+        pass
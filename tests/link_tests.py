@@ -16,6 +16,7 @@ from pywikibot import Site
 from pywikibot.page import Link, Page, SiteLink
 from pywikibot.site import Namespace
 from pywikibot.exceptions import Error, InvalidTitle
+from pywikibot.tools import LRUCache
 
 from tests.aspects import (
     unittest,
@@ -216,6 +217,46 @@ class TestLink(DefaultDrySiteTestCase):
         self.assertEqual(abs_link.title, '/bar')
 
 
+class TestLinkCached(TestLink):
+
+    """Test parsing links with the link cache of the site enabled."""
+
+    def setUp(self):
+        """Enable the link cache."""
+        super(TestLinkCached, self).setUp()
+        self._link_cache = self.site._link_cache
+        self.site._link_cache = LRUCache(100)
+
+    def tearDown(self):
+        """Restore the link cache."""
+        self.site._link_cache = self._link_cache
+        super(TestLinkCached, self).tearDown()
+
+    def test_cache(self):
+        """Test that parsed links are reused."""
+        site = self.get_site()
+        link = Link('Talk:Foo#Bar', site)
+        self.assertEqual(link.title, 'Foo')
+        self.assertEqual(site.link_cache.info().misses, 1)
+        other = Link('Talk:Foo#Bar', site)
+        self.assertEqual(other.title, 'Foo')
+        self.assertEqual(other.namespace, 1)
+        self.assertEqual(other.section, 'Bar')
+        self.assertEqual(site.link_cache.info().hits, 1)
+        # another default namespace is another entry
+        self.assertEqual(Link('Foo', site, default_namespace=1).namespace, 1)
+        self.assertEqual(Link('Foo', site).namespace, 0)
+        self.assertLength(site.link_cache, 3)
+
+    def test_invalid_not_cached(self):
+        """Test that invalid links are not cached."""
+        site = self.get_site()
+        for _ in range(2):
+            with self.assertRaises(InvalidTitle):
+                Link('Foo[]', site).parse()
+        self.assertLength(site.link_cache, 0)
+
+
 class Issue10254TestCase(DefaultDrySiteTestCase):
 
     """Test T102461 (Python issue 10254)."""
@@ -646,6 +646,41 @@ class TestPageBaseUnicode(DefaultDrySiteTestCase):
         cls.page = pywikibot.Page(cls.site, 'Ō')
 
 
+class TestPageTitleVariants(DefaultDrySiteTestCase):
+
+    """Test the cached title variants of a page."""
+
+    def test_variants(self):
+        """Test that the variants are cached and kept apart."""
+        page = pywikibot.Page(self.site, 'Talk:Foo bar#Baz')
+        self.assertEqual(page.title(), 'Talk:Foo bar#Baz')
+        self.assertEqual(page.title(with_ns=False, underscore=True),
+                         'Foo_bar#Baz')
+        self.assertEqual(page.title(with_section=False), 'Talk:Foo bar')
+        self.assertEqual(page.title(), 'Talk:Foo bar#Baz')
+        self.assertLength(page._title_variants[2], 3)
+
+    def test_link_changed(self):
+        """Test that the variants are discarded when the link changes."""
+        page = pywikibot.Page(self.site, 'Foo')
+        self.assertEqual(page.title(), 'Foo')
+        page._link = pywikibot.Link('Bar', self.site)
+        self.assertEqual(page.title(), 'Bar')
+        del page._link._title
+        page._link._text = 'Baz'
+        self.assertEqual(page.title(), 'Baz')
+
+    def test_as_link_config(self):
+        """Test that as_link variants depend on the configured site."""
+        page = pywikibot.Page(self.site, 'Foo')
+        with mock.patch.object(config, 'family', self.site.family.name):
+            with mock.patch.object(config, 'mylang', self.site.code):
+                self.assertEqual(page.title(as_link=True), '[[Foo]]')
+            with mock.patch.object(config, 'mylang', 'xx'):
+                self.assertEqual(page.title(as_link=True),
+                                 '[[{0}:Foo]]'.format(self.site.code))
+
+
 class TestPageGetFileHistory(DefaultDrySiteTestCase):
 
     """Test the get_file_history method of the FilePage class."""
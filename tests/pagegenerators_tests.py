@@ -11,6 +11,7 @@ import calendar
 import datetime
 import logging
 import sys
+import time
 
 import pywikibot
 from pywikibot import pagegenerators, date
@@ -589,6 +590,91 @@ class TestPreloadingGenerator(DefaultSiteTestCase):
             count += 1
         self.assertLength(links, count)
 
+    def test_prefetch(self):
+        """Test PreloadingGenerator retrieving batches in advance."""
+        mainpage = self.get_mainpage()
+        links = [page for page in self.site.pagelinks(mainpage, total=20)
+                 if page.exists()]
+        pages = list(PreloadingGenerator(links, groupsize=5, prefetch=2))
+        self.assertEqual(pages, links)
+        for page in pages:
+            self.assertIsNotNone(page._revisions[page._revid].text)
+
+
+class DryPreloadingPrefetchTest(TestCase):
+
+    """Test prefetching of PreloadingGenerator without a site."""
+
+    net = False
+
+    class FakeSite(object):
+
+        """Site which only records the preloaded pages."""
+
+        def __init__(self):
+            """Initializer."""
+            self.batches = []
+
+        def preloadpages(self, pages, groupsize):
+            """Record and yield the pages."""
+            self.batches.append(pages)
+            for page in pages:
+                if page.title == 'error':
+                    raise ValueError('error')
+                yield page
+
+    class FakePage(object):
+
+        """Page without revisions."""
+
+        def __init__(self, site, title):
+            """Initializer."""
+            self.site = site
+            self.title = title
+            self._revisions = {}
+
+    def setUp(self):
+        """Create the sites and the number of pages read."""
+        super(DryPreloadingPrefetchTest, self).setUp()
+        self.sites = [self.FakeSite(), self.FakeSite()]
+        self.read = 0
+
+    def _pages(self, count, error_at=None):
+        """Yield pages alternating between the sites."""
+        for i in range(count):
+            self.read += 1
+            title = 'error' if i == error_at else str(i)
+            yield self.FakePage(self.sites[i % 2], title)
+
+    def test_order(self):
+        """Test that prefetching keeps the order of lockstep mode."""
+        expected = [page.title for page in PreloadingGenerator(
+            self._pages(25), groupsize=3, prefetch=0)]
+        result = [page.title for page in PreloadingGenerator(
+            self._pages(25), groupsize=3, prefetch=2)]
+        self.assertEqual(result, expected)
+        self.assertLength(result, 25)
+
+    def test_lookahead(self):
+        """Test that the look-ahead is bounded by prefetch batches."""
+        gen = PreloadingGenerator(self._pages(100), groupsize=2, prefetch=1)
+        next(gen)
+        time.sleep(0.2)
+        # the current batch, one queued batch and one waiting to be queued
+        # for each site
+        self.assertLessEqual(self.read, 12)
+        gen.close()
+
+    def test_error(self):
+        """Test that errors are raised after the preceding pages."""
+        gen = PreloadingGenerator(self._pages(10, error_at=7), groupsize=2,
+                                  prefetch=3)
+        titles = []
+        with self.assertRaisesRegex(ValueError, 'error'):
+            for page in gen:
+                titles.append(page.title)
+        self.assertEqual(titles, ['0', '2', '1', '3', '4', '6'])
+
 
 class TestDequePreloadingGenerator(DefaultSiteTestCase):
 
@@ -679,6 +765,13 @@ class DryFactoryGeneratorTest(TestCase):
 
         self.assertEqual(gf.namespaces, {1, 6})
 
+    def test_prefetch(self):
+        """Test -prefetch option."""
+        gf = pagegenerators.GeneratorFactory(site=self.get_site())
+        self.assertIsNone(gf.prefetch)
+        self.assertTrue(gf.handleArg('-prefetch:2'))
+        self.assertEqual(gf.prefetch, 2)
+
     def test_unsupported_quality_level_filter(self):
         """Test unsupported option."""
         gf = pagegenerators.GeneratorFactory(site=self.get_site())
@@ -746,6 +839,43 @@ class DryFactoryGeneratorTest(TestCase):
         self.assertFalse(gf.handleArg('-ì'))
         self.assertFalse(gf.handleArg('ì'))
 
+    def _combined_titles(self, arg, *titles):
+        """Return the titles of the combined generators of the titles."""
+        gf = pagegenerators.GeneratorFactory(site=self.get_site())
+        if arg:
+            self.assertTrue(gf.handleArg(arg))
+        for gen_titles in titles:
+            gf.gens.append(pagegenerators.PagesFromTitlesGenerator(
+                gen_titles, self.get_site()))
+        return [page.title() for page in gf.getCombinedGenerator()]
+
+    def test_union(self):
+        """Test combining generators with -union."""
+        for arg in (None, '-union'):
+            self.assertEqual(
+                self._combined_titles(arg, ['A', 'B', 'a'], ['C', 'b']),
+                ['A', 'B', 'C'])
+
+    def test_intersect(self):
+        """Test combining generators with -intersect."""
+        with mock.patch.object(pywikibot.config, 'generator_spill_size', 1):
+            self.assertEqual(
+                self._combined_titles('-intersect', ['A', 'B', 'C', 'D'],
+                                      ['d', 'b', 'E'], ['B', 'D', 'D']),
+                ['B', 'D'])
+
+    def test_subtract(self):
+        """Test combining generators with -subtract."""
+        self.assertEqual(
+            self._combined_titles('-subtract', ['A', 'B', 'C', 'a'],
+                                  ['b'], ['D', 'C']),
+            ['A'])
+        with mock.patch.object(pywikibot.config, 'generator_spill_size', 1):
+            self.assertEqual(
+                self._combined_titles('-subtract', ['A', 'B', 'C', 'D'],
+                                      ['b', 'c', 'E']),
+                ['A', 'D'])
+
 
 class TestItemClaimFilterPageGenerator(WikidataTestCase):
 
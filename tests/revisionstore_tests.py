@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""Tests for the persistent revision store."""
+#
+# (C) Pywikibot team, 2019
+#
+# Distributed under the terms of the MIT license.
+#
+from __future__ import absolute_import, division, unicode_literals
+
+import os
+import shutil
+import tempfile
+
+from pywikibot.data import api, revisionstore
+
+from tests import mock
+from tests.aspects import unittest, TestCase
+from tests.utils import DrySite
+
+
+def _revision(revid, text):
+    """Return the revision of an API response with content."""
+    return {'revid': revid, 'parentid': revid - 1, 'user': 'Foo',
+            'timestamp': '2019-01-01T00:00:00Z', 'comment': '',
+            'slots': {'main': {'contentmodel': 'wikitext',
+                               'contentformat': 'text/x-wiki', '*': text}}}
+
+
+class RevisionStoreTestBase(TestCase):
+
+    """Base class using a store in a temporary directory."""
+
+    net = False
+
+    def setUp(self):
+        """Create a store."""
+        super(RevisionStoreTestBase, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.store = revisionstore.RevisionStore(
+            os.path.join(self.directory, 'revisions.sqlite3'))
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self.store.close()
+        shutil.rmtree(self.directory)
+        super(RevisionStoreTestBase, self).tearDown()
+
+
+class RevisionStoreTestCase(RevisionStoreTestBase):
+
+    """Test the store itself."""
+
+    def test_load_store(self):
+        """Test storing and loading revisions."""
+        self.store.store('wikipedia:en', [_revision(1, 'a'),
+                                          _revision(2, 'b' * 1000)])
+        self.store.store('wikipedia:de', [_revision(3, 'c')])
+        self.assertEqual(self.store.load('wikipedia:en', [1, 2, 3]),
+                         {1: _revision(1, 'a'), 2: _revision(2, 'b' * 1000)})
+        self.assertEqual(self.store.load('wikipedia:de', [3]),
+                         {3: _revision(3, 'c')})
+        self.assertEqual(self.store.load('wikipedia:de', []), {})
+        info = self.store.info()
+        self.assertEqual((info.hits, info.misses), (3, 1))
+        self.assertGreater(info.currsize, 0)
+        # the text is compressed
+        self.assertLess(info.currsize, 1000)
+
+    def test_many_revids(self):
+        """Test loading more revisions than variables per statement."""
+        self.store.store('wikipedia:en', [_revision(revid, 'a')
+                                          for revid in range(1, 1201)])
+        self.assertLength(self.store.load('wikipedia:en', range(1, 1301)),
+                          1200)
+
+    def test_evict(self):
+        """Test that the least recently used revisions are evicted."""
+        self.store.store('wikipedia:en', [_revision(1, 'a')])
+        size = self.store.size()
+        self.store.max_size = 2 * size + 10
+        self.store.store('wikipedia:en', [_revision(2, 'a')])
+        self.store.load('wikipedia:en', [1])
+        self.store.store('wikipedia:en', [_revision(3, 'a')])
+        self.assertEqual(sorted(self.store.load('wikipedia:en', [1, 2, 3])),
+                         [1, 3])
+
+    def test_purge(self):
+        """Test deleting the revisions of a site."""
+        self.store.store('wikipedia:en', [_revision(1, 'a')])
+        self.store.store('wikipedia:de', [_revision(1, 'a')])
+        self.assertEqual(self.store.purge('wikipedia:en'), 1)
+        self.assertEqual(self.store.load('wikipedia:en', [1]), {})
+        self.assertEqual(self.store.purge(), 1)
+        self.assertEqual(self.store.size(), 0)
+
+
+class PreloadStoredRevisionsTestCase(RevisionStoreTestBase):
+
+    """Test adding the stored content to the preloaded page data."""
+
+    def test_load_stored_revisions(self):
+        """Test that only revisions which are not stored are requested."""
+        site = DrySite('en', 'wikipedia', None, None)
+        self.store.store(str(site), [_revision(1, 'stored')])
+        pages = [{'title': 'A', 'revisions': [{'revid': 1}]},
+                 {'title': 'B', 'revisions': [{'revid': 2}]},
+                 {'title': 'C'}]
+        contentgen = mock.MagicMock()
+        contentgen.__iter__.return_value = [
+            {'title': 'B', 'revisions': [_revision(2, 'retrieved')]}]
+        with mock.patch.object(api, 'PropertyGenerator',
+                               return_value=contentgen) as generator:
+            result = site._load_stored_revisions(pages, self.store, 50)
+        self.assertEqual(generator.call_args[1]['parameters']['revids'], [2])
+        self.assertEqual(result[0]['revisions'][0], _revision(1, 'stored'))
+        self.assertEqual(result[1]['revisions'][0],
+                         _revision(2, 'retrieved'))
+        self.assertEqual(result[2], {'title': 'C'})
+        self.assertEqual(self.store.load(str(site), [2]),
+                         {2: _revision(2, 'retrieved')})
+
+
+if __name__ == '__main__':  # pragma: no cover
+    try:
+        unittest.main()
+    except SystemExit:
+        pass
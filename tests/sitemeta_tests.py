@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""Tests for the persistent site metadata store."""
+#
+# (C) Pywikibot team, 2019
+#
+# Distributed under the terms of the MIT license.
+#
+from __future__ import absolute_import, division, unicode_literals
+
+import datetime
+import os
+import shutil
+import tempfile
+
+from pywikibot.data import api, sitemeta
+from pywikibot.site import LoginStatus, Siteinfo
+
+from tests.aspects import unittest, TestCase
+from tests.utils import DrySite
+
+
+class SiteMetadataStoreTestBase(TestCase):
+
+    """Base class using a store in a temporary directory."""
+
+    net = False
+
+    def setUp(self):
+        """Create a store and use it as the shared store."""
+        super(SiteMetadataStoreTestBase, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.store = sitemeta.SiteMetadataStore(
+            os.path.join(self.directory, 'sitemeta.sqlite3'))
+        self._get_store = sitemeta.get_store
+        sitemeta.get_store = lambda force=False: self.store
+
+    def tearDown(self):
+        """Restore the shared store and remove the temporary directory."""
+        sitemeta.get_store = self._get_store
+        self.store.close()
+        shutil.rmtree(self.directory)
+        super(SiteMetadataStoreTestBase, self).tearDown()
+
+
+class SiteMetadataStoreTestCase(SiteMetadataStoreTestBase):
+
+    """Test the store itself."""
+
+    def test_load_store(self):
+        """Test storing, loading and deleting entries."""
+        self.assertIsNone(self.store.load('wikipedia:en', 'siteinfo'))
+        self.store.store('wikipedia:en', 'siteinfo', '1.33', 'abc',
+                         {'general': [{'lang': 'en'}, 'now']})
+        self.store.store('wikipedia:de', 'paraminfo', '1.33', 'abc', {})
+        version, hash, data, stored = self.store.load('wikipedia:en',
+                                                      'siteinfo')
+        self.assertEqual((version, hash), ('1.33', 'abc'))
+        self.assertEqual(data, {'general': [{'lang': 'en'}, 'now']})
+        self.assertLess(datetime.datetime.utcnow() - stored,
+                        datetime.timedelta(minutes=1))
+        self.assertEqual(self.store.sites(), ['wikipedia:de', 'wikipedia:en'])
+        self.assertEqual(self.store.delete('wikipedia:en'), 1)
+        self.assertIsNone(self.store.load('wikipedia:en', 'siteinfo'))
+        self.assertEqual(self.store.delete(), 1)
+
+    def test_siteinfo_hash(self):
+        """Test the hash ignores the server time."""
+        general = {'generator': 'MediaWiki 1.33', 'time': '2019-01-01'}
+        hash = sitemeta.siteinfo_hash(general)
+        general['time'] = '2019-01-02'
+        self.assertEqual(sitemeta.siteinfo_hash(general), hash)
+        general['lang'] = 'en'
+        self.assertNotEqual(sitemeta.siteinfo_hash(general), hash)
+
+
+class StoredSiteinfoTestCase(SiteMetadataStoreTestBase):
+
+    """Test Siteinfo and ParamInfo using the store."""
+
+    general = {'generator': 'MediaWiki 1.33.0', 'lang': 'en',
+               'time': '2019-01-01T00:00:00Z'}
+
+    def setUp(self):
+        """Create a dry site."""
+        super(StoredSiteinfoTestCase, self).setUp()
+        self.site = DrySite('en', 'wikipedia', None, None)
+        self.site._siteinfo._cache['general'] = (self.general, True)
+        self.site._siteinfo._cache['generator'] = (self.general['generator'],
+                                                   True)
+
+    def test_siteinfo(self):
+        """Test the cached siteinfo is restored from the store."""
+        now = datetime.datetime.utcnow()
+        siteinfo = Siteinfo(self.site)
+        siteinfo._store_loaded = True
+        siteinfo._cache = {'general': (self.general, now),
+                           'magicwords': ([{'name': 'toc'}], now),
+                           'unknown': ({}, False)}
+        siteinfo._save_stored()
+
+        siteinfo = Siteinfo(self.site)
+        self.assertIn('magicwords', siteinfo)
+        self.assertNotIn('unknown', siteinfo)
+        self.assertEqual(siteinfo.get('lang'), 'en')
+        self.assertEqual(siteinfo.get_requested_time('magicwords'), now)
+
+    def _save_paraminfo(self, limit):
+        """Save the paraminfo of the site with the given limit."""
+        paraminfo = api.ParamInfo(self.site)
+        self.assertFalse(paraminfo._load_stored())
+        paraminfo._paraminfo = {'main': {'name': 'main', 'parameters': []},
+                                'query+info': {'name': 'info'}}
+        paraminfo._modules = {'query': frozenset(['info'])}
+        paraminfo._action_modules = frozenset(['query', 'parse'])
+        paraminfo._limit = limit
+        paraminfo.modules_only_mode = True
+        paraminfo._save_stored()
+        return paraminfo
+
+    def test_paraminfo(self):
+        """Test the paraminfo is restored while the siteinfo is unchanged."""
+        paraminfo = self._save_paraminfo(50)
+
+        restored = api.ParamInfo(self.site)
+        restored._init()
+        self.assertEqual(restored._paraminfo, paraminfo._paraminfo)
+        self.assertEqual(restored._modules, paraminfo._modules)
+        self.assertEqual(restored.action_modules, {'query', 'parse'})
+        self.assertEqual(restored._limit, 50)
+        self.assertEqual(restored.paraminfo_keys, {'modules'})
+
+        self.site._siteinfo._cache['general'] = (dict(self.general,
+                                                      lang='de'), True)
+        self.assertFalse(api.ParamInfo(self.site)._load_stored())
+
+    def test_paraminfo_user(self):
+        """Test the paraminfo of another user is not restored."""
+        self._save_paraminfo(500)
+        self.site._loginstatus = LoginStatus.AS_USER
+        self.site._userinfo = {'name': 'Bot'}
+        self._save_paraminfo(50)
+
+        restored = api.ParamInfo(self.site)
+        self.assertTrue(restored._load_stored())
+        self.assertEqual(restored._limit, 50)
+        self.site._loginstatus = LoginStatus.NOT_LOGGED_IN
+        restored = api.ParamInfo(self.site)
+        self.assertTrue(restored._load_stored())
+        self.assertEqual(restored._limit, 500)
+
+
+if __name__ == '__main__':  # pragma: no cover
+    try:
+        unittest.main()
+    except SystemExit:
+        pass
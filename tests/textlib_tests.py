@@ -1258,6 +1258,39 @@ class TestReplaceExcept(DefaultDrySiteTestCase):
                                                site=self.site),
                          '000x123')
 
+    def test_overlapping_exceptions(self):
+        """Test exceptions which overlap each other."""
+        text = ('a<nowiki>a<!--a</nowiki>a-->a{{a}}a'
+                '<!--a<nowiki>a-->a</nowiki>a')
+        exceptions = ['nowiki', 'comment', 'template']
+        self.assertEqual(textlib.replaceExcept(text, 'a', 'b', exceptions,
+                                               site=self.site),
+                         'b<nowiki>a<!--a</nowiki>b-->b{{a}}b'
+                         '<!--a<nowiki>a-->b</nowiki>b')
+        self.assertEqual(textlib.replaceExcept(text, 'a', 'b', exceptions,
+                                               site=self.site, count=3,
+                                               marker='.'),
+                         'b<nowiki>a<!--a</nowiki>b-->b.{{a}}a'
+                         '<!--a<nowiki>a-->a</nowiki>a')
+
+    def test_replace_engines(self):
+        """Test that both replacement engines give the same result."""
+        text = ('x <!-- x --> {{x|x}} <nowiki>x</nowiki>x xx\n'
+                '<!--x<nowiki>x-->x</nowiki> {{x}}x') * 3
+        regexes = textlib._get_regexes(['comment', 'nowiki', 'template'],
+                                       self.site)
+        for old, new in (('x', 'y'), ('(x)(x)?', r'\2\1z'), ('x*', '-'),
+                         ('(?<=x)x', 'y')):
+            old = re.compile(old)
+            replacement = textlib._replacement_function(new)
+            for count in (0, 1, 4):
+                self.assertEqual(
+                    textlib._replace_except_spans(text, old, replacement,
+                                                  regexes, '#', count),
+                    textlib._replace_except_legacy(text, old, replacement,
+                                                   regexes, False, '#',
+                                                   count))
+
     def test_replace_tags(self):
         """Test replacing not inside various tags."""
         self.assertEqual(textlib.replaceExcept('A <!-- x --> B', 'x', 'y',
@@ -1591,6 +1624,32 @@ class TestMultiTemplateMatchBuilder(DefaultDrySiteTestCase):
                                  self._template_not_case_sensitive)
 
 
+class TestSiteRegexes(DefaultDrySiteTestCase):
+
+    """Test the regexes compiled once per site."""
+
+    def test_shared(self):
+        """Test that the compiled regexes are reused."""
+        self.assertIs(textlib._get_regexes(['category'], self.site)[0],
+                      textlib._get_regexes(['category'], self.site)[0])
+        self.assertIs(
+            _MultiTemplateMatchBuilder(self.site).pattern('quick'),
+            _MultiTemplateMatchBuilder(self.site).pattern('quick'))
+        self.assertIsNot(
+            _MultiTemplateMatchBuilder(self.site).pattern('quick'),
+            _MultiTemplateMatchBuilder(self.site).pattern('quick', 0))
+        self.assertIs(textlib.compileLinkR(), textlib.compileLinkR())
+        self.assertIsNot(textlib.compileLinkR(),
+                         textlib.compileLinkR(withoutBracketed=True))
+
+    def test_source_alias(self):
+        """Test that 'source' also excludes syntaxhighlight tags."""
+        regexes = textlib._get_regexes(['source'], self.site)
+        self.assertLength(regexes, 2)
+        self.assertIsNotNone(
+            regexes[1].search('<syntaxhighlight>x</syntaxhighlight>'))
+
+
 class TestGetLanguageLinks(SiteAttributeTestCase):
 
     """Test L{textlib.getLanguageLinks} function."""
@@ -57,6 +57,14 @@ class GeneratorIntersectTestCase(TestCase):
 
         self.assertCountEqual(result, set_result)
 
+        result = list(intersect_generators([sorted(data)
+                                            for data in datasets],
+                                           sort_key=lambda x: x))
+        self.assertEqual(result, sorted(set_result))
+
+        result = list(intersect_generators(datasets, maxsize=1))
+        self.assertCountEqual(result, set_result)
+
 
 class BasicGeneratorIntersectTestCase(GeneratorIntersectTestCase):
 
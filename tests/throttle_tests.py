@@ -0,0 +1,232 @@
+# -*- coding: utf-8 -*-
+"""Tests for the throttle module."""
+#
+# (C) Pywikibot team, 2019
+#
+# Distributed under the terms of the MIT license.
+#
+from __future__ import absolute_import, division, unicode_literals
+
+import os
+import shutil
+import tempfile
+import threading
+import time
+
+from pywikibot import config, throttle
+
+from tests.aspects import unittest, TestCase
+
+
+class ThrottleStoreTestCase(TestCase):
+
+    """Test the throttle state shared between processes."""
+
+    net = False
+
+    def setUp(self):
+        """Create a store in a temporary directory."""
+        super(ThrottleStoreTestCase, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'throttle.sqlite3')
+        self.store = throttle.ThrottleStore(self.filename)
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self.store.close()
+        shutil.rmtree(self.directory)
+        super(ThrottleStoreTestCase, self).tearDown()
+
+    def test_register(self):
+        """Test assigning process ids and counting processes."""
+        self.assertEqual(self.store.register(False, 'a', 600, 1200), (1, 1))
+        other = throttle.ThrottleStore(self.filename)
+        try:
+            self.assertEqual(other.register(False, 'a', 600, 1200), (2, 2))
+            self.assertEqual(other.register(2, 'b', 600, 1200), (2, 1))
+            self.assertEqual(self.store.register(1, 'a', 600, 1200), (1, 2))
+            other.unregister(2)
+        finally:
+            other.close()
+        self.assertEqual(self.store.register(1, 'a', 600, 1200), (1, 1))
+
+    def test_release(self):
+        """Test expired processes are removed."""
+        self.store.register(False, 'a', 600, 1200)
+        self.store.register(False, 'a', 600, 1200)
+        self.assertEqual(self.store.register(3, 'a', 0, -1), (3, 1))
+
+    def test_reserve(self):
+        """Test the slots of a schedule do not overlap."""
+        now = time.time()
+        self.assertEqual(self.store.next_slot('a', False), 0.0)
+        first = self.store.reserve('a', False, 10)
+        self.assertGreaterEqual(first, now)
+        self.assertEqual(self.store.reserve('a', False, 5), first + 10)
+        self.assertEqual(self.store.next_slot('a', False), first + 15)
+        # other schedules are independent
+        self.assertLess(self.store.reserve('a', True, 10), first + 10)
+        self.assertLess(self.store.reserve('b', False, 10), first + 10)
+
+    def test_concurrent_reserve(self):
+        """Test reserving slots from several connections."""
+        starts = []
+
+        def reserve():
+            store = throttle.ThrottleStore(self.filename)
+            try:
+                for _ in range(10):
+                    starts.append(store.reserve('a', False, 1))
+            finally:
+                store.close()
+
+        threads = [threading.Thread(target=reserve) for _ in range(4)]
+        for thread in threads:
+            thread.start()
+        for thread in threads:
+            thread.join()
+        starts.sort()
+        self.assertLength(starts, 40)
+        for previous, start in zip(starts, starts[1:]):
+            self.assertAlmostEqual(start - previous, 1)
+
+
+class SharedThrottleTestCase(TestCase):
+
+    """Test Throttle using a ThrottleStore."""
+
+    net = False
+
+    def setUp(self):
+        """Create a throttle using a store in a temporary directory."""
+        super(SharedThrottleTestCase, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.store = throttle.ThrottleStore(
+            os.path.join(self.directory, 'throttle.sqlite3'))
+        self.throttle = throttle.Throttle('a', mindelay=0, multiplydelay=False)
+        self.throttle._store = self.store
+        self.throttle.setDelays(delay=0.2, writedelay=0.2, absolute=True)
+        self.waits = []
+        self.throttle.wait = self.waits.append
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        self.store.close()
+        shutil.rmtree(self.directory)
+        super(SharedThrottleTestCase, self).tearDown()
+
+    def test_call(self):
+        """Test calls wait for the reserved slot."""
+        self.throttle()
+        self.throttle()
+        self.assertLength(self.waits, 2)
+        self.assertLessEqual(self.waits[0], 0)
+        self.assertGreater(self.waits[1], 0.1)
+        self.assertGreater(self.throttle.waittime(), 0.2)
+        self.assertEqual(self.throttle.waittime(write=True), 0)
+
+
+class TokenBucketTestCase(TestCase):
+
+    """Test the token bucket."""
+
+    net = False
+
+    def test_burst(self):
+        """Test requests within the burst do not wait."""
+        bucket = throttle.TokenBucket(1.0, 3)
+        self.assertEqual([bucket.reserve() for _ in range(3)], [0, 0, 0])
+        self.assertAlmostEqual(bucket.waittime(), 1, places=1)
+        self.assertAlmostEqual(bucket.reserve(), 1, places=1)
+        self.assertAlmostEqual(bucket.reserve(2), 3, places=1)
+
+    def test_set_rate(self):
+        """Test changing the rate."""
+        bucket = throttle.TokenBucket(1.0, 1)
+        bucket.reserve()
+        bucket.set_rate(4.0)
+        self.assertAlmostEqual(bucket.reserve(), 0.25, places=1)
+
+
+class AdaptiveThrottleTestCase(TestCase):
+
+    """Test the adaptive throttle."""
+
+    net = False
+
+    def setUp(self):
+        """Create an adaptive throttle."""
+        super(AdaptiveThrottleTestCase, self).setUp()
+        self._maxlag = config.maxlag
+        config.maxlag = 5
+        self.throttle = throttle.AdaptiveThrottle(
+            'a', mindelay=0, maxdelay=10, multiplydelay=False)
+        self.throttle.setDelays(writedelay=2)
+        self.waits = []
+        self.throttle.wait = self.waits.append
+
+    def tearDown(self):
+        """Restore the config."""
+        config.maxlag = self._maxlag
+        super(AdaptiveThrottleTestCase, self).tearDown()
+
+    def test_rates(self):
+        """Test the rates are limited by the delays."""
+        state = self.throttle.state()
+        self.assertEqual(state['read_rate'], config.adaptive_max_rate)
+        self.assertEqual(state['write_rate'], 0.5)
+        self.throttle.record(latency=0.1)
+        self.assertEqual(self.throttle.state()['write_rate'], 0.5)
+
+    def test_separate_buckets(self):
+        """Test reads do not wait for writes."""
+        for _ in range(config.adaptive_write_burst + 1):
+            self.throttle(write=True)
+        self.assertGreater(self.waits[-1], 1)
+        self.throttle()
+        self.assertEqual(self.waits[-1], 0)
+
+    def test_lag(self):
+        """Test lag lowers the rates smoothly and success raises them."""
+        rate = self.throttle.read_bucket.rate
+        self.throttle.record(latency=0.1, lag=3)
+        self.assertLess(self.throttle.read_bucket.rate, rate)
+        self.assertGreater(self.throttle.read_bucket.rate, rate / 2)
+        rate = self.throttle.read_bucket.rate
+        self.throttle.record(latency=0.1, lag=5)
+        self.assertEqual(self.throttle.read_bucket.rate, rate / 2)
+        self.throttle.record(error=True)
+        self.assertEqual(self.throttle.read_bucket.rate, rate / 4)
+        self.throttle.record(latency=0.1)
+        self.assertGreater(self.throttle.read_bucket.rate, rate / 4)
+        for _ in range(100):
+            self.throttle.record(latency=0.1)
+        self.assertEqual(self.throttle.read_bucket.rate,
+                         config.adaptive_max_rate)
+        state = self.throttle.state()
+        self.assertEqual(state['lag'], 5)
+        self.assertEqual(state['errors'], 1)
+        self.assertEqual(state['requests'], 104)
+
+    def test_min_rate(self):
+        """Test the rates do not drop below one request per maxdelay."""
+        for _ in range(20):
+            self.throttle.record(error=True)
+        self.assertEqual(self.throttle.read_bucket.rate, 0.1)
+        self.assertEqual(self.throttle.write_bucket.rate, 0.1)
+
+    def test_latency(self):
+        """Test growing latency lowers the rates."""
+        self.throttle.record(latency=0.1)
+        rate = self.throttle.read_bucket.rate
+        self.throttle.record(latency=1)
+        self.assertEqual(self.throttle.read_bucket.rate, rate)
+        self.throttle.record(latency=5)
+        self.assertLess(self.throttle.read_bucket.rate, rate)
+
+
+if __name__ == '__main__':  # pragma: no cover
+    try:
+        unittest.main()
+    except SystemExit:
+        pass
@@ -912,6 +912,119 @@ class TestMergeGenerator(TestCase):
         result = ''.join(tools.roundrobin_generators('HlWrd', 'e', 'lool'))
         self.assertEqual(result, 'HelloWorld')
 
+    def test_union_generators(self):
+        """Test union_generators with and without sorted generators."""
+        self.assertEqual(list(tools.union_generators(['bca', 'adc', 'e'])),
+                         ['b', 'c', 'a', 'd', 'e'])
+        self.assertEqual(
+            list(tools.union_generators(['abbd', 'bcd', ''],
+                                        sort_key=lambda x: x)),
+            ['a', 'b', 'c', 'd'])
+
+    def test_subtract_generators(self):
+        """Test subtract_generators with and without sorted generators."""
+        self.assertEqual(
+            list(tools.subtract_generators(['dcbaad', 'b', 'ce'])),
+            ['d', 'a'])
+        self.assertEqual(
+            list(tools.subtract_generators(['Aabbd', 'bc', 'D'],
+                                           sort_key=lambda x: x.lower())),
+            ['A'])
+
+    def test_intersect_generators_spilled(self):
+        """Test intersect_generators keeping the keys in a SpillSet."""
+        self.assertEqual(
+            list(tools.intersect_generators(['dcbaad', 'Abd', 'xddba'],
+                                            key=str.lower, maxsize=1)),
+            ['d', 'b', 'a'])
+        self.assertEqual(
+            list(tools.intersect_generators(['ab', '', 'ab'], maxsize=1)),
+            [])
+
+    def test_unsorted(self):
+        """Test that unsorted generators raise ValueError."""
+        with self.assertRaisesRegex(ValueError, "'a' follows 'b'"):
+            list(tools.union_generators(['ab', 'ba'], sort_key=lambda x: x))
+
+
+class TestLRUCache(TestCase):
+
+    """Test LRUCache."""
+
+    net = False
+
+    def test_eviction(self):
+        """Test that the least recently used entry is discarded."""
+        cache = tools.LRUCache(2)
+        cache['a'] = 1
+        cache['b'] = 2
+        self.assertEqual(cache.get('a'), 1)
+        cache['c'] = 3
+        self.assertLength(cache, 2)
+        self.assertIn('a', cache)
+        self.assertNotIn('b', cache)
+        self.assertIsNone(cache.get('b'))
+        self.assertEqual(cache.get('b', 0), 0)
+
+    def test_info(self):
+        """Test the hit and miss statistics."""
+        cache = tools.LRUCache(10)
+        cache.get('a')
+        cache['a'] = 1
+        cache.get('a')
+        cache.get('a')
+        self.assertEqual(cache.info(), (2, 1, 10, 1))
+        cache.clear()
+        self.assertEqual(cache.info(), (0, 0, 10, 0))
+
+    def test_disabled(self):
+        """Test that nothing is stored without a positive size."""
+        cache = tools.LRUCache(0)
+        cache['a'] = 1
+        self.assertLength(cache, 0)
+        self.assertIsNone(cache.get('a'))
+
+
+class TestSpillSet(TestCase):
+
+    """Test SpillSet."""
+
+    net = False
+
+    def test_memory(self):
+        """Test that the items are kept in memory up to maxsize."""
+        with tools.SpillSet(3) as items:
+            for item in ('a', 1, b'b', 'a'):
+                items.add(item)
+            self.assertLength(items, 3)
+            self.assertIsNone(items.filename)
+            self.assertIn(1, items)
+            self.assertNotIn('1', items)
+
+    def test_spill(self):
+        """Test that the items are moved into a file."""
+        with tools.SpillSet(2) as items:
+            for item in ('a', 1, 'a', b'b', 'c', 1):
+                items.add(item)
+            filename = items.filename
+            self.assertTrue(os.path.exists(filename))
+            self.assertLength(items, 4)
+            for item in ('a', 1, b'b', 'c'):
+                self.assertIn(item, items)
+            self.assertNotIn('b', items)
+            self.assertNotIn('d', items)
+        self.assertFalse(os.path.exists(filename))
+        self.assertIsNone(items.filename)
+
+    def test_union_spilled(self):
+        """Test that union_generators removes spilled duplicates."""
+        self.assertEqual(
+            list(tools.union_generators(['abcab', 'dcbe'], maxsize=1)),
+            ['a', 'b', 'c', 'd', 'e'])
+        self.assertEqual(
+            list(tools.subtract_generators(['abcdab', 'dcx'], maxsize=1)),
+            ['a', 'b'])
+
 
 if __name__ == '__main__':  # pragma: no cover
     try:
@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""Tests for the offline URL index of the families."""
+#
+# (C) Pywikibot team, 2019
+#
+# Distributed under the terms of the MIT license.
+#
+from __future__ import absolute_import, division, unicode_literals
+
+import os
+import shutil
+import tempfile
+
+import pywikibot
+
+from pywikibot.data import urlindex
+
+from tests import mock
+from tests.aspects import unittest, TestCase
+
+
+class FamilyUrlIndexTestCase(TestCase):
+
+    """Test FamilyUrlIndex."""
+
+    net = False
+
+    def setUp(self):
+        """Build an index in a temporary directory."""
+        super(FamilyUrlIndexTestCase, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.filename = os.path.join(self.directory, 'urlindex.json')
+        self.index = urlindex.FamilyUrlIndex(self.filename)
+
+    def tearDown(self):
+        """Remove the temporary directory."""
+        shutil.rmtree(self.directory)
+        super(FamilyUrlIndexTestCase, self).tearDown()
+
+    def test_hosts(self):
+        """Test the index entries of a hostname."""
+        self.assertEqual(
+            self.index.hosts['vo.wikipedia.org'],
+            [['wikipedia', 'vo',
+              ['/w/index.php', '/w/index.php/', '/w/index.php?title=']]])
+        self.assertNotIn('vo.wikipedia.org/wiki', self.index.hosts)
+
+    def test_lookup_script_path(self):
+        """Test resolving URLs of index.php."""
+        with mock.patch.object(self.index, '_article_path') as article_path:
+            for url in ('https://vo.wikipedia.org/w/index.php',
+                        '//vo.wikipedia.org/w/index.php?title=$1',
+                        'http://vo.wikipedia.org/w/index.php/Foo'):
+                self.assertEqual(self.index.lookup(url),
+                                 [('vo', 'wikipedia')])
+            self.assertFalse(article_path.called)
+
+    def test_lookup_article_path(self):
+        """Test resolving URLs with a known article path."""
+        self.index.article_paths['wikipedia:vo'] = '/wiki/'
+        self.assertEqual(self.index.lookup('https://vo.wikipedia.org/wiki/$1'),
+                         [('vo', 'wikipedia')])
+        self.assertEqual(self.index.lookup('https://vo.wikipedia.org/wik/$1'),
+                         [])
+
+    def test_lookup_unknown(self):
+        """Test URLs which don't belong to a family."""
+        self.assertEqual(self.index.lookup('https://foobar.example.org/$1'),
+                         [])
+        self.assertEqual(self.index.lookup('ftp://vo.wikipedia.org/wiki/$1'),
+                         [])
+        with self.assertRaises(ValueError):
+            self.index.lookup('https://vo.wikipedia.org/wiki/$1/foo')
+
+    def test_persistence(self):
+        """Test that the index and article paths are loaded from the file."""
+        self.index.article_paths['wikipedia:vo'] = '/wiki/'
+        self.index._save()
+        with mock.patch.object(urlindex.FamilyUrlIndex, 'build') as build:
+            index = urlindex.FamilyUrlIndex(self.filename)
+        self.assertFalse(build.called)
+        self.assertEqual(index.hosts, self.index.hosts)
+        self.assertEqual(index.lookup('https://vo.wikipedia.org/wiki/$1'),
+                         [('vo', 'wikipedia')])
+
+    def test_invalidation(self):
+        """Test that the index is rebuilt when a family file changes."""
+        with mock.patch.object(urlindex, '_family_files_key',
+                               return_value=[]):
+            with mock.patch.object(urlindex.FamilyUrlIndex,
+                                   'build') as build:
+                urlindex.FamilyUrlIndex(self.filename)
+        self.assertTrue(build.called)
+
+    def test_code_fam_from_url(self):
+        """Test that the Site factory uses the index."""
+        url = 'https://vo.wikipedia.org/w/index.php?title=$1'
+        pywikibot._url_cache.pop(url, None)
+        with mock.patch.object(urlindex, 'get_index',
+                               return_value=self.index):
+            with mock.patch.object(pywikibot.config, 'family_url_index',
+                                   True):
+                code, family = pywikibot._code_fam_from_url(url)
+        pywikibot._url_cache.pop(url, None)
+        self.assertEqual(code, 'vo')
+        self.assertEqual(family.name, 'wikipedia')
+
+
+if __name__ == '__main__':  # pragma: no cover
+    try:
+        unittest.main()
+    except SystemExit:
+        pass
@@ -1,20 +1,25 @@
 # -*- coding: utf-8 -*-
 """weblinkchecker test module."""
 #
-# (C) Pywikibot team, 2015-2018
+# (C) Pywikibot team, 2015-2019
 #
 # Distributed under the terms of the MIT license.
 #
 from __future__ import absolute_import, division, unicode_literals
 
 import datetime
+import os
+import pickle
+import shutil
+import tempfile
+import threading
 
 from requests import ConnectionError as RequestsConnectionError
 
 from pywikibot.tools import PY2
 from scripts import weblinkchecker
 from tests.aspects import unittest, require_modules, TestCase
-from tests import weblib_tests
+from tests import Mock, patch, weblib_tests
 
 if not PY2:
     from urllib.parse import urlparse
@@ -100,6 +105,208 @@ class TestMementoDefault(MementoTestCase):
             self._get_archive_url, 'invalid')
 
 
+class TestNormalizeUrl(TestCase):
+
+    """Test normalize_url function."""
+
+    net = False
+
+    def test_normalize(self):
+        """Test equivalent URLs are normalized to the same URL."""
+        for url in ('http://Example.ORG', 'HTTP://example.org:80/',
+                    'http://example.org/#top'):
+            self.assertEqual(weblinkchecker.normalize_url(url),
+                             'http://example.org/')
+        self.assertEqual(
+            weblinkchecker.normalize_url('https://example.org:443/a?b=C'),
+            'https://example.org/a?b=C')
+        self.assertEqual(
+            weblinkchecker.normalize_url('https://example.org:80/A'),
+            'https://example.org:80/A')
+
+
+class TestLinkCheckEngine(TestCase):
+
+    """Test LinkCheckEngine with a mocked http layer."""
+
+    net = False
+
+    def setUp(self):
+        """Set up a history mock and record the requests."""
+        super(TestLinkCheckEngine, self).setUp()
+        self.history = Mock()
+        self.history.setLinkAlive.return_value = False
+        self.requests = []
+        self.statuses = {}
+        self.lock = threading.Lock()
+        patcher = patch.object(weblinkchecker.comms.http, 'fetch',
+                               side_effect=self._fetch)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch.object(weblinkchecker.pywikibot, 'output')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _fetch(self, url, method='GET', **kwargs):
+        """Return a response with the status given for the URL."""
+        with self.lock:
+            self.requests.append((method, url))
+        status = self.statuses.get((method, url), 200)
+        return Mock(status=status, exception=None)
+
+    def _check(self, links, **kwargs):
+        """Check the links and wait for the engine to finish."""
+        engine = weblinkchecker.LinkCheckEngine(self.history, workers=3,
+                                                **kwargs)
+        for page, url in links:
+            engine.submit(page, url)
+        engine.stop()
+        for thread in engine._threads:
+            thread.join(10)
+        self.assertEqual(engine.unfinished(), 0)
+        return engine
+
+    def test_dedup(self):
+        """Test a URL is requested once for all pages containing it."""
+        links = [('A', 'http://example.org/'), ('B', 'http://EXAMPLE.org'),
+                 ('C', 'http://example.org/#x'), ('D', 'http://example.com')]
+        engine = self._check(links)
+        self.assertCountEqual(self.requests,
+                              [('HEAD', 'http://example.org/'),
+                               ('HEAD', 'http://example.com')])
+        self.assertEqual(engine.checked, 2)
+        self.assertEqual(engine.cached, 2)
+        self.assertEqual(self.history.setLinkAlive.call_count, 4)
+        self.history.setLinkDead.assert_not_called()
+
+    def test_get_fallback(self):
+        """Test a failing HEAD request is confirmed with GET."""
+        self.statuses[('HEAD', 'http://example.org/a')] = 405
+        self.statuses[('HEAD', 'http://example.org/b')] = 404
+        self.statuses[('GET', 'http://example.org/b')] = 404
+        page = Mock()
+        page.title.return_value = 'A'
+        self._check([(page, 'http://example.org/a'),
+                     (page, 'http://example.org/b')])
+        self.assertCountEqual(self.requests,
+                              [('HEAD', 'http://example.org/a'),
+                               ('GET', 'http://example.org/a'),
+                               ('HEAD', 'http://example.org/b'),
+                               ('GET', 'http://example.org/b')])
+        self.history.setLinkAlive.assert_called_once_with(
+            'http://example.org/a')
+        self.assertEqual(self.history.setLinkDead.call_count, 1)
+        self.assertEqual(self.history.setLinkDead.call_args[0][:3],
+                         ('http://example.org/b', '404', page))
+
+    def test_ignored_status(self):
+        """Test a status given in HTTPignore is not reported."""
+        self.statuses[('HEAD', 'http://example.org/')] = 401
+        self.statuses[('GET', 'http://example.org/')] = 401
+        self._check([('A', 'http://example.org/')], HTTPignore=[401])
+        self.history.setLinkDead.assert_not_called()
+
+    def test_host_limit(self):
+        """Test requests to a host are limited to max_per_host."""
+        running = {}
+        peak = {}
+
+        def fetch(url, method='GET', **kwargs):
+            host = url.split('/')[2]
+            with self.lock:
+                running[host] = running.get(host, 0) + 1
+                peak[host] = max(peak.get(host, 0), running[host])
+            threading.Event().wait(0.02)
+            with self.lock:
+                running[host] -= 1
+            return Mock(status=200, exception=None)
+
+        weblinkchecker.comms.http.fetch.side_effect = fetch
+        links = [('A', 'http://{0}.org/{1}'.format(host, i))
+                 for i in range(6) for host in ('a', 'b')]
+        self._check(links, max_per_host=1)
+        self.assertEqual(peak, {'a.org': 1, 'b.org': 1})
+
+
+class TestHistoryStore(TestCase):
+
+    """Test HistoryStore."""
+
+    net = False
+
+    def setUp(self):
+        """Create the store in a temporary directory."""
+        super(TestHistoryStore, self).setUp()
+        self.directory = tempfile.mkdtemp()
+        self.addCleanup(shutil.rmtree, self.directory)
+        patcher = patch.object(
+            weblinkchecker.pywikibot.config, 'datafilepath',
+            side_effect=lambda *path: os.path.join(self.directory, path[-1]))
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        patcher = patch.object(weblinkchecker.pywikibot, 'output')
+        patcher.start()
+        self.addCleanup(patcher.stop)
+        self.site = Mock(code='en')
+        self.site.family.name = 'wikipedia'
+        self.page = Mock()
+        self.page.title.return_value = 'Foo'
+
+    def _store(self):
+        """Return a store, which is closed after the test."""
+        store = weblinkchecker.HistoryStore(None, site=self.site)
+        self.addCleanup(store.save)
+        return store
+
+    def test_migrate(self):
+        """Test the links of the pickled history are imported."""
+        history = {
+            'http://example.org/a': [('Foo', 10.0, '404'),
+                                     ('Bar', 20.0, '404')],
+            'http://example.org/b': [('Bar', 30.0, '500')],
+        }
+        with open(os.path.join(self.directory,
+                               'deadlinks-wikipedia-en.dat'), 'wb') as f:
+            pickle.dump(history, f)
+        store = self._store()
+        self.assertEqual(store.page_titles(), ['Bar', 'Foo'])
+        self.assertEqual(store.links_in('Bar'), ['http://example.org/a',
+                                                 'http://example.org/b'])
+        self.assertEqual(store.observations('http://example.org/a'),
+                         history['http://example.org/a'])
+        self.assertEqual(list(store.dead_links()),
+                         [('http://example.org/a', 10.0),
+                          ('http://example.org/b', 30.0)])
+
+    def test_dead_and_alive(self):
+        """Test observations are committed and removed."""
+        store = self._store()
+        url = 'http://example.org/'
+        with patch.object(weblinkchecker.time, 'time', return_value=1000.0):
+            store.setLinkDead(url, '404', self.page, 7)
+            # found again within an hour, not recorded
+            store.setLinkDead(url, '404', self.page, 7)
+            self.assertEqual(list(store.dead_links(days=1)), [])
+        self.assertLength(store.observations(url), 1)
+
+        # the observations are committed without calling save
+        other = self._store()
+        with patch.object(weblinkchecker.time, 'time',
+                          return_value=1000.0 + 8 * 86400), \
+                patch.object(other, '_archive_url', return_value=None), \
+                patch.object(other, 'log') as log:
+            other.setLinkDead(url, '500', self.page, 7)
+            self.assertEqual(list(other.dead_links(days=7)),
+                             [(url, 1000.0)])
+        log.assert_called_once_with(url, '500', self.page, None)
+        self.assertEqual([error for _, _, error in other.observations(url)],
+                         ['404', '500'])
+
+        self.assertTrue(store.setLinkAlive(url))
+        self.assertFalse(store.setLinkAlive(url))
+        self.assertEqual(other.page_titles(), [])
+
+
 if __name__ == '__main__':  # pragma: no cover
     try:
         unittest.main()
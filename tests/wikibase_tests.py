@@ -2231,6 +2231,48 @@ class TestJSON(WikidataTestCase):
         diff = self.wdp.toJSON(diffto=self.wdp._content)
         self.assertEqual(diff, expected)
 
+    def test_lazy_claims(self):
+        """Test that claims are only created when they are accessed."""
+        claims = self.wdp.claims
+        count = len(self.wdp._content['claims'])
+        self.assertLength(claims, count)
+        self.assertIn('P213', claims)
+        self.assertIsNotNone(claims.unconverted('P213'))
+        self.assertIsInstance(claims['P213'][0], pywikibot.Claim)
+        self.assertIs(claims['P213'][0].on_item, self.wdp)
+        self.assertIsNone(claims.unconverted('P213'))
+        self.assertLength(claims, count)
+        self.assertEqual(sorted(claims), sorted(self.wdp._content['claims']))
+        self.assertEqual(
+            sum(1 for prop in claims if claims.unconverted(prop) is None), 1)
+
+    def test_lazy_terms(self):
+        """Test labels, descriptions and aliases being converted lazily."""
+        content = self.wdp._content
+        self.assertEqual(self.wdp.labels['en'],
+                         content['labels']['en']['value'])
+        self.assertEqual(self.wdp.descriptions.copy(),
+                         {lang: value['value'] for lang, value
+                          in content['descriptions'].items()})
+        self.assertIn('NYC', self.wdp.aliases['de'])
+        self.assertIsNotNone(self.wdp.aliases.unconverted('nl'))
+
+    def test_json_diff_unchanged(self):
+        """Test json diff of accessed but unchanged claims."""
+        self.wdp.claims['P213']
+        self.wdp.labels['en']
+        self.assertEqual(self.wdp.toJSON(diffto=self.wdp._content), {})
+
+    def test_json_diff_lazy(self):
+        """Test json diff of a changed claim among unconverted claims."""
+        claim = self.wdp.claims['P213'][0]
+        claim.setRank('deprecated')
+        diff = self.wdp.toJSON(diffto=self.wdp._content)
+        self.assertEqual(list(diff), ['claims'])
+        self.assertEqual(list(diff['claims']), ['P213'])
+        self.assertEqual(diff['claims']['P213'][0]['rank'], 'deprecated')
+        self.assertIsNotNone(self.wdp.claims.unconverted('P31'))
+
 
 class TestDeprecatedDataSiteMethods(WikidataTestCase, DeprecationTestCase):
 
@@ -7,6 +7,14 @@
 #
 from __future__ import absolute_import, division, unicode_literals
 
+import bz2
+import io
+import os
+import pickle
+import re
+import shutil
+import tempfile
+
 from pywikibot import xmlreader
 
 from tests import join_xml_data_path
@@ -64,7 +72,7 @@ class ExportDotThreeTestCase(XmlReaderTestCase):
         """Compare the tested variant with the previous (if not None)."""
         entries = self._get_entries('article-pyrus' + variant,
                                     allrevisions=all_revisions)
-        result = [entry.__dict__ for entry in entries]
+        result = [entry.__getstate__() for entry in entries]
         if previous:
             self.assertEqual(previous, result)
         return result
@@ -127,6 +135,160 @@ class ExportDotTenTestCase(XmlReaderTestCase):
             'moved [[Çullu, Agdam]] to [[Çullu, Quzanlı]]:&#32;dab')
 
 
+class FieldProjectionTestCase(XmlReaderTestCase):
+
+    """Test reading only some fields of the entries."""
+
+    def test_fields(self):
+        """Test the unrequested fields are None."""
+        full = self._get_entries('pair-0.10.xml', allrevisions=True)
+        entries = self._get_entries('pair-0.10.xml', allrevisions=True,
+                                    fields=('title', 'ns', 'text'))
+        self.assertLength(entries, len(full))
+        for entry, expected in zip(entries, full):
+            self.assertEqual(entry.title, expected.title)
+            self.assertEqual(entry.ns, expected.ns)
+            self.assertEqual(entry.text, expected.text)
+            for name in ('id', 'username', 'ipedit', 'timestamp',
+                         'editRestriction', 'moveRestriction',
+                         'revisionid', 'comment', 'isredirect'):
+                self.assertIsNone(getattr(entry, name))
+
+    def test_restrictions(self):
+        """Test reading only the restrictions."""
+        source = io.BytesIO(
+            b'<mediawiki xmlns="http://www.mediawiki.org/xml/export-0.10/">'
+            b'<page><title>Pear</title><ns>0</ns><id>1</id>'
+            b'<restrictions>edit=sysop:move=autoconfirmed</restrictions>'
+            b'<revision><id>2</id><contributor><ip>127.0.0.1</ip>'
+            b'</contributor><text>Pear</text></revision></page></mediawiki>')
+        dump = xmlreader.XmlDump('dump.xml', fields=('editRestriction', ))
+        entry = list(dump._parse_source(source))[0]
+        self.assertIsNone(entry.title)
+        self.assertIsNone(entry.text)
+        self.assertEqual(entry.editRestriction, 'sysop')
+        self.assertEqual(entry.moveRestriction, 'autoconfirmed')
+
+    def test_unknown_field(self):
+        """Test an unknown field name raises ValueError."""
+        with self.assertRaisesRegex(ValueError, 'Unknown XmlEntry fields'):
+            xmlreader.XmlDump('dump.xml', fields=('title', 'foo'))
+
+    def test_slots(self):
+        """Test entries have no instance dictionary and can be pickled."""
+        entry = self._get_entries('article-pear.xml')[0]
+        self.assertFalse(hasattr(entry, '__dict__'))
+        copy = pickle.loads(pickle.dumps(entry, protocol=0))
+        self.assertEqual(copy.__getstate__(), entry.__getstate__())
+
+
+class ParallelXmlDumpTestCase(TestCase):
+
+    """Test parsing dumps with ParallelXmlDump."""
+
+    net = False
+
+    pages = 40
+
+    @classmethod
+    def setUpClass(cls):
+        """Create a plain and a multistream dump with many pages."""
+        super(ParallelXmlDumpTestCase, cls).setUpClass()
+        with io.open(join_xml_data_path('article-pear-0.10.xml'), 'rb') as f:
+            content = f.read()
+        start = content.index(b'  <page>')
+        end = content.index(b'</page>') + len(b'</page>\n')
+        header, page, footer = (content[:start], content[start:end],
+                                content[end:])
+        pages = []
+        for i in range(cls.pages):
+            text = page.replace(b'<title>Pear</title>',
+                                '<title>Pear {0}</title>'.format(i).encode())
+            if i % 3 == 0:
+                text = text.replace(b'<ns>0</ns>', b'<ns>1</ns>')
+            pages.append(text)
+
+        cls.directory = tempfile.mkdtemp()
+        cls.plain = os.path.join(cls.directory, 'pages.xml')
+        with io.open(cls.plain, 'wb') as f:
+            f.write(header + b''.join(pages) + footer)
+
+        cls.multistream = os.path.join(cls.directory,
+                                       'pages-multistream.xml.bz2')
+        index = []
+        with io.open(cls.multistream, 'wb') as f:
+            f.write(bz2.compress(header))
+            for i in range(0, cls.pages, 5):
+                offset = f.tell()
+                for j in range(i, i + 5):
+                    index.append('{0}:24278:Pear {1}\n'.format(offset, j))
+                f.write(bz2.compress(b''.join(pages[i:i + 5])))
+            f.write(bz2.compress(footer))
+        with io.open(os.path.join(cls.directory,
+                                  'pages-multistream-index.txt.bz2'),
+                     'wb') as f:
+            f.write(bz2.compress(''.join(index).encode()))
+
+    @classmethod
+    def tearDownClass(cls):
+        """Remove the dumps."""
+        shutil.rmtree(cls.directory)
+        super(ParallelXmlDumpTestCase, cls).tearDownClass()
+
+    def _titles(self, dump):
+        """Return the titles of the parsed entries."""
+        return [entry.title for entry in dump.parse()]
+
+    def test_plain(self):
+        """Test splitting an uncompressed dump."""
+        expected = self._titles(xmlreader.XmlDump(self.plain))
+        self.assertLength(expected, self.pages)
+        dump = xmlreader.ParallelXmlDump(self.plain, processes=2,
+                                         shard_size=5000)
+        self.assertGreater(len(dump._plain_shards()), 2)
+        self.assertEqual(self._titles(dump), expected)
+
+    def test_multistream(self):
+        """Test splitting a multistream dump at its streams."""
+        expected = self._titles(xmlreader.XmlDump(self.plain))
+        dump = xmlreader.ParallelXmlDump(self.multistream, processes=2,
+                                         shard_size=1)
+        self.assertLength(dump._multistream_shards(), self.pages // 5)
+        self.assertEqual(self._titles(dump), expected)
+
+    def test_entries(self):
+        """Test the entries are equal to the sequential ones."""
+        expected = list(xmlreader.XmlDump(self.plain, True).parse())
+        entries = list(xmlreader.ParallelXmlDump(
+            self.multistream, True, processes=2, shard_size=1).parse())
+        self.assertEqual([entry.__getstate__() for entry in entries],
+                         [entry.__getstate__() for entry in expected])
+
+    def test_filter(self):
+        """Test filtering the entries in the workers."""
+        entry_filter = xmlreader.XmlEntryFilter(
+            namespaces=[0], title_none=[re.compile('0$')],
+            text_any=[re.compile('Pyrus')])
+        expected = [entry.title
+                    for entry in xmlreader.XmlDump(self.plain).parse()
+                    if entry_filter(entry)]
+        self.assertLength(expected, 24)
+        for filename in (self.plain, self.multistream):
+            dump = xmlreader.ParallelXmlDump(
+                filename, processes=2, entry_filter=entry_filter,
+                shard_size=5000)
+            self.assertEqual(self._titles(dump), expected)
+
+    def test_sequential_fallback(self):
+        """Test dumps which can't be split are parsed sequentially."""
+        filename = join_xml_data_path('article-pyrus.xml.bz2')
+        dump = xmlreader.ParallelXmlDump(filename, processes=2)
+        self.assertIsNone(dump.index)
+        self.assertEqual(
+            self._titles(dump),
+            self._titles(xmlreader.XmlDump(filename)))
+
+
 if __name__ == '__main__':  # pragma: no cover
     try:
         unittest.main()